@@ -1,81 +1,225 @@
 from flask import Flask
 from flask_login import LoginManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 import os
+from utils.db_profiles import apply_sqlite_pragmas, engine_options, profile_name, profile_settings
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Flask app
-app = Flask(__name__)
-
-# Configuration
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
-
-# Handle Railway PostgreSQL URL
-database_url = os.environ.get('DATABASE_URL', 'sqlite:///smart_billing.db')
-if database_url.startswith('postgres://'):
-    database_url = database_url.replace('postgres://', 'postgresql://', 1)
-app.config['SQLALCHEMY_DATABASE_URI'] = database_url
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Email configuration
-app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
-app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
-app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'True').lower() in ['true', '1', 'yes']
-app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', 'greatcybercafe852@gmail.com')
-app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', 'quihtyiusrgtitya')
-app.config['WHATSAPP_NUMBER'] = os.environ.get('WHATSAPP_NUMBER', '9004398030')
-
 # Initialize extensions
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Please log in to access this page.'
 
-# Import models and initialize database
-from models import db, User, Bill, Expense, WorkEntry
-db.init_app(app)
+from models import db, User
+from utils.user_cache import load_cached_user
 
 # User loader for Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
-
-# Import and register blueprints
-from routes.auth import auth_bp
-from routes.main import main_bp
-from routes.billing import billing_bp
-from routes.work_tracker import work_bp
-from routes.expense_tracker import expense_bp
-from routes.dashboard import dashboard_bp
-from routes.settings import settings_bp
-
-app.register_blueprint(auth_bp, url_prefix='/auth')
-app.register_blueprint(main_bp)
-app.register_blueprint(billing_bp, url_prefix='/billing')
-app.register_blueprint(work_bp, url_prefix='/work')
-app.register_blueprint(expense_bp, url_prefix='/expenses')
-app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
-app.register_blueprint(settings_bp)
-
-# Create database tables
-with app.app_context():
-    db.create_all()
-    
-    # Create default admin user if not exists
-    admin = User.query.filter_by(email='admin@smartbilling.com').first()
-    if not admin:
-        from werkzeug.security import generate_password_hash
-        admin = User(
-            username='admin',
-            email='admin@smartbilling.com',
-            password_hash=generate_password_hash('admin123'),
-            role='admin'
-        )
-        db.session.add(admin)
+    return load_cached_user(user_id)
+
+
+def create_app():
+    """Build and configure the Flask app
+
+    Creates no tables or rows: the schema and the default admin come from
+    init_database() (python migrate.py init), run once per deploy.
+    """
+    app = Flask(__name__)
+
+    # Configuration
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
+
+    # Handle Railway PostgreSQL URL
+    database_url = os.environ.get('DATABASE_URL', 'sqlite:///smart_billing.db')
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Engine tuning profile (utils/db_profiles.py): DB_PROFILE=auto picks 'sqlite' (WAL) or 'postgres' (pooling)
+    app.config['DB_PROFILE'] = profile_name(database_url)
+    app.config['DB_ENGINE_SETTINGS'] = profile_settings(app.config['DB_PROFILE'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url, app.config['DB_ENGINE_SETTINGS'])
+
+    # Read replica for analytics, reports and exports (empty = everything on the primary).
+    # Those reads stay on the primary while the replica is down or more than REPLICA_MAX_LAG
+    # seconds behind, for REPLICA_MAX_LAG seconds after the user's own writes, and for
+    # clients that send no session cookie (their last write cannot be known).
+    replica_url = os.environ.get('REPLICA_DATABASE_URL', '')
+    if replica_url.startswith('postgres://'):
+        replica_url = replica_url.replace('postgres://', 'postgresql://', 1)
+    if replica_url:
+        app.config['SQLALCHEMY_BINDS'] = {
+            'replica': {'url': replica_url, **engine_options(replica_url, app.config['DB_ENGINE_SETTINGS'])}
+        }
+    app.config['REPLICA_MAX_LAG'] = float(os.environ.get('REPLICA_MAX_LAG', 10))
+    app.config['REPLICA_CHECK_INTERVAL'] = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+
+    # Importing app.py never touches the database: run `python migrate.py init` first (the
+    # Procfile does on every deploy). AUTO_MIGRATE=True runs it on import, for local development.
+    app.config['AUTO_MIGRATE'] = os.environ.get('AUTO_MIGRATE', 'False').lower() in ['true', '1', 'yes']
+
+    # Per-request SQL instrumentation: query count, database time and slowest statements per route
+    # (admin: /dashboard/query-stats) and a Server-Timing header for admins. Off by default: it adds
+    # two event hooks to every statement. Statements taking SLOW_QUERY_MS or longer (0 disables)
+    # go to a rotating slow-query log with their parameter types.
+    app.config['QUERY_STATS'] = os.environ.get('QUERY_STATS', 'False').lower() in ['true', '1', 'yes']
+    app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 200))
+    app.config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG', os.path.join(app.instance_path, 'slow_queries.log'))
+    app.config['SLOW_QUERY_LOG_MB'] = int(os.environ.get('SLOW_QUERY_LOG_MB', 5))
+    app.config['SLOW_QUERY_LOG_BACKUPS'] = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', 3))
+
+    # Email configuration
+    app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
+    app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
+    app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'True').lower() in ['true', '1', 'yes']
+    app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', 'greatcybercafe852@gmail.com')
+    app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', 'quihtyiusrgtitya')
+    app.config['WHATSAPP_NUMBER'] = os.environ.get('WHATSAPP_NUMBER', '9004398030')
+
+    # Password hashing: pbkdf2 (cost = iterations) or bcrypt (cost = log2 rounds).
+    # Stored hashes are converted at each user's next login. With PASSWORD_HASH_WORKERS > 0
+    # checks run on that many threads and at most PASSWORD_HASH_QUEUE more may wait.
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2')
+    app.config['PASSWORD_HASH_COST'] = int(os.environ.get('PASSWORD_HASH_COST') or 0) or None
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+
+    # Login throttling: every attempt takes a token from a per-IP and a per-account bucket
+    # (burst size, refill per minute; a burst of 0 turns that bucket off). Accounts back off
+    # exponentially after repeated failures. An empty store keeps buckets per worker.
+    app.config['LOGIN_THROTTLE_STORE'] = os.environ.get('LOGIN_THROTTLE_STORE', os.path.join(app.instance_path, 'login_throttle.db'))
+    app.config['LOGIN_IP_BURST'] = int(os.environ.get('LOGIN_IP_BURST', 20))
+    app.config['LOGIN_IP_PER_MINUTE'] = float(os.environ.get('LOGIN_IP_PER_MINUTE', 10))
+    app.config['LOGIN_ACCOUNT_BURST'] = int(os.environ.get('LOGIN_ACCOUNT_BURST', 5))
+    app.config['LOGIN_ACCOUNT_PER_MINUTE'] = float(os.environ.get('LOGIN_ACCOUNT_PER_MINUTE', 3))
+    app.config['LOGIN_BACKOFF_AFTER'] = int(os.environ.get('LOGIN_BACKOFF_AFTER', 3))
+    app.config['LOGIN_BACKOFF_SECONDS'] = float(os.environ.get('LOGIN_BACKOFF_SECONDS', 2))
+    app.config['LOGIN_BACKOFF_MAX'] = float(os.environ.get('LOGIN_BACKOFF_MAX', 300))
+    # Reverse proxies in front of the app (Railway/Render: 1). Their X-Forwarded-For and
+    # X-Forwarded-Proto give the client address used by the per-IP bucket; 0 when exposed directly.
+    app.config['TRUSTED_PROXY_HOPS'] = int(os.environ.get('TRUSTED_PROXY_HOPS', 1))
+
+    # Logged-in users are cached per worker for USER_CACHE_TTL seconds (0 disables);
+    # changes touch USER_CACHE_STAMP so other workers on the host reload at once
+    app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 30))
+    app.config['USER_CACHE_STAMP'] = os.environ.get('USER_CACHE_STAMP', os.path.join(app.instance_path, 'user_cache.stamp'))
+    # Work catalog name lists are cached per worker; changes touch WORK_CATALOG_STAMP
+    app.config['WORK_CATALOG_STAMP'] = os.environ.get('WORK_CATALOG_STAMP', os.path.join(app.instance_path, 'work_catalog.stamp'))
+    # Expense categories are cached per worker; changes touch EXPENSE_CATEGORY_STAMP
+    app.config['EXPENSE_CATEGORY_STAMP'] = os.environ.get('EXPENSE_CATEGORY_STAMP', os.path.join(app.instance_path, 'expense_categories.stamp'))
+
+    # Export configuration
+    app.config['EXPORT_FOLDER'] = os.environ.get('EXPORT_FOLDER', os.path.join(app.instance_path, 'exports'))
+    app.config['EXPORT_ASYNC_THRESHOLD'] = int(os.environ.get('EXPORT_ASYNC_THRESHOLD', 5000))
+    app.config['EXPORT_WORKERS'] = int(os.environ.get('EXPORT_WORKERS', 2))
+    app.config['EXPORT_RETENTION_HOURS'] = int(os.environ.get('EXPORT_RETENTION_HOURS', 24))
+    # Jobs still queued or running after this long lost their worker (e.g. a restart) and are failed
+    app.config['EXPORT_JOB_TIMEOUT_MINUTES'] = int(os.environ.get('EXPORT_JOB_TIMEOUT_MINUTES', 60))
+
+    # Expense receipts (content-addressed files plus resized copies)
+    app.config['RECEIPT_FOLDER'] = os.environ.get('RECEIPT_FOLDER', os.path.join(app.instance_path, 'receipts'))
+    app.config['RECEIPT_MAX_MB'] = int(os.environ.get('RECEIPT_MAX_MB', 15))
+
+    # Uploaded images (receipts, profile photos) are resized on a background pool
+    app.config['UPLOAD_WORKERS'] = int(os.environ.get('UPLOAD_WORKERS', 1))
+    app.config['PROFILE_PHOTO_MAX_MB'] = int(os.environ.get('PROFILE_PHOTO_MAX_MB', 10))
+
+    # Live work events (Server-Sent Events); an empty broker keeps events in-process.
+    # Streams end after WORK_EVENTS_STREAM_SECONDS and the browser reconnects, and each
+    # worker serves at most WORK_EVENTS_MAX_STREAMS at once (0 = no limit), so open tabs
+    # cannot take every gthread thread
+    app.config['WORK_EVENTS_BROKER'] = os.environ.get('WORK_EVENTS_BROKER', os.path.join(app.instance_path, 'work_events.db'))
+    app.config['WORK_EVENTS_POLL_INTERVAL'] = float(os.environ.get('WORK_EVENTS_POLL_INTERVAL', 0.5))
+    app.config['WORK_EVENTS_HEARTBEAT'] = int(os.environ.get('WORK_EVENTS_HEARTBEAT', 15))
+    app.config['WORK_EVENTS_STREAM_SECONDS'] = int(os.environ.get('WORK_EVENTS_STREAM_SECONDS', 25))
+    app.config['WORK_EVENTS_MAX_STREAMS'] = int(os.environ.get('WORK_EVENTS_MAX_STREAMS', 4))
+
+    # Stale timer sweeper: stop timers at shop closing time (local) or after a maximum duration
+    app.config['WORK_TIMER_POLICY'] = os.environ.get('WORK_TIMER_POLICY', 'closing_time')
+    app.config['WORK_CLOSING_TIME'] = os.environ.get('WORK_CLOSING_TIME', '21:00')
+    app.config['WORK_UTC_OFFSET_MINUTES'] = int(os.environ.get('WORK_UTC_OFFSET_MINUTES', 330))
+    app.config['WORK_TIMER_MAX_HOURS'] = int(os.environ.get('WORK_TIMER_MAX_HOURS', 12))
+    app.config['WORK_SWEEP_INTERVAL'] = int(os.environ.get('WORK_SWEEP_INTERVAL', 900))
+
+    # Bill archive (python archive_bills.py, from cron): paid bills older than this move to cold storage
+    app.config['BILL_ARCHIVE_AFTER_DAYS'] = int(os.environ.get('BILL_ARCHIVE_AFTER_DAYS', 365))
+    app.config['BILL_ARCHIVE_BATCH_SIZE'] = int(os.environ.get('BILL_ARCHIVE_BATCH_SIZE', 500))
+
+    if app.config['TRUSTED_PROXY_HOPS']:
+        hops = app.config['TRUSTED_PROXY_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    login_manager.init_app(app)
+    db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_sqlite_pragmas(engine, app.config['DB_ENGINE_SETTINGS'])
+        if app.config['QUERY_STATS']:
+            from utils.query_stats import init_query_stats
+            init_query_stats(app, db.engines.values())
+
+    # Import and register blueprints
+    from routes.auth import auth_bp
+    from routes.main import main_bp
+    from routes.billing import billing_bp
+    from routes.work_tracker import work_bp
+    from routes.expense_tracker import expense_bp
+    from routes.dashboard import dashboard_bp
+    from routes.settings import settings_bp
+
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(main_bp)
+    app.register_blueprint(billing_bp, url_prefix='/billing')
+    app.register_blueprint(work_bp, url_prefix='/work')
+    app.register_blueprint(expense_bp, url_prefix='/expenses')
+    app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
+    app.register_blueprint(settings_bp)
+
+    # Start the stale timer sweeper in each worker on its first request
+    from utils.work_sweeper import start_sweeper
+
+    @app.before_request
+    def ensure_sweeper():
+        start_sweeper(app)
+
+    return app
+
+
+def init_database(app):
+    """Create or upgrade the database schema (see migrations/), then the default
+    admin user and expense categories. Safe to run again."""
+    with app.app_context():
+        from utils.migrations import upgrade
+        upgrade(db.engine)
+
+        # Create default admin user if not exists
+        admin = User.query.filter_by(email='admin@smartbilling.com').first()
+        if not admin:
+            admin = User(
+                username='admin',
+                email='admin@smartbilling.com',
+                role='admin'
+            )
+            admin.set_password('admin123')
+            db.session.add(admin)
+            db.session.commit()
+
+        # Default expense categories
+        from utils.expense_categories import ensure_default_categories
+        ensure_default_categories()
         db.session.commit()
 
+
+app = create_app()
+
+# Create or upgrade the database schema on import only when AUTO_MIGRATE is on
+if app.config['AUTO_MIGRATE']:
+    init_database(app)
+
 if __name__ == '__main__':
     # Use environment variable for debug mode
     debug_mode = os.environ.get('DEBUG', 'False').lower() in ['true', '1', 'yes']
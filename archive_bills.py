@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Move old paid bills into the bill archive (run from cron, e.g. nightly)
+
+Usage:
+    python archive_bills.py                  # archive paid bills older than BILL_ARCHIVE_AFTER_DAYS
+    python archive_bills.py --days 730       # use another age for this run
+    python archive_bills.py --restore [id..] # move archived bills (default: all) back
+"""
+
+import sys
+from app import app
+from models import db, ArchivedBill, Bill, BillRollup
+from utils.bill_archive import archive_paid_bills, restore_archived_bills
+
+def archive(args):
+    with app.app_context():
+        try:
+            if '--restore' in args:
+                ids = [int(arg) for arg in args[args.index('--restore') + 1:]] or None
+                restored = restore_archived_bills(ids)
+                print(f"✅ Restored {restored} archived bills")
+                return 0
+
+            days = int(args[args.index('--days') + 1]) if '--days' in args else app.config['BILL_ARCHIVE_AFTER_DAYS']
+            archived = archive_paid_bills(days, app.config['BILL_ARCHIVE_BATCH_SIZE'])
+            print(f"✅ Archived {archived} paid bills older than {days} days")
+            print(f"   Live bills: {Bill.query.count()}, archived: {ArchivedBill.query.count()}, "
+                  f"rollup rows: {BillRollup.query.count()}")
+            return 0
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error archiving bills: {e}")
+            return 1
+
+if __name__ == '__main__':
+    sys.exit(archive(sys.argv[1:]))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark write throughput of each database engine profile
+
+Several processes (standing in for gunicorn workers), each with a few
+threads, add expenses through the real /expenses/create route against one
+shared database while one thread per process keeps loading the expense list. Reports writes per second, p95 latency and failed writes
+(e.g. "database is locked") for every profile. SQLite profiles run on a
+throwaway file; PostgreSQL profiles run only when BENCHMARK_POSTGRES_URL
+points at a scratch database.
+Usage: python benchmark_db_profiles.py [processes] [threads] [writes per thread]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+RUNS = [
+    ('sqlite', 'default'),
+    ('sqlite', 'sqlite'),
+    ('postgres', 'default'),
+    ('postgres', 'postgres')
+]
+
+def configure(database_url, profile):
+    os.environ.update({
+        'DATABASE_URL': database_url,
+        'DB_PROFILE': profile,
+        'AUTO_MIGRATE': '1',
+        'WORK_SWEEP_INTERVAL': '0',
+        'LOGIN_THROTTLE_STORE': '',
+        'USER_CACHE_STAMP': '',
+        'WORK_EVENTS_BROKER': ''
+    })
+
+def worker(database_url, profile, threads, writes, results):
+    configure(database_url, profile)
+    from app import app
+
+    def run(number):
+        client = app.test_client()
+        client.post('/auth/login', data={'email': 'admin@smartbilling.com', 'password': 'admin123'})
+        for count in range(writes):
+            started = time.time()
+            try:
+                response = client.post('/expenses/create', data={
+                    'title': f'Benchmark {os.getpid()}-{number}-{count}', 'description': '',
+                    'amount': '10', 'category': 'Other', 'date': '2024-01-01'
+                })
+                ok = response.status_code == 302
+            except Exception:
+                ok = False
+            results.put((ok, started, time.time()))
+
+    def read(done):
+        client = app.test_client()
+        client.post('/auth/login', data={'email': 'admin@smartbilling.com', 'password': 'admin123'})
+        while not done.is_set():
+            client.get('/expenses/')
+
+    done = threading.Event()
+    reader = threading.Thread(target=read, args=(done,))
+    reader.start()
+    pool = [threading.Thread(target=run, args=(number,)) for number in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    done.set()
+    reader.join()
+
+def prepare(database_url, profile):
+    """Create the schema and admin user once, before the workers start"""
+    configure(database_url, profile)
+    import app  # noqa: F401  (runs migrations and seeds the admin user)
+
+def benchmark(processes, threads, writes):
+    context = multiprocessing.get_context('spawn')
+    print(f"{processes} processes x {threads} threads x {writes} writes, {os.cpu_count()} CPU(s)\n")
+    print(f"{'Database':<10} {'Profile':<10} {'Writes/s':>9} {'p95 (ms)':>9} {'Failed':>7}")
+    for database, profile in RUNS:
+        if database == 'sqlite':
+            database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+        else:
+            database_url = os.environ.get('BENCHMARK_POSTGRES_URL')
+            if not database_url:
+                continue
+
+        setup = context.Process(target=prepare, args=(database_url, profile))
+        setup.start()
+        setup.join()
+
+        results = context.Queue()
+        workers = [context.Process(target=worker, args=(database_url, profile, threads, writes, results))
+                   for _ in range(processes)]
+        for process in workers:
+            process.start()
+        writes_done = [results.get() for _ in range(processes * threads * writes)]
+        for process in workers:
+            process.join()
+
+        # Throughput over the window in which writes ran (process start-up excluded)
+        window = max(ended for _, _, ended in writes_done) - min(started for _, started, _ in writes_done)
+        failed = sum(1 for ok, _, _ in writes_done if not ok)
+        timings = [ended - started for _, started, ended in writes_done]
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+        print(f"{database:<10} {profile:<10} {(len(timings) - failed) / window:>9.1f} {p95:>9.0f} {failed:>7}")
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 4,
+              int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+              int(sys.argv[3]) if len(sys.argv) > 3 else 50)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming expense import
+
+Writes a bank-statement style CSV with N rows, then runs a dry run, the
+import itself and a re-import (all duplicates) on a throwaway SQLite
+database, reporting time and peak memory. Usage: python benchmark_expense_import.py [rows]
+"""
+
+import csv
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+workdir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'benchmark.db')
+os.environ['AUTO_MIGRATE'] = '1'
+os.environ.setdefault('WORK_SWEEP_INTERVAL', '0')
+
+from app import app
+from models import db, Expense, User
+from utils.expense_import import import_expenses
+
+def write_statement(path, rows):
+    """Bank export: account details, then Txn Date / Narration / Withdrawal / Deposit"""
+    start = date(2024, 1, 1)
+    with open(path, 'w', newline='') as f:
+        f.write('Account Statement\nAccount No: XXXX1234\n\n')
+        writer = csv.writer(f)
+        writer.writerow(['Txn Date', 'Narration', 'Ref No', 'Withdrawal Amt.', 'Deposit Amt.', 'Balance'])
+        for i in range(rows):
+            day = (start + timedelta(days=i % 365)).strftime('%d/%m/%Y')
+            if i % 10 == 0:
+                writer.writerow([day, f'NEFT CR CUSTOMER {i}', f'REF{i}', '', f'{500 + i % 50}.00', '0'])
+            else:
+                writer.writerow([day, f'UPI/VENDOR {i % 997}/PAYMENT {i}', f'REF{i}', f'{(i % 5000) / 4 + 1:,.2f}', '', '0'])
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run(user_id, path, dry_run):
+    started = time.perf_counter()
+    with open(path, newline='', encoding='utf-8') as f:
+        report = import_expenses(user_id, f, dry_run=dry_run)
+    return report, time.perf_counter() - started
+
+def benchmark(rows):
+    path = os.path.join(workdir, 'statement.csv')
+    write_statement(path, rows)
+
+    with app.app_context():
+        user = User.query.filter_by(email='admin@smartbilling.com').first()
+        before = peak_rss_mb()
+
+        dry, dry_seconds = run(user.id, path, True)
+        first, first_seconds = run(user.id, path, False)
+        again, again_seconds = run(user.id, path, False)
+        stored = Expense.query.filter_by(created_by=user.id).count()
+
+    assert dry['imported'] == first['imported'] == stored
+    assert again['imported'] == 0 and again['duplicates'] == stored
+    print(f"Rows in file:     {rows} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    print(f"Dry run:          {dry_seconds:.2f}s ({dry['imported']} would be imported)")
+    print(f"Import:           {first_seconds:.2f}s ({first['imported']} imported, {first['skipped']} credits skipped)")
+    print(f"Re-import:        {again_seconds:.2f}s ({again['duplicates']} duplicates skipped)")
+    print(f"Peak RSS growth:  {peak_rss_mb() - before:.0f} MB")
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
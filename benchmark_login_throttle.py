@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark sign-in latency for a real user during a password-guessing attack
+
+Attacker threads post wrong passwords for real accounts from a few IPs
+while one user keeps signing in from another IP, first with throttling
+switched off and then with the configured buckets and backoff. Each
+attacker waits `delay` ms between attempts to stand in for the network round
+trip. Reports the user's p50/p99 latency over the second half of the run
+(after the attackers' bursts are spent) and how many attacker attempts
+reached the password hash.
+Usage: python benchmark_login_throttle.py [seconds] [attackers] [delay_ms]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+os.environ['AUTO_MIGRATE'] = '1'
+os.environ.setdefault('WORK_SWEEP_INTERVAL', '0')
+os.environ.setdefault('LOGIN_THROTTLE_STORE', '')
+
+from app import app
+from models import db, User
+from utils import login_throttle
+
+EMAIL = 'admin@smartbilling.com'
+PASSWORD = 'admin123'
+TARGETS = 50
+
+def create_targets():
+    with app.app_context():
+        for number in range(TARGETS):
+            user = User(username=f'target{number}', email=f'target{number}@example.com', role='user')
+            user.set_password(f'target-password-{number}')
+            db.session.add(user)
+        db.session.commit()
+
+def run(seconds, attackers, delay):
+    stop = threading.Event()
+    timings = []
+    counts = {'hashed': 0, 'refused': 0}
+    lock = threading.Lock()
+
+    def attacker(number):
+        client = app.test_client()
+        attempt = 0
+        while not stop.is_set():
+            attempt += 1
+            response = client.post('/auth/login', data={
+                'email': f'target{attempt % TARGETS}@example.com', 'password': f'guess-{attempt}'
+            }, environ_base={'REMOTE_ADDR': f'203.0.113.{number}'})
+            with lock:
+                counts['refused' if response.status_code == 429 else 'hashed'] += 1
+            time.sleep(delay)
+
+    def user():
+        client = app.test_client()
+        steady = time.perf_counter() + seconds / 2
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = client.post('/auth/login', data={'email': EMAIL, 'password': PASSWORD},
+                                   environ_base={'REMOTE_ADDR': '198.51.100.7'})
+            if started >= steady:
+                timings.append(time.perf_counter() - started)
+            assert response.status_code == 302, response.status_code
+            client.get('/auth/logout')
+
+    threads = [threading.Thread(target=attacker, args=(number,)) for number in range(attackers)]
+    threads.append(threading.Thread(target=user))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[max(0, int(len(timings) * 0.99) - 1)] * 1000
+    return len(timings), p50, p99, counts
+
+def benchmark(seconds, attackers, delay_ms):
+    create_targets()
+    print(f"{seconds}s per run, {attackers} attacker threads, {delay_ms} ms between attempts, "
+          f"{os.cpu_count()} CPU(s)\n")
+    print(f"{'Throttling':<12} {'Sign-ins':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'Hashed':>8} {'Refused':>8}")
+    configured = {key: app.config[key] for key in ('LOGIN_IP_BURST', 'LOGIN_ACCOUNT_BURST')}
+    for label, settings in (('off', {'LOGIN_IP_BURST': 0, 'LOGIN_ACCOUNT_BURST': 0}), ('on', configured)):
+        app.config.update(settings)
+        login_throttle._store = None
+        sign_ins, p50, p99, counts = run(seconds, attackers, delay_ms / 1000.0)
+        print(f"{label:<12} {sign_ins:>9} {p50:>9.0f} {p99:>9.0f} {counts['hashed']:>8} {counts['refused']:>8}")
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 60,
+              int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+              int(sys.argv[3]) if len(sys.argv) > 3 else 20)
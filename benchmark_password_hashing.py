@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark login throughput for each password hashing setting
+
+For every (method, cost) pair a user is created with that policy and
+logged in repeatedly from several threads through the real login route,
+on a throwaway SQLite database. Reports logins per second and the slowest
+5% of logins. Usage: python benchmark_password_hashing.py [logins] [threads]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+os.environ['AUTO_MIGRATE'] = '1'
+os.environ.setdefault('WORK_SWEEP_INTERVAL', '0')
+os.environ.setdefault('LOGIN_THROTTLE_STORE', '')
+
+from app import app
+from models import db, User
+from utils.passwords import BCRYPT_AVAILABLE
+
+SETTINGS = [
+    ('pbkdf2', 600000),
+    ('pbkdf2', 260000),
+    ('pbkdf2', 100000),
+    ('bcrypt', 12),
+    ('bcrypt', 11),
+    ('bcrypt', 10)
+]
+
+def create_user(method, cost):
+    email = f'bench_{method}_{cost}@example.com'
+    with app.app_context():
+        user = User(username=f'bench_{method}_{cost}', email=email, role='user')
+        user.set_password('benchmark-password')
+        db.session.add(user)
+        db.session.commit()
+    return email
+
+def login_timings(email, logins, threads):
+    timings = []
+    lock = threading.Lock()
+
+    def worker(count):
+        client = app.test_client()
+        for _ in range(count):
+            started = time.perf_counter()
+            response = client.post('/auth/login', data={'email': email, 'password': 'benchmark-password'})
+            elapsed = time.perf_counter() - started
+            assert response.status_code == 302, response.status_code
+            client.get('/auth/logout')
+            with lock:
+                timings.append(elapsed)
+
+    workers = [threading.Thread(target=worker, args=(logins // threads,)) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return timings, time.perf_counter() - started
+
+def benchmark(logins, threads):
+    print(f"{logins} logins from {threads} threads per setting, {os.cpu_count()} CPU(s)\n")
+    print(f"{'Setting':<20} {'Logins/s':>9} {'p95 (ms)':>9}")
+    for method, cost in SETTINGS:
+        if method == 'bcrypt' and not BCRYPT_AVAILABLE:
+            continue
+        app.config['PASSWORD_HASH_METHOD'] = method
+        app.config['PASSWORD_HASH_COST'] = cost
+        email = create_user(method, cost)
+        timings, elapsed = login_timings(email, logins, threads)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+        print(f"{method + ' ' + str(cost):<20} {len(timings) / elapsed:>9.1f} {p95:>9.0f}")
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 40,
+              int(sys.argv[2]) if len(sys.argv) > 2 else 4)
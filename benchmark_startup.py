@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark application startup: import time and gunicorn worker memory
+
+Initializes a throwaway SQLite database, times `import app` in fresh
+interpreters with and without AUTO_MIGRATE, then starts gunicorn with and
+without --preload, loads the login page through every worker and reports
+the memory of each worker (RSS, PSS and private pages) from /proc.
+Usage: python benchmark_startup.py [workers] [import runs]
+"""
+
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ENV = dict(os.environ,
+           DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db'),
+           WORK_SWEEP_INTERVAL='0', LOGIN_THROTTLE_STORE='', USER_CACHE_STAMP='', WORK_EVENTS_BROKER='')
+
+def import_time(runs, auto_migrate):
+    """Median wall time (ms) of `import app` in a new interpreter"""
+    env = dict(ENV, AUTO_MIGRATE=auto_migrate)
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', 'import time; t = time.perf_counter(); import app; '
+                                   'print((time.perf_counter() - t) * 1000)'],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+def memory(pid):
+    """RSS, PSS and private (unshared) memory of a process, in MB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as rollup:
+        for line in rollup:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return values['Rss'], values['Pss'], values['Private_Clean'] + values['Private_Dirty']
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def worker_memory(workers, preload):
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '--workers', str(workers),
+               '--bind', f'127.0.0.1:{port}'] + (['--preload'] if preload else [])
+    env = dict(ENV, GUNICORN_PRELOAD='1' if preload else '0')
+    started = time.perf_counter()
+    master = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f'http://127.0.0.1:{port}/auth/login'
+        while True:
+            try:
+                urllib.request.urlopen(url, timeout=5).read()
+                break
+            except OSError:
+                if master.poll() is not None or time.perf_counter() - started > 60:
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.05)
+        ready = time.perf_counter() - started
+        for _ in range(workers * 25):
+            urllib.request.urlopen(url, timeout=5).read()
+
+        with open(f'/proc/{master.pid}/task/{master.pid}/children') as children:
+            pids = [int(pid) for pid in children.read().split()]
+        usage = [memory(pid) for pid in pids]
+        return ready, [sum(values) / len(usage) for values in zip(*usage)], sum(values[1] for values in usage)
+    finally:
+        master.terminate()
+        master.wait()
+
+def benchmark(workers, runs):
+    subprocess.run([sys.executable, '-c', 'import app'], cwd=ROOT, env=dict(ENV, AUTO_MIGRATE='1'),
+                   check=True, stdout=subprocess.DEVNULL)
+
+    print(f"import app, AUTO_MIGRATE=1:  {import_time(runs, '1'):7.1f} ms (median of {runs})")
+    print(f"import app, AUTO_MIGRATE=0:  {import_time(runs, '0'):7.1f} ms (median of {runs})")
+    for preload in (False, True):
+        ready, (rss, pss, private), total_pss = worker_memory(workers, preload)
+        print(f"{workers} workers, {'--preload' if preload else 'no preload'}: ready in {ready:.2f}s; "
+              f"per worker RSS {rss:.1f} MB, PSS {pss:.1f} MB, private {private:.1f} MB; "
+              f"total worker PSS {total_pss:.1f} MB")
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 4, int(sys.argv[2]) if len(sys.argv) > 2 else 5)
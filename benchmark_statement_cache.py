@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark the hot-path routes with per-route query statistics
+
+Loads both dashboards and the bill, expense and work entry pages N times
+each on a throwaway SQLite database, then prints per-route wall time,
+database time, Python overhead (wall minus database), statements per
+request and the compile-cache hit rate.
+Usage: python benchmark_statement_cache.py [requests per route]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+os.environ['AUTO_MIGRATE'] = '1'
+os.environ.setdefault('WORK_SWEEP_INTERVAL', '0')
+os.environ.setdefault('LOGIN_THROTTLE_STORE', '')
+
+from app import app
+from models import db, User, Customer, Bill, BillItem, Expense, WorkEntry
+from utils.query_stats import init_query_stats, query_stats, reset_query_stats
+
+EMAIL = 'benchmark_user@example.com'
+PASSWORD = 'benchmark-password'
+
+def seed():
+    """A regular user with a bill, an expense and a work entry; returns their ids"""
+    user = User(username='benchmark_user', email=EMAIL, role='user')
+    user.set_password(PASSWORD)
+    customer = Customer(name='Benchmark Customer', phone='9333300001')
+    db.session.add_all([user, customer])
+    db.session.flush()
+    bill = Bill(bill_number='BENCH-0001', customer_id=customer.id, created_by=user.id, status='sent',
+                total_amount=100.0, subtotal=100.0, remaining_amount=100.0)
+    bill.items = [BillItem(description='Printing', quantity=2.0, rate=50.0, total=100.0)]
+    expense = Expense(title='Paper', amount=40.0, category='Other', date=datetime.utcnow(),
+                      created_by=user.id)
+    entry = WorkEntry(user_id=user.id, customer_name='Benchmark Customer', customer_phone='9333300001',
+                      service_type='printing', project_name='Benchmark', task_description='Benchmark entry',
+                      start_time=datetime.utcnow(), hourly_rate=120.0, total_amount=120.0,
+                      remaining_amount=120.0, work_status='pending', payment_status='unpaid')
+    db.session.add_all([bill, expense, entry])
+    db.session.commit()
+    return bill.id, expense.id, entry.id
+
+def benchmark(count):
+    with app.app_context():
+        init_query_stats(app, db.engines.values())
+        bill_id, expense_id, entry_id = seed()
+
+    admin = app.test_client()
+    admin.post('/auth/login', data={'email': 'admin@smartbilling.com', 'password': 'admin123'})
+    user = app.test_client()
+    user.post('/auth/login', data={'email': EMAIL, 'password': PASSWORD})
+    pages = [(admin, '/dashboard'), (user, '/dashboard'), (user, f'/billing/bills/{bill_id}'),
+             (user, f'/expenses/{expense_id}'), (user, f'/work/entries/{entry_id}')]
+
+    for client, page in pages:
+        assert client.get(page).status_code == 200, page
+    reset_query_stats()
+
+    started = time.perf_counter()
+    for client, page in pages:
+        for _ in range(count):
+            client.get(page)
+    elapsed = time.perf_counter() - started
+
+    stats = query_stats()
+    print(f"Requests per route: {count} ({elapsed:.2f}s)")
+    print(f"{'endpoint':<26}{'avg ms':>8}{'db ms':>8}{'py ms':>8}{'stmts':>7}{'cache hit':>11}")
+    for row in sorted(stats['routes'], key=lambda row: row['endpoint']):
+        print(f"{row['endpoint']:<26}{row['avg_ms']:>8.2f}{row['avg_db_ms']:>8.2f}"
+              f"{row['avg_python_ms']:>8.2f}{row['avg_statements']:>7.1f}{row['cache_hit_rate']:>10}%")
+    cache = stats['compile_cache']
+    print(f"Compile cache: {cache['hits']} hits, {cache['misses']} misses, "
+          f"{cache['uncached']} uncached ({cache['hit_rate']}% hit rate)")
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk work entry updates against the per-entry endpoints
+
+Marks N running entries delivered and fully paid, first one request per
+entry and operation, then with two bulk requests, on a throwaway SQLite
+database. Usage: python benchmark_work_bulk.py [entries]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+os.environ['AUTO_MIGRATE'] = '1'
+os.environ.setdefault('WORK_SWEEP_INTERVAL', '0')
+
+from app import app
+from models import db, User, WorkEntry
+
+def create_entries(user, count):
+    """Insert `count` running timers and return their ids"""
+    start_time = datetime.utcnow() - timedelta(hours=2)
+    db.session.execute(WorkEntry.__table__.insert(), [{
+        'user_id': user.id, 'customer_name': f'Customer {i}', 'customer_phone': '9000000000',
+        'service_type': 'printing', 'project_name': 'Benchmark', 'task_description': 'Benchmark entry',
+        'start_time': start_time, 'hourly_rate': 120.0, 'total_amount': 120.0, 'advance_amount': 20.0,
+        'remaining_amount': 100.0, 'work_status': 'in_progress', 'payment_status': 'partial',
+        'created_at': start_time
+    } for i in range(count)])
+    db.session.commit()
+    return [entry_id for (entry_id,) in db.session.query(WorkEntry.id).filter_by(project_name='Benchmark')]
+
+def final_state():
+    return sorted(db.session.query(
+        WorkEntry.work_status, WorkEntry.payment_status, WorkEntry.duration_minutes,
+        WorkEntry.total_amount, WorkEntry.remaining_amount
+    ).filter_by(project_name='Benchmark').distinct())
+
+def clear_entries():
+    WorkEntry.query.filter_by(project_name='Benchmark').delete(synchronize_session=False)
+    db.session.commit()
+
+def benchmark(count):
+    client = app.test_client()
+    client.post('/auth/login', data={'email': 'admin@smartbilling.com', 'password': 'admin123'})
+
+    with app.app_context():
+        user = User.query.filter_by(email='admin@smartbilling.com').first()
+
+        ids = create_entries(user, count)
+        started = time.perf_counter()
+        for entry_id in ids:
+            client.post(f'/work/entries/{entry_id}/update-work-status', json={'work_status': 'delivered'})
+            remaining = client.get(f'/work/entries/{entry_id}/payment-info').get_json()['remaining_amount']
+            client.post(f'/work/entries/{entry_id}/update-payment', json={'payment_amount': remaining})
+        per_entry = time.perf_counter() - started
+        per_entry_state = final_state()
+        clear_entries()
+
+        ids = create_entries(user, count)
+        started = time.perf_counter()
+        first = client.post('/work/entries/bulk', json={'ids': ids, 'operation': 'work_status',
+                                                        'work_status': 'delivered'}).get_json()
+        second = client.post('/work/entries/bulk', json={'ids': ids, 'operation': 'mark_paid'}).get_json()
+        bulk = time.perf_counter() - started
+        bulk_state = final_state()
+        clear_entries()
+
+    assert first['updated'] == second['updated'] == count
+    print(f"Entries:          {count}")
+    print(f"Per-entry path:   {per_entry:.2f}s ({count * 3} requests)")
+    print(f"Bulk endpoint:    {bulk:.2f}s (2 requests)")
+    print(f"Speed-up:         {per_entry / bulk:.0f}x")
+    print(f"Same end state:   {'yes' if per_entry_state == bulk_state else 'NO'}")
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,47 @@
+"""
+Test setup for Smart Billing System
+Points the database and every file the app writes (exports, receipts, work
+events broker, login throttle store, cache stamps, slow-query log) at a
+temporary directory before app.py is imported, and initializes the database
+once per test session, so `pytest` never touches a development database.
+"""
+
+import os
+import shutil
+import tempfile
+import pytest
+
+TEST_DIR = tempfile.mkdtemp(prefix='smart_billing_tests_')
+
+os.environ.update({
+    'DATABASE_URL': 'sqlite:///' + os.path.join(TEST_DIR, 'test.db'),
+    'AUTO_MIGRATE': 'False',
+    'EXPORT_FOLDER': os.path.join(TEST_DIR, 'exports'),
+    'RECEIPT_FOLDER': os.path.join(TEST_DIR, 'receipts'),
+    'WORK_EVENTS_BROKER': os.path.join(TEST_DIR, 'work_events.db'),
+    'LOGIN_THROTTLE_STORE': os.path.join(TEST_DIR, 'login_throttle.db'),
+    'USER_CACHE_STAMP': os.path.join(TEST_DIR, 'user_cache.stamp'),
+    'WORK_CATALOG_STAMP': os.path.join(TEST_DIR, 'work_catalog.stamp'),
+    'EXPENSE_CATEGORY_STAMP': os.path.join(TEST_DIR, 'expense_categories.stamp'),
+    'SLOW_QUERY_LOG': os.path.join(TEST_DIR, 'slow_queries.log'),
+    # Off by default; its request hooks must be in place before the first request
+    'QUERY_STATS': 'True'
+})
+
+# Scripts that drive a running server over HTTP (python test_pages.py etc.), not pytest
+collect_ignore = [
+    'test_admin_protection.py', 'test_authenticated_pages.py', 'test_deployed_app.py',
+    'test_functionality.py', 'test_notification_page.py', 'test_pages.py',
+    'test_pdf_email_features.py', 'test_role_access.py'
+]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    """Schema, default admin and expense categories for the whole session"""
+    from app import app, init_database
+    init_database(app)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
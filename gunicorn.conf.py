@@ -0,0 +1,32 @@
+"""
+Gunicorn settings for Smart Billing System
+Workers start without touching the schema (run `python migrate.py init` once
+per deploy). With GUNICORN_PRELOAD the app is imported once in the master and
+frozen out of the garbage collector, so forked workers keep sharing its pages.
+Each /work/events stream holds a gthread thread; see DEPLOYMENT_GUIDE.md for
+serving that route from a separate gevent worker (--worker-class gevent).
+"""
+
+import gc
+import os
+
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() in ['true', '1', 'yes']
+
+
+def pre_fork(server, worker):
+    # Collections write to every tracked object's header; frozen objects are
+    # skipped, so the master's modules stay copy-on-write shared
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # A worker must not reuse connections the master's engines may have opened
+    if preload_app:
+        from app import app
+        from models import db
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
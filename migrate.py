@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations
+
+Usage:
+    python migrate.py init                 apply all migrations, create the default admin and categories
+    python migrate.py status               show applied and pending migrations
+    python migrate.py upgrade [version]    apply pending migrations (default: all)
+    python migrate.py downgrade <version> [--force]
+                                           revert migrations newer than version (0 = empty);
+                                           --force also reverts steps that destroy data
+    python migrate.py check                fail when models.py and migrations/ disagree
+"""
+
+import os
+import sys
+
+os.environ['AUTO_MIGRATE'] = '0'
+
+from app import app, init_database
+from models import db
+from utils.migrations import applied_versions, check_models, downgrade, migrations, upgrade
+
+def status():
+    applied = applied_versions(db.engine)
+    for version, name, _ in migrations():
+        print(f"{'✅' if version in applied else '⏳'} {version:04d} {name}")
+
+def main(args):
+    command = args[0] if args else 'status'
+    with app.app_context():
+        try:
+            if command == 'init':
+                init_database(app)
+                print(f"✅ Database initialized at migration {max(applied_versions(db.engine), default=0):04d}")
+            elif command == 'status':
+                status()
+            elif command == 'upgrade':
+                applied = upgrade(db.engine, int(args[1]) if len(args) > 1 else None)
+                print(f"✅ Applied {len(applied)} migration(s) {applied if applied else ''}")
+            elif command == 'downgrade' and len(args) > 1:
+                reverted = downgrade(db.engine, int(args[1]), force='--force' in args[2:])
+                print(f"✅ Reverted {len(reverted)} migration(s) {reverted if reverted else ''}")
+            elif command == 'check':
+                problems = check_models(db.metadata)
+                for problem in problems:
+                    print(f"❌ {problem}")
+                if problems:
+                    print("Add a migration in migrations/ for these model changes")
+                    return 1
+                print("✅ Models match the migrations")
+            else:
+                print(__doc__)
+                return 2
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
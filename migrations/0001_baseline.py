@@ -0,0 +1,181 @@
+"""
+Baseline: the schema as built by db.create_all() plus the old migrate_*.py scripts
+
+The tables are frozen here rather than read from models.py, so later model
+changes need their own migration. Existing databases are adopted: missing
+tables are created and missing columns and indexes added; nothing is dropped.
+"""
+
+import sqlalchemy as sa
+
+REQUIRES_FORCE = 'drops every table and all data'
+
+metadata = sa.MetaData()
+
+sa.Table(
+    'user', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('username', sa.String(80), unique=True, nullable=False),
+    sa.Column('email', sa.String(120), unique=True, nullable=False),
+    sa.Column('password_hash', sa.String(120), nullable=False),
+    sa.Column('role', sa.String(20)),
+    sa.Column('phone', sa.String(15)),
+    sa.Column('profile_photo', sa.String(200)),
+    sa.Column('theme', sa.String(10)),
+    sa.Column('created_at', sa.DateTime),
+    sa.Column('is_active', sa.Boolean)
+)
+
+sa.Table(
+    'customer', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('name', sa.String(100), nullable=False),
+    sa.Column('email', sa.String(120)),
+    sa.Column('phone', sa.String(15)),
+    sa.Column('phone_normalized', sa.String(15), index=True),
+    sa.Column('whatsapp', sa.String(15)),
+    sa.Column('address', sa.Text),
+    sa.Column('created_at', sa.DateTime)
+)
+
+sa.Table(
+    'expense_category', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('name', sa.String(50), unique=True, nullable=False),
+    sa.Column('description', sa.Text),
+    sa.Column('created_at', sa.DateTime)
+)
+
+sa.Table(
+    'bill', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('bill_number', sa.String(50), unique=True, nullable=False),
+    sa.Column('customer_id', sa.Integer, sa.ForeignKey('customer.id'), nullable=False, index=True),
+    sa.Column('created_by', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+    sa.Column('subtotal', sa.Float),
+    sa.Column('tax_rate', sa.Float),
+    sa.Column('tax_amount', sa.Float),
+    sa.Column('discount', sa.Float),
+    sa.Column('total_amount', sa.Float),
+    sa.Column('advance_amount', sa.Float),
+    sa.Column('remaining_amount', sa.Float),
+    sa.Column('status', sa.String(20)),
+    sa.Column('created_at', sa.DateTime),
+    sa.Column('due_date', sa.DateTime),
+    sa.Column('paid_date', sa.DateTime),
+    sa.Column('email_sent', sa.Boolean),
+    sa.Column('whatsapp_sent', sa.Boolean),
+    sa.Column('notes', sa.Text),
+    sa.Index('ix_bill_owner_status', 'created_by', 'status', 'total_amount', 'created_at')
+)
+
+sa.Table(
+    'bill_item', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('bill_id', sa.Integer, sa.ForeignKey('bill.id'), nullable=False),
+    sa.Column('description', sa.String(200), nullable=False),
+    sa.Column('quantity', sa.Float),
+    sa.Column('rate', sa.Float, nullable=False),
+    sa.Column('total', sa.Float, nullable=False)
+)
+
+sa.Table(
+    'expense', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('title', sa.String(100), nullable=False),
+    sa.Column('description', sa.Text),
+    sa.Column('amount', sa.Float, nullable=False),
+    sa.Column('category', sa.String(50), nullable=False),
+    sa.Column('category_id', sa.Integer, sa.ForeignKey('expense_category.id'), index=True),
+    sa.Column('date', sa.DateTime),
+    sa.Column('created_by', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+    sa.Column('receipt_path', sa.String(200)),
+    sa.Column('dedup_key', sa.String(40)),
+    sa.Index('ix_expense_owner_dedup', 'created_by', 'dedup_key'),
+    sa.Index('ix_expense_owner_date', 'created_by', 'date')
+)
+
+sa.Table(
+    'work_entry', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+    sa.Column('customer_id', sa.Integer, sa.ForeignKey('customer.id'), index=True),
+    sa.Column('customer_name', sa.String(100), nullable=False),
+    sa.Column('customer_phone', sa.String(15), nullable=False),
+    sa.Column('service_type', sa.String(50), nullable=False),
+    sa.Column('project_name', sa.String(100), nullable=False),
+    sa.Column('task_description', sa.Text, nullable=False),
+    sa.Column('start_time', sa.DateTime, nullable=False),
+    sa.Column('end_time', sa.DateTime),
+    sa.Column('duration_minutes', sa.Integer),
+    sa.Column('hourly_rate', sa.Float),
+    sa.Column('total_amount', sa.Float),
+    sa.Column('advance_amount', sa.Float),
+    sa.Column('remaining_amount', sa.Float),
+    sa.Column('work_status', sa.String(20)),
+    sa.Column('payment_status', sa.String(20)),
+    sa.Column('created_at', sa.DateTime),
+    sa.Column('bill_id', sa.Integer, sa.ForeignKey('bill.id'), index=True),
+    sa.Index('ix_work_entry_status_start', 'work_status', 'start_time'),
+    sa.Index('ix_work_entry_user_status', 'user_id', 'work_status', 'start_time')
+)
+
+sa.Table(
+    'work_catalog_item', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+    sa.Column('kind', sa.String(20), nullable=False),
+    sa.Column('name', sa.String(100), nullable=False),
+    sa.Column('entry_count', sa.Integer),
+    sa.Column('last_used_at', sa.DateTime),
+    sa.UniqueConstraint('user_id', 'kind', 'name', name='uq_work_catalog_user_kind_name')
+)
+
+sa.Table(
+    'export_job', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+    sa.Column('data_type', sa.String(20), nullable=False),
+    sa.Column('export_format', sa.String(10), nullable=False),
+    sa.Column('status', sa.String(20)),
+    sa.Column('total_rows', sa.Integer),
+    sa.Column('processed_rows', sa.Integer),
+    sa.Column('file_path', sa.String(300)),
+    sa.Column('error', sa.Text),
+    sa.Column('snapshot_bill_id', sa.Integer),
+    sa.Column('snapshot_bill_item_id', sa.Integer),
+    sa.Column('snapshot_expense_id', sa.Integer),
+    sa.Column('snapshot_work_entry_id', sa.Integer),
+    sa.Column('created_at', sa.DateTime),
+    sa.Column('completed_at', sa.DateTime)
+)
+
+sa.Table(
+    'notification_preferences', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id'), unique=True, nullable=False),
+    sa.Column('email_bill_created', sa.Boolean),
+    sa.Column('email_bill_paid', sa.Boolean),
+    sa.Column('email_expense_added', sa.Boolean),
+    sa.Column('email_weekly_report', sa.Boolean),
+    sa.Column('email_monthly_report', sa.Boolean),
+    sa.Column('email_system_updates', sa.Boolean),
+    sa.Column('whatsapp_bill_paid', sa.Boolean),
+    sa.Column('whatsapp_daily_summary', sa.Boolean),
+    sa.Column('whatsapp_overdue', sa.Boolean),
+    sa.Column('whatsapp_goals', sa.Boolean),
+    sa.Column('quiet_hours_start', sa.Time),
+    sa.Column('quiet_hours_end', sa.Time),
+    sa.Column('weekly_report_day', sa.String(10)),
+    sa.Column('report_time', sa.Time),
+    sa.Column('created_at', sa.DateTime),
+    sa.Column('updated_at', sa.DateTime)
+)
+
+
+def upgrade(op):
+    op.create_all(metadata)
+
+
+def downgrade(op):
+    op.drop_all(metadata)
@@ -0,0 +1,24 @@
+"""
+Composite indexes matching the per-user list, report and dashboard filters
+
+Lists filter on the owner and sort by date; the admin dashboard filters
+paid bills by date across users.
+"""
+
+INDEXES = [
+    ('ix_bill_owner_created', 'bill', ['created_by', 'created_at']),
+    ('ix_bill_status_created', 'bill', ['status', 'created_at']),
+    ('ix_expense_owner_category_date', 'expense', ['created_by', 'category_id', 'date']),
+    ('ix_work_entry_user_created', 'work_entry', ['user_id', 'created_at']),
+    ('ix_work_entry_user_start', 'work_entry', ['user_id', 'start_time'])
+]
+
+
+def upgrade(op):
+    for name, table_name, columns in INDEXES:
+        op.create_index(name, table_name, columns)
+
+
+def downgrade(op):
+    for name, table_name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name)
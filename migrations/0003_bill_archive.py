@@ -0,0 +1,54 @@
+"""
+Archive tables for old paid bills (see utils/bill_archive.py)
+
+archived_bill holds one compressed row per archived bill and its items;
+bill_rollup keeps their per-day totals for counts and revenue.
+"""
+
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sa.Table('user', metadata, sa.Column('id', sa.Integer, primary_key=True))
+sa.Table('customer', metadata, sa.Column('id', sa.Integer, primary_key=True))
+
+archived_bill = sa.Table(
+    'archived_bill', metadata,
+    sa.Column('id', sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column('bill_number', sa.String(50), unique=True, nullable=False),
+    sa.Column('customer_id', sa.Integer, sa.ForeignKey('customer.id'), nullable=False, index=True),
+    sa.Column('created_by', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+    sa.Column('total_amount', sa.Float),
+    sa.Column('created_at', sa.DateTime),
+    sa.Column('paid_date', sa.DateTime),
+    sa.Column('archived_at', sa.DateTime),
+    sa.Column('payload', sa.LargeBinary, nullable=False),
+    sa.Index('ix_archived_bill_owner_created', 'created_by', 'created_at')
+)
+
+bill_rollup = sa.Table(
+    'bill_rollup', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('created_by', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+    sa.Column('customer_id', sa.Integer, sa.ForeignKey('customer.id'), nullable=False),
+    sa.Column('day', sa.Date, nullable=False),
+    sa.Column('bill_count', sa.Integer),
+    sa.Column('total_amount', sa.Float),
+    sa.Column('remaining_amount', sa.Float),
+    sa.Column('last_created_at', sa.DateTime),
+    sa.UniqueConstraint('created_by', 'customer_id', 'day', name='uq_bill_rollup_owner_customer_day')
+)
+
+
+def upgrade(op):
+    for table in (archived_bill, bill_rollup):
+        table.create(op.connection, checkfirst=True)
+
+
+def downgrade(op):
+    # Archived bills are only in these tables: dropping them would lose the bills
+    archived = op.execute(sa.select(sa.func.count()).select_from(archived_bill)).scalar()
+    if archived and not op.force:
+        raise RuntimeError(f'{archived} bills are archived; run python archive_bills.py --restore first')
+    for table in (bill_rollup, archived_bill):
+        op.drop_table(table.name)
@@ -0,0 +1,34 @@
+"""
+Link existing expenses to expense_category rows (replaces migrate_expense_categories.py)
+
+Every category name found on an unlinked expense gets a category row, then
+one set-based UPDATE fills expense.category_id through the unique index on
+expense_category.name.
+"""
+
+from datetime import datetime
+import sqlalchemy as sa
+
+expense = sa.table('expense', sa.column('category'), sa.column('category_id'))
+expense_category = sa.table('expense_category', sa.column('id'), sa.column('name'), sa.column('created_at', sa.DateTime))
+
+
+def upgrade(op):
+    existing = {name for (name,) in op.execute(sa.select(expense_category.c.name))}
+    names = [name for (name,) in op.execute(sa.select(expense.c.category).where(
+        expense.c.category_id.is_(None), expense.c.category.isnot(None)
+    ).distinct()) if name and name not in existing]
+    if names:
+        now = datetime.utcnow()
+        op.execute(expense_category.insert(), [{'name': name, 'created_at': now} for name in names])
+
+    op.execute(expense.update().where(expense.c.category_id.is_(None)).values(
+        category_id=sa.select(expense_category.c.id).where(
+            expense_category.c.name == expense.c.category
+        ).scalar_subquery()
+    ))
+
+
+def downgrade(op):
+    # category_id is derived from expense.category; the baseline downgrade drops it
+    pass
@@ -0,0 +1,38 @@
+"""
+Duplicate-detection keys for existing expenses (replaces migrate_expense_import.py)
+
+Without a key an old expense is never matched by the CSV importer, so an
+import of the same statement would add it again.
+"""
+
+from datetime import datetime
+import sqlalchemy as sa
+from utils.expense_import import expense_dedup_key
+
+BATCH_SIZE = 500
+
+expense = sa.table('expense', sa.column('id'), sa.column('date', sa.DateTime), sa.column('amount', sa.Float),
+                   sa.column('title'), sa.column('dedup_key'))
+
+
+def upgrade(op):
+    statement = expense.update().where(expense.c.id == sa.bindparam('expense_id')).values(
+        dedup_key=sa.bindparam('key')
+    )
+    last_id = 0
+    while True:
+        rows = op.execute(sa.select(expense.c.id, expense.c.date, expense.c.amount, expense.c.title).where(
+            expense.c.id > last_id, expense.c.dedup_key.is_(None)
+        ).order_by(expense.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            return
+        op.execute(statement, [
+            {'expense_id': row.id, 'key': expense_dedup_key(row.date or datetime.utcnow(), row.amount, row.title)}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+
+def downgrade(op):
+    # dedup_key is derived from the expense; the baseline downgrade drops it
+    pass
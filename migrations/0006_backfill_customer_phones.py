@@ -0,0 +1,36 @@
+"""
+Normalized phone numbers for existing customers (replaces migrate_work_customers.py, part 1)
+
+Customers are looked up by customer.phone_normalized, so one without it is
+never matched and a duplicate gets created for the same phone.
+"""
+
+import sqlalchemy as sa
+from models import normalize_phone
+
+BATCH_SIZE = 500
+
+customer = sa.table('customer', sa.column('id'), sa.column('phone'), sa.column('phone_normalized'))
+
+
+def upgrade(op):
+    statement = customer.update().where(customer.c.id == sa.bindparam('customer_id')).values(
+        phone_normalized=sa.bindparam('normalized')
+    )
+    last_id = 0
+    while True:
+        rows = op.execute(sa.select(customer.c.id, customer.c.phone).where(
+            customer.c.id > last_id, customer.c.phone_normalized.is_(None), customer.c.phone.isnot(None)
+        ).order_by(customer.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            return
+        params = [{'customer_id': row.id, 'normalized': normalize_phone(row.phone)}
+                  for row in rows if normalize_phone(row.phone)]
+        if params:
+            op.execute(statement, params)
+        last_id = rows[-1].id
+
+
+def downgrade(op):
+    # phone_normalized is derived from customer.phone; the baseline downgrade drops it
+    pass
@@ -0,0 +1,71 @@
+"""
+Link existing work entries to customers (replaces migrate_work_customers.py, part 2)
+
+Each batch resolves the distinct normalized phones of its entries to
+customers, creating one customer per unknown phone (the oldest customer
+wins when several share a phone), and links the batch with one UPDATE.
+"""
+
+from datetime import datetime
+import sqlalchemy as sa
+from models import normalize_phone
+
+BATCH_SIZE = 500
+
+customer = sa.table('customer', sa.column('id'), sa.column('name'), sa.column('email'), sa.column('phone'),
+                    sa.column('phone_normalized'), sa.column('whatsapp'), sa.column('address'),
+                    sa.column('created_at', sa.DateTime))
+work_entry = sa.table('work_entry', sa.column('id'), sa.column('customer_id'), sa.column('customer_name'),
+                      sa.column('customer_phone'))
+
+
+def _customer_ids(op, names_by_phone):
+    found = {}
+
+    def lookup(phones):
+        for customer_id, phone in op.execute(sa.select(customer.c.id, customer.c.phone_normalized).where(
+            customer.c.phone_normalized.in_(phones)
+        ).order_by(customer.c.id.desc())):
+            found[phone] = customer_id
+
+    lookup(list(names_by_phone))
+    missing = [phone for phone in names_by_phone if phone not in found]
+    if missing:
+        now = datetime.utcnow()
+        op.execute(customer.insert(), [{
+            'name': names_by_phone[phone], 'email': None, 'phone': phone, 'phone_normalized': phone,
+            'whatsapp': phone, 'address': '', 'created_at': now
+        } for phone in missing])
+        lookup(missing)
+    return found
+
+
+def upgrade(op):
+    statement = work_entry.update().where(work_entry.c.id == sa.bindparam('entry_id')).values(
+        customer_id=sa.bindparam('linked_customer_id')
+    )
+    last_id = 0
+    while True:
+        rows = op.execute(sa.select(work_entry.c.id, work_entry.c.customer_name, work_entry.c.customer_phone).where(
+            work_entry.c.id > last_id, work_entry.c.customer_id.is_(None)
+        ).order_by(work_entry.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            return
+
+        names_by_phone = {}
+        for row in rows:
+            phone = normalize_phone(row.customer_phone)
+            if phone:
+                names_by_phone.setdefault(phone, row.customer_name)
+        customer_ids = _customer_ids(op, names_by_phone)
+
+        params = [{'entry_id': row.id, 'linked_customer_id': customer_ids[normalize_phone(row.customer_phone)]}
+                  for row in rows if normalize_phone(row.customer_phone)]
+        if params:
+            op.execute(statement, params)
+        last_id = rows[-1].id
+
+
+def downgrade(op):
+    # The links (and customers created for them) stay; the baseline downgrade drops customer_id
+    pass
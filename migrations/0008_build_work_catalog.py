@@ -0,0 +1,39 @@
+"""
+Build the work project/service catalog from existing entries (replaces migrate_work_catalog.py)
+
+Session hooks keep the catalog in step with new and edited entries; this
+counts the entries that predate it, with one GROUP BY per kind.
+"""
+
+from datetime import datetime
+import sqlalchemy as sa
+
+# catalog kind -> work_entry column it indexes
+CATALOG_KINDS = {
+    'project': 'project_name',
+    'service': 'service_type'
+}
+
+work_entry = sa.table('work_entry', sa.column('id'), sa.column('user_id'), sa.column('project_name'),
+                      sa.column('service_type'), sa.column('created_at', sa.DateTime))
+work_catalog_item = sa.table('work_catalog_item', sa.column('user_id'), sa.column('kind'), sa.column('name'),
+                             sa.column('entry_count'), sa.column('last_used_at', sa.DateTime))
+
+
+def upgrade(op):
+    op.execute(work_catalog_item.delete())
+    now = datetime.utcnow()
+    for kind, column_name in CATALOG_KINDS.items():
+        column = work_entry.c[column_name]
+        rows = [
+            {'user_id': user_id, 'kind': kind, 'name': name, 'entry_count': count, 'last_used_at': last_used or now}
+            for user_id, name, count, last_used in op.execute(sa.select(
+                work_entry.c.user_id, column, sa.func.count(work_entry.c.id), sa.func.max(work_entry.c.created_at)
+            ).where(column.isnot(None)).group_by(work_entry.c.user_id, column))
+        ]
+        if rows:
+            op.execute(work_catalog_item.insert(), rows)
+
+
+def downgrade(op):
+    op.execute(work_catalog_item.delete())
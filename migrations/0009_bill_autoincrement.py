@@ -0,0 +1,77 @@
+"""
+Never hand out a bill id twice (SQLite AUTOINCREMENT on bill)
+
+A plain SQLite rowid table gives new rows max(id) + 1, so once the newest
+bills are archived (or deleted) a new bill would get an archived bill's id.
+SQLite cannot add AUTOINCREMENT to a table, so bill is rebuilt with it and
+its sequence starts past every archived id. PostgreSQL sequences already
+never repeat, so nothing changes there.
+"""
+
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sa.Table('user', metadata, sa.Column('id', sa.Integer, primary_key=True))
+sa.Table('customer', metadata, sa.Column('id', sa.Integer, primary_key=True))
+
+# The bill table as of 0002, under a temporary name; indexes follow the rename
+bill = sa.Table(
+    'bill__rebuild', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('bill_number', sa.String(50), unique=True, nullable=False),
+    sa.Column('customer_id', sa.Integer, sa.ForeignKey('customer.id'), nullable=False),
+    sa.Column('created_by', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+    sa.Column('subtotal', sa.Float),
+    sa.Column('tax_rate', sa.Float),
+    sa.Column('tax_amount', sa.Float),
+    sa.Column('discount', sa.Float),
+    sa.Column('total_amount', sa.Float),
+    sa.Column('advance_amount', sa.Float),
+    sa.Column('remaining_amount', sa.Float),
+    sa.Column('status', sa.String(20)),
+    sa.Column('created_at', sa.DateTime),
+    sa.Column('due_date', sa.DateTime),
+    sa.Column('paid_date', sa.DateTime),
+    sa.Column('email_sent', sa.Boolean),
+    sa.Column('whatsapp_sent', sa.Boolean),
+    sa.Column('notes', sa.Text),
+    sqlite_autoincrement=True
+)
+
+INDEXES = [
+    ('ix_bill_customer_id', ['customer_id']),
+    ('ix_bill_owner_status', ['created_by', 'status', 'total_amount', 'created_at']),
+    ('ix_bill_owner_created', ['created_by', 'created_at']),
+    ('ix_bill_status_created', ['status', 'created_at'])
+]
+
+
+def upgrade(op):
+    if op.dialect != 'sqlite':
+        return
+    definition = op.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'bill'").scalar()
+    if 'AUTOINCREMENT' in (definition or '').upper():
+        return
+
+    # bill_item and work_entry keep referring to "bill" by name across the swap
+    op.execute('PRAGMA defer_foreign_keys = ON')
+    bill.create(op.connection)
+    columns = ', '.join(bill.columns.keys())
+    op.execute(f'INSERT INTO bill__rebuild ({columns}) SELECT {columns} FROM bill')
+    op.drop_table('bill')
+    op.execute('ALTER TABLE bill__rebuild RENAME TO bill')
+    for name, columns in INDEXES:
+        op.create_index(name, 'bill', columns)
+
+    last_id = op.execute(
+        'SELECT MAX(id) FROM (SELECT MAX(id) AS id FROM bill UNION ALL SELECT MAX(id) FROM archived_bill)'
+    ).scalar()
+    if last_id:
+        op.execute("DELETE FROM sqlite_sequence WHERE name = 'bill'")
+        op.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('bill', :seq)", {'seq': last_id})
+
+
+def downgrade(op):
+    # AUTOINCREMENT only stops ids being reused; the table stays as it is
+    pass
@@ -0,0 +1,3 @@
+"""
+Schema migrations for Smart Billing System (applied by utils/migrations.py)
+"""
@@ -1,9 +1,22 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import validates
+import re
+from utils.passwords import hash_password, verify_password
+from utils.read_replica import RoutingSession
 
-db = SQLAlchemy()
+# Sessions send reads of @replica_reads views to the replica bind (utils/read_replica.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+def normalize_phone(phone):
+    """Digits-only phone number with Indian country/trunk prefixes removed"""
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) == 12 and digits.startswith('91'):
+        digits = digits[2:]
+    elif len(digits) == 11 and digits.startswith('0'):
+        digits = digits[1:]
+    return digits or None
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -23,10 +36,10 @@ class User(UserMixin, db.Model):
     work_entries = db.relationship('WorkEntry', backref='user', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
     
     def is_admin(self):
         return self.role == 'admin'
@@ -51,20 +64,38 @@ class Customer(db.Model):
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120))
     phone = db.Column(db.String(15))
+    phone_normalized = db.Column(db.String(15), index=True)  # normalize_phone(phone), for lookups
     whatsapp = db.Column(db.String(15))
     address = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     bills = db.relationship('Bill', backref='customer', lazy=True)
+    work_entries = db.relationship('WorkEntry', backref='customer', lazy=True)
+
+    @validates('phone')
+    def _normalize_phone(self, key, phone):
+        self.phone_normalized = normalize_phone(phone)
+        return phone
     
     def __repr__(self):
         return f'<Customer {self.name}>'
 
 class Bill(db.Model):
+    __table_args__ = (
+        # Per-user counts, paid revenue and last bill straight from the index (admin user list)
+        db.Index('ix_bill_owner_status', 'created_by', 'status', 'total_amount', 'created_at'),
+        # Per-user bill lists and reports, newest first
+        db.Index('ix_bill_owner_created', 'created_by', 'created_at'),
+        # Paid revenue by date across users (admin dashboard and analytics)
+        db.Index('ix_bill_status_created', 'status', 'created_at'),
+        # Ids are never reused, so a new bill cannot take an archived bill's id (migration 0009)
+        {'sqlite_autoincrement': True}
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     bill_number = db.Column(db.String(50), unique=True, nullable=False)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False, index=True)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
     # Bill details
@@ -113,24 +144,92 @@ class BillItem(db.Model):
     def __repr__(self):
         return f'<BillItem {self.description}>'
 
+class ArchivedBill(db.Model):
+    """A paid bill moved out of bill/bill_item by utils/bill_archive.py
+
+    The columns used to find it are kept; the whole bill with its items is
+    stored in `payload` as zlib-compressed JSON.
+    """
+    __table_args__ = (
+        # Per-user archive searches, newest first
+        db.Index('ix_archived_bill_owner_created', 'created_by', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # the bill's own id
+    bill_number = db.Column(db.String(50), unique=True, nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False, index=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    total_amount = db.Column(db.Float, default=0.0)
+    created_at = db.Column(db.DateTime)
+    paid_date = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+    customer = db.relationship('Customer')
+
+    def __repr__(self):
+        return f'<ArchivedBill {self.bill_number}>'
+
+class BillRollup(db.Model):
+    """Totals of archived bills per owner, customer and day created (all paid)"""
+    __table_args__ = (
+        db.UniqueConstraint('created_by', 'customer_id', 'day', name='uq_bill_rollup_owner_customer_day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    bill_count = db.Column(db.Integer, default=0)
+    total_amount = db.Column(db.Float, default=0.0)
+    remaining_amount = db.Column(db.Float, default=0.0)
+    last_created_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<BillRollup {self.created_by} {self.day}>'
+
 class Expense(db.Model):
+    __table_args__ = (
+        # Duplicate detection for statement imports (see utils/expense_import.py)
+        db.Index('ix_expense_owner_dedup', 'created_by', 'dedup_key'),
+        # Per-user expense lists by date and the admin user list's last activity
+        db.Index('ix_expense_owner_date', 'created_by', 'date'),
+        # Expense list filtered by category
+        db.Index('ix_expense_owner_category_date', 'created_by', 'category_id', 'date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     amount = db.Column(db.Float, nullable=False)
     category = db.Column(db.String(50), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('expense_category.id'), index=True)
     date = db.Column(db.DateTime, default=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     receipt_path = db.Column(db.String(200))
-    
+    dedup_key = db.Column(db.String(40))  # hash of (date, amount, title), for imports
+
+    category_ref = db.relationship('ExpenseCategory', backref='expenses')
+
     def __repr__(self):
         return f'<Expense {self.title}>'
 
 class WorkEntry(db.Model):
+    __table_args__ = (
+        # Running timers by age, for the timer page and the stale timer sweeper
+        db.Index('ix_work_entry_status_start', 'work_status', 'start_time'),
+        # Per-user entry and open work counts for the admin user list
+        db.Index('ix_work_entry_user_status', 'user_id', 'work_status', 'start_time'),
+        # Per-user work list (newest first) and timesheet (by start time)
+        db.Index('ix_work_entry_user_created', 'user_id', 'created_at'),
+        db.Index('ix_work_entry_user_start', 'user_id', 'start_time'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
     # Customer Information
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), index=True)
     customer_name = db.Column(db.String(100), nullable=False)
     customer_phone = db.Column(db.String(15), nullable=False)
 
@@ -152,6 +251,10 @@ class WorkEntry(db.Model):
     work_status = db.Column(db.String(20), default='in_progress')  # in_progress, completed, delivered
     payment_status = db.Column(db.String(20), default='pending')  # pending, partial, paid
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Invoice this entry was billed on (NULL while unbilled)
+    bill_id = db.Column(db.Integer, db.ForeignKey('bill.id'), index=True)
+    bill = db.relationship('Bill', backref=db.backref('work_entries', lazy=True))
     
     def calculate_duration(self):
         if self.end_time and self.start_time:
@@ -171,6 +274,22 @@ class WorkEntry(db.Model):
     def __repr__(self):
         return f'<WorkEntry {self.project_name}>'
 
+class WorkCatalogItem(db.Model):
+    """Per-user index of the project names and service types used in work entries"""
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'kind', 'name', name='uq_work_catalog_user_kind_name'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # project, service
+    name = db.Column(db.String(100), nullable=False)
+    entry_count = db.Column(db.Integer, default=0)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<WorkCatalogItem {self.kind}:{self.name}>'
+
 class ExpenseCategory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
@@ -212,3 +331,51 @@ class NotificationPreferences(db.Model):
 
     def __repr__(self):
         return f'<NotificationPreferences for User {self.user_id}>'
+
+class ExportJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    # What to export
+    data_type = db.Column(db.String(20), nullable=False)  # bills, expenses, work, all
+    export_format = db.Column(db.String(10), nullable=False)  # csv, csv.gz, ndjson, xlsx
+
+    # Progress
+    status = db.Column(db.String(20), default='queued')  # queued, running, completed, failed
+    total_rows = db.Column(db.Integer, default=0)
+    processed_rows = db.Column(db.Integer, default=0)
+    file_path = db.Column(db.String(300))
+    error = db.Column(db.Text)
+
+    # Id cutoff: highest row ids when the job was created. Later rows are left out;
+    # rows edited or deleted before the job runs are exported as they are then.
+    snapshot_bill_id = db.Column(db.Integer, default=0)
+    snapshot_bill_item_id = db.Column(db.Integer, default=0)
+    snapshot_expense_id = db.Column(db.Integer, default=0)
+    snapshot_work_entry_id = db.Column(db.Integer, default=0)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+    # Relationship
+    user = db.relationship('User', backref=db.backref('export_jobs', lazy=True))
+
+    @property
+    def snapshot(self):
+        return {
+            'bill': self.snapshot_bill_id,
+            'bill_item': self.snapshot_bill_item_id,
+            'expense': self.snapshot_expense_id,
+            'work_entry': self.snapshot_work_entry_id
+        }
+
+    def progress_for(self, processed_rows):
+        """Percentage complete given the rows processed so far"""
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, int(processed_rows * 100 / self.total_rows))
+
+    def __repr__(self):
+        return f'<ExportJob {self.id} {self.data_type}.{self.export_format}>'
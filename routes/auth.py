@@ -1,7 +1,11 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash
+from sqlalchemy import or_
 from models import User, db
+from utils.passwords import PasswordCheckBusy, check_and_upgrade
+from utils.login_throttle import check_login, login_failed, login_succeeded
+from utils.statements import get_or_404
+from utils.users import user_activity
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__)
@@ -25,14 +29,30 @@ def login():
         password = request.form.get('password')
         remember = bool(request.form.get('remember'))
         
+        # Refused attempts never reach the user lookup or the password hash
+        retry_after = check_login(request.remote_addr, email)
+        if retry_after:
+            flash(f'Too many sign-in attempts. Please try again in {retry_after} seconds.', 'error')
+            return render_template('auth/login.html'), 429, {'Retry-After': str(retry_after)}
+        
         user = User.query.filter_by(email=email).first()
         
-        if user and user.check_password(password) and user.is_active:
+        try:
+            valid = user is not None and check_and_upgrade(user, password)
+        except PasswordCheckBusy:
+            flash('Too many sign-ins right now. Please try again in a moment.', 'error')
+            return render_template('auth/login.html'), 503
+        
+        if valid and user.is_active:
+            # Saves a password hash upgraded to the current policy
+            db.session.commit()
+            login_succeeded(request.remote_addr, email)
             login_user(user, remember=remember)
             next_page = request.args.get('next')
             flash(f'Welcome back, {user.username}!', 'success')
             return redirect(next_page) if next_page else redirect(url_for('main.dashboard'))
         else:
+            login_failed(request.remote_addr, email)
             flash('Invalid email or password.', 'error')
     
     return render_template('auth/login.html')
@@ -136,14 +156,22 @@ def logout():
 @login_required
 @admin_required
 def users():
-    users = User.query.all()
-    return render_template('auth/users.html', users=users)
+    page = request.args.get('page', 1, type=int)
+    search = request.args.get('search', '').strip()
+
+    query = User.query
+    if search:
+        query = query.filter(or_(User.username.contains(search), User.email.contains(search)))
+
+    users = query.order_by(User.username).paginate(page=page, per_page=25, error_out=False)
+    activity = user_activity([user.id for user in users.items])
+    return render_template('auth/users.html', users=users, activity=activity, search=search)
 
 @auth_bp.route('/users/<int:user_id>/toggle')
 @login_required
 @admin_required
 def toggle_user(user_id):
-    user = User.query.get_or_404(user_id)
+    user = get_or_404(User, user_id)
     if user.id == current_user.id:
         flash('You cannot deactivate your own account.', 'error')
     else:
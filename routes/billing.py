@@ -1,20 +1,17 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, send_file
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, send_file, abort
 from flask_login import login_required, current_user
-from models import Bill, BillItem, Customer, db
+from models import Bill, BillItem, Customer, WorkEntry, db, normalize_phone
 from datetime import datetime, timedelta
 import os
-from utils.pdf_generator import generate_bill_pdf
 from utils.email_sender import send_bill_email
 from sqlalchemy import and_
 from routes.auth import admin_required
+from utils.customers import customer_activity
+from utils.bill_archive import find_archived_bill, last_bill_id, search_archived_bills
+from utils.statements import get_or_404, lookup
 
-# Try to import WhatsApp functionality, but make it optional
-try:
-    from utils.whatsapp_sender import send_whatsapp_message
-    WHATSAPP_AVAILABLE = True
-except ImportError:
-    WHATSAPP_AVAILABLE = False
-    send_whatsapp_message = None
+# ReportLab (PDFs) and pywhatkit (WhatsApp) are imported where they are used,
+# not when the app starts
 
 billing_bp = Blueprint('billing', __name__)
 
@@ -39,10 +36,16 @@ def bills():
     bills = query.order_by(Bill.created_at.desc()).paginate(
         page=page, per_page=10, error_out=False
     )
+
+    # Searches also look in the bill archive (old paid bills)
+    archived_bills = []
+    if search and status in ('', 'paid'):
+        archived_bills = search_archived_bills(current_user.id, search)
     
     from datetime import datetime
     today = datetime.now().date()
-    return render_template('billing/bills.html', bills=bills, status=status, search=search, today=today)
+    return render_template('billing/bills.html', bills=bills, status=status, search=search, today=today,
+                         archived_bills=archived_bills)
 
 @billing_bp.route('/bills/create', methods=['GET', 'POST'])
 @login_required
@@ -53,8 +56,12 @@ def create():
         customer_email = request.form.get('customer_email')
         customer_contact = request.form.get('customer_contact')
 
-        # Check if customer exists
+        # Check if customer exists (by email, then by normalized phone)
         customer = Customer.query.filter_by(email=customer_email).first()
+        if not customer and normalize_phone(customer_contact):
+            customer = Customer.query.filter_by(
+                phone_normalized=normalize_phone(customer_contact)
+            ).order_by(Customer.id).first()
         if not customer:
             customer = Customer(
                 name=customer_name,
@@ -67,8 +74,7 @@ def create():
             db.session.flush()
         
         # Generate bill number
-        last_bill = Bill.query.order_by(Bill.id.desc()).first()
-        bill_number = f"INV-{(last_bill.id + 1) if last_bill else 1:06d}"
+        bill_number = f"INV-{last_bill_id() + 1:06d}"
         
         # Get advance amount
         advance_amount = float(request.form.get('advance_amount', 0))
@@ -133,7 +139,13 @@ def create():
 @billing_bp.route('/bills/<int:id>')
 @login_required
 def view(id):
-    bill = Bill.query.get_or_404(id)
+    bill = lookup(Bill, id)
+    if bill is None:
+        # Old paid bills are only in the archive
+        archived = find_archived_bill(id, current_user.id)
+        if archived is None:
+            abort(404)
+        return render_template('billing/view.html', bill=archived, archived=True)
     
     if bill.created_by != current_user.id:
         flash('You do not have permission to view this bill.', 'error')
@@ -144,7 +156,7 @@ def view(id):
 @billing_bp.route('/bills/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit(id):
-    bill = Bill.query.get_or_404(id)
+    bill = get_or_404(Bill, id)
     
     if bill.created_by != current_user.id:
         flash('You do not have permission to edit this bill.', 'error')
@@ -208,19 +220,22 @@ def edit(id):
 @billing_bp.route('/bills/<int:id>/pdf')
 @login_required
 def download_pdf(id):
-    bill = Bill.query.get_or_404(id)
+    bill = lookup(Bill, id) or find_archived_bill(id, current_user.id)
+    if bill is None:
+        abort(404)
     
     if bill.created_by != current_user.id:
         flash('You do not have permission to access this bill.', 'error')
         return redirect(url_for('billing.bills'))
     
+    from utils.pdf_generator import generate_bill_pdf
     pdf_path = generate_bill_pdf(bill)
     return send_file(pdf_path, as_attachment=True, download_name=f'{bill.bill_number}.pdf')
 
 @billing_bp.route('/bills/<int:id>/send', methods=['POST'])
 @login_required
 def send_bill(id):
-    bill = Bill.query.get_or_404(id)
+    bill = get_or_404(Bill, id)
     
     if bill.created_by != current_user.id:
         return jsonify({'success': False, 'message': 'Permission denied'})
@@ -230,6 +245,7 @@ def send_bill(id):
     
     success = True
     messages = []
+    from utils.pdf_generator import generate_bill_pdf
     
     if send_email and bill.customer.email:
         try:
@@ -242,7 +258,8 @@ def send_bill(id):
             messages.append(f'Email failed: {str(e)}')
     
     if send_whatsapp and bill.customer.whatsapp:
-        if not WHATSAPP_AVAILABLE:
+        from utils.whatsapp_sender import load_pywhatkit, send_whatsapp_message
+        if load_pywhatkit() is None:
             success = False
             messages.append('WhatsApp functionality is not available in this environment')
         else:
@@ -268,7 +285,7 @@ def send_bill(id):
 @billing_bp.route('/bills/<int:id>/status', methods=['POST'])
 @login_required
 def update_status(id):
-    bill = Bill.query.get_or_404(id)
+    bill = get_or_404(Bill, id)
 
     if bill.created_by != current_user.id:
         return jsonify({'success': False, 'message': 'Permission denied'})
@@ -289,7 +306,7 @@ def update_status(id):
 @billing_bp.route('/bills/<int:id>/payment', methods=['POST'])
 @login_required
 def update_payment(id):
-    bill = Bill.query.get_or_404(id)
+    bill = get_or_404(Bill, id)
 
     if bill.created_by != current_user.id:
         return jsonify({'success': False, 'message': 'Permission denied'})
@@ -332,15 +349,14 @@ def update_payment(id):
 @billing_bp.route('/bills/<int:id>/duplicate', methods=['POST'])
 @login_required
 def duplicate_bill(id):
-    original_bill = Bill.query.get_or_404(id)
+    original_bill = get_or_404(Bill, id)
 
     if original_bill.created_by != current_user.id:
         return jsonify({'success': False, 'message': 'Permission denied'})
 
     try:
         # Generate new bill number
-        last_bill = Bill.query.order_by(Bill.id.desc()).first()
-        bill_number = f"INV-{(last_bill.id + 1) if last_bill else 1:06d}"
+        bill_number = f"INV-{last_bill_id() + 1:06d}"
 
         # Create duplicate bill
         new_bill = Bill(
@@ -384,7 +400,7 @@ def duplicate_bill(id):
 @billing_bp.route('/bills/<int:id>', methods=['DELETE'])
 @login_required
 def delete_bill(id):
-    bill = Bill.query.get_or_404(id)
+    bill = get_or_404(Bill, id)
 
     if bill.created_by != current_user.id:
         return jsonify({'success': False, 'message': 'Permission denied'})
@@ -396,6 +412,9 @@ def delete_bill(id):
         # Delete bill items first (cascade should handle this, but being explicit)
         BillItem.query.filter_by(bill_id=bill.id).delete()
 
+        # Work entries on this bill become billable again
+        WorkEntry.query.filter_by(bill_id=bill.id).update({'bill_id': None}, synchronize_session=False)
+
         # Delete the bill
         db.session.delete(bill)
         db.session.commit()
@@ -471,13 +490,51 @@ def all_invoices():
         page=page, per_page=20, error_out=False
     )
 
+    # Searches also look in the bill archive (old paid bills)
+    archived_bills = []
+    if search and status in ('', 'paid'):
+        archived_bills = search_archived_bills(current_user.id, search)
+
     from datetime import datetime
     today = datetime.now().date()
     return render_template('billing/all_invoices.html', bills=bills,
-                         status=status, search=search, date_from=date_from, date_to=date_to, today=today)
+                         status=status, search=search, date_from=date_from, date_to=date_to, today=today,
+                         archived_bills=archived_bills)
 
 @billing_bp.route('/customers')
 @login_required
 def customers():
-    customers = Customer.query.all()
-    return render_template('billing/customers.html', customers=customers)
+    page = request.args.get('page', 1, type=int)
+    search = request.args.get('search', '')
+
+    query = Customer.query
+    if search:
+        phone = normalize_phone(search)
+        if phone:
+            query = query.filter(Customer.phone_normalized.startswith(phone))
+        else:
+            query = query.filter(Customer.name.contains(search))
+
+    customers = query.order_by(Customer.name).paginate(page=page, per_page=20, error_out=False)
+    activity = customer_activity(current_user.id, [customer.id for customer in customers.items])
+    return render_template('billing/customers.html', customers=customers, activity=activity, search=search)
+
+@billing_bp.route('/customers/<int:id>')
+@login_required
+def customer_detail(id):
+    customer = get_or_404(Customer, id)
+
+    # Both lists are indexed lookups on customer_id
+    bills = Bill.query.filter_by(customer_id=customer.id, created_by=current_user.id).order_by(
+        Bill.created_at.desc()
+    ).limit(50).all()
+    work_entries = WorkEntry.query.filter_by(customer_id=customer.id, user_id=current_user.id).order_by(
+        WorkEntry.start_time.desc()
+    ).limit(50).all()
+    activity = customer_activity(current_user.id, [customer.id])[customer.id]
+    archived_bills = []
+    if activity['bills'] > len(bills):
+        archived_bills = search_archived_bills(current_user.id, customer_id=customer.id, limit=50)
+
+    return render_template('billing/customer_detail.html', customer=customer, bills=bills,
+                         work_entries=work_entries, activity=activity, archived_bills=archived_bills)
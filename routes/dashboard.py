@@ -1,16 +1,38 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
-from models import Bill, Expense, WorkEntry, User, db
+from models import Bill, BillRollup, Expense, WorkEntry, User, db
 from sqlalchemy import func, extract
 from datetime import datetime, timedelta
 from routes.auth import admin_required
+from utils.bill_archive import archived_totals, merge_rows, rollup_query
+from utils.query_stats import ROUTE_ORDER, query_stats
+from utils.read_replica import replica_reads
+from utils.expense_categories import category_names_by_id
 import json
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+def _name_categories(rows):
+    """Turn (category_id, total) rows into {'category', 'total'} dicts"""
+    names = category_names_by_id()
+    return [{'category': names.get(row.category_id, 'Uncategorized'), 'total': row.total} for row in rows]
+
+def _archive_owner():
+    """Owner filter for bill rollups: everyone for admins, like the bill queries"""
+    return None if current_user.is_admin() else current_user.id
+
+def _archived_monthly_revenue(start_date):
+    """Revenue of archived (paid) bills by month, labelled like the revenue queries"""
+    month = func.strftime('%Y-%m', BillRollup.day)
+    return rollup_query(
+        month.label('month'), func.sum(BillRollup.total_amount).label('total'),
+        created_by=_archive_owner(), start=start_date
+    ).group_by(month).all()
+
 @dashboard_bp.route('/analytics')
 @login_required
 @admin_required
+@replica_reads
 def analytics():
     # Get date range from query parameters
     period = request.args.get('period', '12months')  # 12months, 6months, 3months, 1month
@@ -38,7 +60,7 @@ def analytics():
     if not current_user.is_admin():
         revenue_query = revenue_query.filter(Bill.created_by == current_user.id)
     
-    revenue_data = revenue_query.all()
+    revenue_data = merge_rows(revenue_query.all(), _archived_monthly_revenue(start_date), 'month')
     
     # Expense data - SQLite compatible
     expense_query = db.session.query(
@@ -69,16 +91,16 @@ def analytics():
     
     # Category-wise expense breakdown
     category_query = db.session.query(
-        Expense.category,
+        Expense.category_id,
         func.sum(Expense.amount).label('total')
     ).filter(
         Expense.date >= start_date
-    ).group_by(Expense.category)
+    ).group_by(Expense.category_id)
     
     if not current_user.is_admin():
         category_query = category_query.filter(Expense.created_by == current_user.id)
     
-    category_data = category_query.all()
+    category_data = _name_categories(category_query.all())
     
     # Bill status breakdown
     status_query = db.session.query(
@@ -92,7 +114,13 @@ def analytics():
     if not current_user.is_admin():
         status_query = status_query.filter(Bill.created_by == current_user.id)
     
-    status_data = status_query.all()
+    archived_status = rollup_query(
+        db.literal('paid').label('status'),
+        func.sum(BillRollup.bill_count).label('count'),
+        func.sum(BillRollup.total_amount).label('total'),
+        created_by=_archive_owner(), start=start_date
+    ).having(func.count(BillRollup.id) > 0)
+    status_data = merge_rows(status_query.all(), archived_status.all(), 'status')
     
     # Top customers (by total bill amount)
     customer_query = db.session.query(
@@ -101,12 +129,19 @@ def analytics():
         func.count(Bill.id).label('bill_count')
     ).filter(
         Bill.created_at >= start_date
-    ).group_by(Bill.customer_id).order_by(func.sum(Bill.total_amount).desc()).limit(10)
+    ).group_by(Bill.customer_id)
     
     if not current_user.is_admin():
         customer_query = customer_query.filter(Bill.created_by == current_user.id)
     
-    top_customers = customer_query.all()
+    archived_customers = rollup_query(
+        BillRollup.customer_id,
+        func.sum(BillRollup.total_amount).label('total_amount'),
+        func.sum(BillRollup.bill_count).label('bill_count'),
+        created_by=_archive_owner(), start=start_date
+    ).group_by(BillRollup.customer_id)
+    top_customers = sorted(merge_rows(customer_query.all(), archived_customers.all(), 'customer_id'),
+                           key=lambda row: row.total_amount or 0, reverse=True)[:10]
     
     # Calculate totals
     total_revenue = sum(item.total for item in revenue_data)
@@ -151,6 +186,7 @@ def analytics():
 
 @dashboard_bp.route('/api/chart-data')
 @login_required
+@replica_reads
 def chart_data():
     chart_type = request.args.get('type', 'revenue')
     period = request.args.get('period', '12months')
@@ -178,7 +214,7 @@ def chart_data():
         if not current_user.is_admin():
             query = query.filter(Bill.created_by == current_user.id)
         
-        data = query.all()
+        data = merge_rows(query.all(), _archived_monthly_revenue(start_date), 'month')
         
         return jsonify({
             'labels': [item.month for item in data],
@@ -218,7 +254,9 @@ def chart_data():
         if not current_user.is_admin():
             revenue_query = revenue_query.filter(Bill.created_by == current_user.id)
         
-        revenue_data = {item.month: float(item.total) for item in revenue_query.all()}
+        revenue_data = {item.month: float(item.total) for item in merge_rows(
+            revenue_query.all(), _archived_monthly_revenue(start_date), 'month'
+        )}
 
         # Get expense data
         expense_query = db.session.query(
@@ -253,20 +291,20 @@ def chart_data():
     
     elif chart_type == 'category_expenses':
         query = db.session.query(
-            Expense.category,
+            Expense.category_id,
             func.sum(Expense.amount).label('total')
         ).filter(
             Expense.date >= start_date
-        ).group_by(Expense.category)
+        ).group_by(Expense.category_id)
         
         if not current_user.is_admin():
             query = query.filter(Expense.created_by == current_user.id)
         
-        data = query.all()
+        data = _name_categories(query.all())
         
         return jsonify({
-            'labels': [item.category for item in data],
-            'data': [float(item.total) for item in data],
+            'labels': [item['category'] for item in data],
+            'data': [float(item['total']) for item in data],
             'label': 'Expenses by Category'
         })
     
@@ -274,6 +312,7 @@ def chart_data():
 
 @dashboard_bp.route('/profit-loss')
 @login_required
+@replica_reads
 def profit_loss():
     # Get date range from query parameters
     start_date = request.args.get('start_date')
@@ -297,7 +336,9 @@ def profit_loss():
     if not current_user.is_admin():
         revenue_query = revenue_query.filter(Bill.created_by == current_user.id)
     
-    total_revenue = revenue_query.scalar() or 0
+    total_revenue = (revenue_query.scalar() or 0) + archived_totals(
+        created_by=_archive_owner(), start=start_dt, end=end_dt
+    )[1]
     
     # Expense calculation
     expense_query = db.session.query(func.sum(Expense.amount)).filter(
@@ -321,3 +362,22 @@ def profit_loss():
                          profit_margin=profit_margin,
                          start_date=start_date,
                          end_date=end_date)
+
+@dashboard_bp.route('/query-stats')
+@login_required
+@admin_required
+def query_stats_page():
+    """Worst routes by query count, database time or Python overhead, and recent slow queries"""
+    order = request.args.get('order', 'db')
+    if order not in ROUTE_ORDER:
+        order = 'db'
+    return render_template('dashboard/query_stats.html', stats=query_stats(order), order=order,
+                           enabled=current_app.config['QUERY_STATS'],
+                           slow_ms=current_app.config['SLOW_QUERY_MS'])
+
+@dashboard_bp.route('/api/query-stats')
+@login_required
+@admin_required
+def query_stats_data():
+    """Per-route query statistics of this worker (QUERY_STATS=True)"""
+    return jsonify(query_stats(request.args.get('order', 'python')))
@@ -1,12 +1,40 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, abort
 from flask_login import login_required, current_user
 from models import Expense, ExpenseCategory, db
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import false, func
 from routes.auth import admin_required
+from utils.expense_categories import category_id, category_names, category_names_by_id
+from utils.expense_import import COLUMN_ALIASES, import_expenses
+from utils.read_replica import replica_reads
+from utils.statements import get_or_404
+from utils.receipts import VARIANTS, is_image, queue_variants, receipt_folder, release_receipt, store_receipt, variant_name
+from utils.uploads import send_upload
+import csv
+import io
+import os
 
 expense_bp = Blueprint('expense', __name__)
 
+def _filter_category(query, category):
+    """Filter expenses on the indexed category id of a category name"""
+    if not category:
+        return query
+    selected_id = category_id(category)
+    if selected_id is None:
+        return query.filter(false())
+    return query.filter(Expense.category_id == selected_id)
+
+def _save_receipt():
+    """Store an uploaded receipt; returns (path or None, error message or None)"""
+    file = request.files.get('receipt')
+    if not file or not file.filename:
+        return None, None
+    try:
+        return store_receipt(file), None
+    except ValueError as e:
+        return None, str(e)
+
 @expense_bp.route('/')
 @login_required
 def expenses():
@@ -15,10 +43,7 @@ def expenses():
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
     
-    query = Expense.query.filter_by(created_by=current_user.id)
-    
-    if category:
-        query = query.filter_by(category=category)
+    query = _filter_category(Expense.query.filter_by(created_by=current_user.id), category)
     
     if start_date:
         query = query.filter(Expense.date >= datetime.strptime(start_date, '%Y-%m-%d'))
@@ -30,16 +55,12 @@ def expenses():
         page=page, per_page=10, error_out=False
     )
     
-    # Get categories for filter
-    categories = db.session.query(Expense.category).distinct().all()
-    categories = [c[0] for c in categories]
-    
     # Calculate total for current filter
     total_amount = query.with_entities(func.sum(Expense.amount)).scalar() or 0
     
     return render_template('expense/expenses.html', 
                          expenses=expenses, 
-                         categories=categories,
+                         categories=category_names(),
                          selected_category=category,
                          start_date=start_date,
                          end_date=end_date,
@@ -55,43 +76,68 @@ def create():
         category = request.form.get('category')
         date = datetime.strptime(request.form.get('date'), '%Y-%m-%d')
         
+        receipt_path, error = _save_receipt()
+        if error:
+            flash(error, 'error')
+            return redirect(url_for('expense.create'))
+        
         expense = Expense(
             title=title,
             description=description,
             amount=amount,
             category=category,
             date=date,
-            created_by=current_user.id
+            created_by=current_user.id,
+            receipt_path=receipt_path
         )
         
         db.session.add(expense)
         db.session.commit()
         
+        if receipt_path:
+            queue_variants(receipt_path)
+        
         flash('Expense added successfully!', 'success')
         return redirect(url_for('expense.expenses'))
     
-    # Get existing categories
-    categories = db.session.query(Expense.category).distinct().all()
-    categories = [c[0] for c in categories if c[0]]
-    
-    # Default categories
-    default_categories = [
-        'Office Supplies', 'Travel', 'Meals', 'Utilities', 'Software', 
-        'Marketing', 'Equipment', 'Rent', 'Insurance', 'Other'
-    ]
-    
-    # Combine and remove duplicates
-    all_categories = list(set(categories + default_categories))
-    all_categories.sort()
-    
     from datetime import date
     today = date.today().strftime('%Y-%m-%d')
-    return render_template('expense/create.html', categories=all_categories, today=today)
+    return render_template('expense/create.html', categories=category_names(), today=today)
+
+@expense_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_csv():
+    report = None
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename:
+            flash('Please choose a CSV file to import.', 'error')
+        elif not file.filename.lower().endswith(('.csv', '.txt')):
+            flash('Only CSV files can be imported.', 'error')
+        else:
+            overrides = {field: request.form.get(f'column_{field}', '').strip() for field in COLUMN_ALIASES}
+            # Read straight from the uploaded file, one chunk of rows at a time
+            stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', errors='replace', newline='')
+            try:
+                report = import_expenses(
+                    current_user.id, stream, overrides=overrides,
+                    default_category=request.form.get('default_category') or 'Other',
+                    date_format=request.form.get('date_format') or None,
+                    dry_run=bool(request.form.get('dry_run'))
+                )
+            except (ValueError, csv.Error) as e:
+                db.session.rollback()
+                flash(f'Import failed: {str(e)}', 'error')
+            else:
+                if not report['dry_run']:
+                    flash(f"Imported {report['imported']} expenses.", 'success')
+    
+    return render_template('expense/import.html', report=report, categories=category_names())
 
 @expense_bp.route('/<int:id>')
 @login_required
 def view(id):
-    expense = Expense.query.get_or_404(id)
+    expense = get_or_404(Expense, id)
     
     if expense.created_by != current_user.id:
         flash('You do not have permission to view this expense.', 'error')
@@ -102,7 +148,7 @@ def view(id):
 @expense_bp.route('/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit(id):
-    expense = Expense.query.get_or_404(id)
+    expense = get_or_404(Expense, id)
     
     if expense.created_by != current_user.id:
         flash('You do not have permission to edit this expense.', 'error')
@@ -115,44 +161,69 @@ def edit(id):
         expense.category = request.form.get('category')
         expense.date = datetime.strptime(request.form.get('date'), '%Y-%m-%d')
         
+        receipt_path, error = _save_receipt()
+        if error:
+            db.session.rollback()
+            flash(error, 'error')
+            return redirect(url_for('expense.edit', id=expense.id))
+        
+        old_receipt = expense.receipt_path
+        if receipt_path:
+            expense.receipt_path = receipt_path
+        
         db.session.commit()
         
+        if receipt_path and receipt_path != old_receipt:
+            queue_variants(receipt_path)
+            release_receipt(old_receipt)
+        
         flash('Expense updated successfully!', 'success')
         return redirect(url_for('expense.view', id=expense.id))
     
-    # Get existing categories
-    categories = db.session.query(Expense.category).distinct().all()
-    categories = [c[0] for c in categories if c[0]]
-    
-    # Default categories
-    default_categories = [
-        'Office Supplies', 'Travel', 'Meals', 'Utilities', 'Software', 
-        'Marketing', 'Equipment', 'Rent', 'Insurance', 'Other'
-    ]
-    
-    # Combine and remove duplicates
-    all_categories = list(set(categories + default_categories))
-    all_categories.sort()
-    
-    return render_template('expense/edit.html', expense=expense, categories=all_categories)
+    return render_template('expense/edit.html', expense=expense, categories=category_names())
+
+@expense_bp.route('/receipts/<path:receipt_path>')
+@login_required
+def receipt(receipt_path):
+    """Serve a receipt, or one of its resized copies with ?size=thumb|large"""
+    owned = Expense.query.filter_by(created_by=current_user.id, receipt_path=receipt_path).first()
+    if owned is None:
+        abort(404)
+    
+    folder = receipt_folder()
+    filename = receipt_path
+    final = True
+    size = request.args.get('size')
+    if size in VARIANTS and is_image(receipt_path):
+        filename = variant_name(receipt_path, size)
+        if not os.path.exists(os.path.join(folder, filename)):
+            # Still being generated: serve the original without caching it under this URL
+            filename = receipt_path
+            final = False
+    
+    # Names are content hashes, so a URL always returns the same bytes
+    return send_upload(folder, filename, immutable=final)
 
 @expense_bp.route('/<int:id>/delete', methods=['POST'])
 @login_required
 def delete(id):
-    expense = Expense.query.get_or_404(id)
+    expense = get_or_404(Expense, id)
     
     if expense.created_by != current_user.id:
         flash('You do not have permission to delete this expense.', 'error')
         return redirect(url_for('expense.expenses'))
     
+    receipt_path = expense.receipt_path
     db.session.delete(expense)
     db.session.commit()
+    release_receipt(receipt_path)
     
     flash('Expense deleted successfully!', 'success')
     return redirect(url_for('expense.expenses'))
 
 @expense_bp.route('/reports')
 @login_required
+@replica_reads
 def reports():
     # Get date range from query parameters
     start_date = request.args.get('start_date')
@@ -167,24 +238,23 @@ def reports():
     if end_date:
         query = query.filter(Expense.date <= datetime.strptime(end_date, '%Y-%m-%d'))
     
-    if category:
-        query = query.filter_by(category=category)
+    query = _filter_category(query, category)
     
     expenses = query.all()
     
     # Calculate statistics
     total_amount = sum(expense.amount for expense in expenses)
     
-    # Group by category
+    # Group by category id
+    names = category_names_by_id()
     category_stats = {}
-    for expense in expenses:
-        if expense.category not in category_stats:
-            category_stats[expense.category] = {
-                'amount': 0,
-                'count': 0
-            }
-        category_stats[expense.category]['amount'] += expense.amount
-        category_stats[expense.category]['count'] += 1
+    for expense_category_id, amount, count in query.with_entities(
+        Expense.category_id, func.sum(Expense.amount), func.count(Expense.id)
+    ).group_by(Expense.category_id):
+        category_stats[names.get(expense_category_id, 'Uncategorized')] = {
+            'amount': float(amount or 0),
+            'count': count
+        }
     
     # Group by month
     monthly_stats = {}
@@ -194,16 +264,12 @@ def reports():
             monthly_stats[month_key] = 0
         monthly_stats[month_key] += expense.amount
     
-    # Get categories for filter
-    categories = db.session.query(Expense.category).distinct().all()
-    categories = [c[0] for c in categories if c[0]]
-    
     return render_template('expense/reports.html',
                          expenses=expenses,
                          total_amount=total_amount,
                          category_stats=category_stats,
                          monthly_stats=monthly_stats,
-                         categories=categories,
+                         categories=category_names(),
                          start_date=start_date,
                          end_date=end_date,
                          selected_category=category)
@@ -212,5 +278,5 @@ def reports():
 @login_required
 @admin_required
 def categories():
-    categories = ExpenseCategory.query.all()
+    categories = ExpenseCategory.query.order_by(ExpenseCategory.name).all()
     return render_template('expense/categories.html', categories=categories)
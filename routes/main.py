@@ -1,10 +1,17 @@
-from flask import Blueprint, render_template, redirect, url_for, send_file, make_response, jsonify
+from flask import Blueprint, render_template, redirect, url_for, send_file, jsonify, Response, stream_with_context, request, current_app
 from flask_login import login_required, current_user
-from models import Bill, Expense, WorkEntry, User, Customer, BillItem, db
-from sqlalchemy import func
+from models import ExportJob, db
 from datetime import datetime, timedelta
-import csv
-import io
+from utils.export_engine import (
+    EXPORT_FORMATS, available_formats, count_rows, create_export_job, export_filename,
+    fail_stale_job, iter_export, read_progress, write_export
+)
+from utils.bill_archive import archived_totals
+from utils.read_replica import replica_reads
+from utils.statements import get_or_404, objects, scalar
+from utils.summary import get_user_summary
+import os
+import tempfile
 
 main_bp = Blueprint('main', __name__)
 
@@ -30,74 +37,54 @@ def dashboard():
 
 def admin_dashboard(current_month, next_month, today):
     """Admin dashboard with full system statistics"""
+    month = {'start': current_month, 'end': next_month}
+
     # Bills statistics (all users)
-    total_bills = Bill.query.count()
-    monthly_bills = Bill.query.filter(
-        Bill.created_at >= current_month,
-        Bill.created_at < next_month
-    ).count()
+    total_bills = scalar('bill_count')
+    monthly_bills = scalar('bill_count_between', **month)
 
     # Revenue statistics (all users)
-    total_revenue = db.session.query(func.sum(Bill.total_amount)).filter(
-        Bill.status == 'paid'
-    ).scalar() or 0
-
-    monthly_revenue = db.session.query(func.sum(Bill.total_amount)).filter(
-        Bill.status == 'paid',
-        Bill.created_at >= current_month,
-        Bill.created_at < next_month
-    ).scalar() or 0
+    total_revenue = scalar('paid_revenue') or 0
+    monthly_revenue = scalar('paid_revenue_between', **month) or 0
 
     # Expense statistics (all users)
-    total_expenses = db.session.query(func.sum(Expense.amount)).scalar() or 0
-    monthly_expenses = db.session.query(func.sum(Expense.amount)).filter(
-        Expense.date >= current_month,
-        Expense.date < next_month
-    ).scalar() or 0
+    total_expenses = scalar('expense_total') or 0
+    monthly_expenses = scalar('expense_total_between', **month) or 0
 
     # Remaining amount statistics (all users)
-    total_remaining = db.session.query(func.sum(Bill.remaining_amount)).scalar() or 0
-    monthly_remaining = db.session.query(func.sum(Bill.remaining_amount)).filter(
-        Bill.created_at >= current_month,
-        Bill.created_at < next_month
-    ).scalar() or 0
+    total_remaining = scalar('bill_remaining') or 0
+    monthly_remaining = scalar('bill_remaining_between', **month) or 0
+
+    # Archived bills (all paid) from their rollups
+    archived_bills, archived_revenue, archived_remaining = archived_totals()
+    archived_monthly_bills, archived_monthly_revenue, archived_monthly_remaining = archived_totals(
+        start=current_month, end=next_month
+    )
+    total_bills += archived_bills
+    monthly_bills += archived_monthly_bills
+    total_revenue += archived_revenue
+    monthly_revenue += archived_monthly_revenue
+    total_remaining += archived_remaining
+    monthly_remaining += archived_monthly_remaining
 
     # Work Entry statistics (all users)
-    from models import WorkEntry
-    total_work_entries = WorkEntry.query.count()
-    monthly_work_entries = WorkEntry.query.filter(
-        WorkEntry.created_at >= current_month,
-        WorkEntry.created_at < next_month
-    ).count()
+    total_work_entries = scalar('work_count')
+    monthly_work_entries = scalar('work_count_between', **month)
 
     # Work status breakdown (all users)
-    pending_work = WorkEntry.query.filter(
-        WorkEntry.work_status == 'pending'
-    ).count()
-    in_progress_work = WorkEntry.query.filter(
-        WorkEntry.work_status == 'in_progress'
-    ).count()
-    completed_work = WorkEntry.query.filter(
-        WorkEntry.work_status == 'completed'
-    ).count()
-    delivered_work = WorkEntry.query.filter(
-        WorkEntry.work_status == 'delivered'
-    ).count()
+    pending_work = scalar('work_status_count', status='pending')
+    in_progress_work = scalar('work_status_count', status='in_progress')
+    completed_work = scalar('work_status_count', status='completed')
+    delivered_work = scalar('work_status_count', status='delivered')
 
     # Work revenue (all users)
-    work_revenue = db.session.query(func.sum(WorkEntry.total_amount)).filter(
-        WorkEntry.payment_status == 'paid'
-    ).scalar() or 0
-    monthly_work_revenue = db.session.query(func.sum(WorkEntry.total_amount)).filter(
-        WorkEntry.payment_status == 'paid',
-        WorkEntry.created_at >= current_month,
-        WorkEntry.created_at < next_month
-    ).scalar() or 0
+    work_revenue = scalar('work_paid_revenue') or 0
+    monthly_work_revenue = scalar('work_paid_revenue_between', **month) or 0
 
     # Recent activities (all users)
-    recent_bills = Bill.query.order_by(Bill.created_at.desc()).limit(5).all()
-    recent_expenses = Expense.query.order_by(Expense.date.desc()).limit(5).all()
-    recent_work = WorkEntry.query.order_by(WorkEntry.created_at.desc()).limit(5).all()
+    recent_bills = objects('recent_bills')
+    recent_expenses = objects('recent_expenses')
+    recent_work = objects('recent_work')
 
     # Profit calculation
     total_combined_revenue = total_revenue + work_revenue
@@ -106,22 +93,15 @@ def admin_dashboard(current_month, next_month, today):
     total_profit = total_combined_revenue - total_expenses
 
     # Pending payments (bills + work entries) - all users
-    pending_bill_payments = db.session.query(func.sum(Bill.remaining_amount)).filter(
-        Bill.remaining_amount > 0
-    ).scalar() or 0
-    pending_work_payments = db.session.query(func.sum(WorkEntry.remaining_amount)).filter(
-        WorkEntry.remaining_amount > 0
-    ).scalar() or 0
+    pending_bill_payments = (scalar('bill_pending') or 0) + archived_remaining
+    pending_work_payments = scalar('work_pending') or 0
     total_pending_payments = pending_bill_payments + pending_work_payments
 
     # Today's tasks (all users)
-    today_work = WorkEntry.query.filter(
-        WorkEntry.work_status.in_(['pending', 'in_progress']),
-        func.date(WorkEntry.created_at) == today
-    ).count()
+    today_work = scalar('work_open_today', today=today)
 
     # Total users count
-    total_users = User.query.count()
+    total_users = scalar('user_count')
 
     stats = {
         'total_bills': total_bills,
@@ -157,83 +137,51 @@ def admin_dashboard(current_month, next_month, today):
 
 def user_dashboard(current_month, next_month, today):
     """User dashboard with limited personal statistics"""
+    owner = current_user.id
+    month = {'start': current_month, 'end': next_month}
+
     # Bills statistics (user only)
-    total_bills = Bill.query.filter_by(created_by=current_user.id).count()
-    monthly_bills = Bill.query.filter(
-        Bill.created_by == current_user.id,
-        Bill.created_at >= current_month,
-        Bill.created_at < next_month
-    ).count()
+    total_bills = scalar('bill_count', owner)
+    monthly_bills = scalar('bill_count_between', owner, **month)
 
     # Revenue statistics (user only)
-    total_revenue = db.session.query(func.sum(Bill.total_amount)).filter(
-        Bill.created_by == current_user.id,
-        Bill.status == 'paid'
-    ).scalar() or 0
-
-    monthly_revenue = db.session.query(func.sum(Bill.total_amount)).filter(
-        Bill.created_by == current_user.id,
-        Bill.status == 'paid',
-        Bill.created_at >= current_month,
-        Bill.created_at < next_month
-    ).scalar() or 0
+    total_revenue = scalar('paid_revenue', owner) or 0
+    monthly_revenue = scalar('paid_revenue_between', owner, **month) or 0
+
+    # Archived bills (all paid) from their rollups
+    archived_bills, archived_revenue, archived_remaining = archived_totals(created_by=owner)
+    archived_monthly_bills, archived_monthly_revenue, _ = archived_totals(
+        created_by=owner, start=current_month, end=next_month
+    )
+    total_bills += archived_bills
+    monthly_bills += archived_monthly_bills
+    total_revenue += archived_revenue
+    monthly_revenue += archived_monthly_revenue
 
     # Work Entry statistics (user only)
-    from models import WorkEntry
-    total_work_entries = WorkEntry.query.filter_by(user_id=current_user.id).count()
-    monthly_work_entries = WorkEntry.query.filter(
-        WorkEntry.user_id == current_user.id,
-        WorkEntry.created_at >= current_month,
-        WorkEntry.created_at < next_month
-    ).count()
+    total_work_entries = scalar('work_count', owner)
+    monthly_work_entries = scalar('work_count_between', owner, **month)
 
     # Work status breakdown (user only)
-    pending_work = WorkEntry.query.filter(
-        WorkEntry.user_id == current_user.id,
-        WorkEntry.work_status == 'pending'
-    ).count()
-    in_progress_work = WorkEntry.query.filter(
-        WorkEntry.user_id == current_user.id,
-        WorkEntry.work_status == 'in_progress'
-    ).count()
-    completed_work = WorkEntry.query.filter(
-        WorkEntry.user_id == current_user.id,
-        WorkEntry.work_status == 'completed'
-    ).count()
+    pending_work = scalar('work_status_count', owner, status='pending')
+    in_progress_work = scalar('work_status_count', owner, status='in_progress')
+    completed_work = scalar('work_status_count', owner, status='completed')
 
     # Work revenue (user only)
-    work_revenue = db.session.query(func.sum(WorkEntry.total_amount)).filter(
-        WorkEntry.user_id == current_user.id,
-        WorkEntry.payment_status == 'paid'
-    ).scalar() or 0
-    monthly_work_revenue = db.session.query(func.sum(WorkEntry.total_amount)).filter(
-        WorkEntry.user_id == current_user.id,
-        WorkEntry.payment_status == 'paid',
-        WorkEntry.created_at >= current_month,
-        WorkEntry.created_at < next_month
-    ).scalar() or 0
+    work_revenue = scalar('work_paid_revenue', owner) or 0
+    monthly_work_revenue = scalar('work_paid_revenue_between', owner, **month) or 0
 
     # Recent activities (user only)
-    recent_bills = Bill.query.filter_by(created_by=current_user.id).order_by(Bill.created_at.desc()).limit(5).all()
-    recent_work = WorkEntry.query.filter_by(user_id=current_user.id).order_by(WorkEntry.created_at.desc()).limit(5).all()
+    recent_bills = objects('recent_bills', owner)
+    recent_work = objects('recent_work', owner)
 
     # Pending payments (user only)
-    pending_bill_payments = db.session.query(func.sum(Bill.remaining_amount)).filter(
-        Bill.created_by == current_user.id,
-        Bill.remaining_amount > 0
-    ).scalar() or 0
-    pending_work_payments = db.session.query(func.sum(WorkEntry.remaining_amount)).filter(
-        WorkEntry.user_id == current_user.id,
-        WorkEntry.remaining_amount > 0
-    ).scalar() or 0
+    pending_bill_payments = (scalar('bill_pending', owner) or 0) + archived_remaining
+    pending_work_payments = scalar('work_pending', owner) or 0
     total_pending_payments = pending_bill_payments + pending_work_payments
 
     # Today's tasks (user only)
-    today_work = WorkEntry.query.filter(
-        WorkEntry.user_id == current_user.id,
-        WorkEntry.work_status.in_(['pending', 'in_progress']),
-        func.date(WorkEntry.created_at) == today
-    ).count()
+    today_work = scalar('work_open_today', owner, today=today)
 
     # Combined revenue
     total_combined_revenue = total_revenue + work_revenue
@@ -262,293 +210,149 @@ def user_dashboard(current_month, next_month, today):
 
     return render_template('dashboard.html', stats=stats)
 
+VALID_EXPORT_TYPES = ['bills', 'expenses', 'work', 'all']
+
 @main_bp.route('/export/<data_type>')
 @login_required
+@replica_reads
 def export_data(data_type):
-    """Export data as CSV file"""
+    """Export data as CSV, gzip-compressed CSV, JSON Lines or XLSX"""
     try:
-        # Validate data type
-        valid_types = ['bills', 'expenses', 'work', 'all']
-        if data_type not in valid_types:
-            return f"Invalid data type. Valid types: {', '.join(valid_types)}", 400
-
-        # Route to appropriate export function
-        if data_type == 'bills':
-            return export_bills_data()
-        elif data_type == 'expenses':
-            return export_expenses_data()
-        elif data_type == 'work':
-            return export_work_data()
-        elif data_type == 'all':
-            return export_all_data()
+        # Validate data type and format
+        if data_type not in VALID_EXPORT_TYPES:
+            return f"Invalid data type. Valid types: {', '.join(VALID_EXPORT_TYPES)}", 400
+
+        export_format = request.args.get('format', 'csv')
+        if export_format not in available_formats():
+            return f"Invalid format. Valid formats: {', '.join(available_formats())}", 400
+
+        export_time = datetime.now()
+        filename = export_filename(data_type, export_format, export_time)
+        mimetype = EXPORT_FORMATS[export_format][0]
+
+        if export_format == 'xlsx':
+            # Workbooks cannot be streamed; build in a temporary file instead of memory
+            handle = tempfile.TemporaryFile()
+            write_export(handle, data_type, export_format, current_user.id,
+                         current_user.username, export_time)
+            handle.seek(0)
+            return send_file(handle, mimetype=mimetype, as_attachment=True, download_name=filename)
+
+        chunks = iter_export(data_type, export_format, current_user.id,
+                             current_user.username, export_time)
+        response = Response(stream_with_context(chunks), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        # Stop proxies from buffering the whole body before forwarding it
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
 
     except Exception as e:
         # Log the error for debugging
         print(f"Export error for {data_type}: {str(e)}")
         return f"Export failed: {str(e)}", 500
 
-def export_bills_data():
-    """Export bills data to CSV"""
-    # Get bills for current user
-    bills = Bill.query.filter_by(created_by=current_user.id).all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write header
-    writer.writerow([
-        'Bill Number', 'Customer Name', 'Customer Email', 'Customer Phone',
-        'Total Amount', 'Advance Amount', 'Remaining Amount', 'Status',
-        'Created Date', 'Due Date', 'Paid Date', 'Items', 'Notes'
-    ])
-
-    # Write data
-    for bill in bills:
-        # Get bill items
-        items_text = '; '.join([f"{item.description} (Qty: {item.quantity}, Rate: Rs {item.rate})"
-                               for item in bill.items])
-
-        writer.writerow([
-            bill.bill_number,
-            bill.customer.name,
-            bill.customer.email or '',
-            bill.customer.phone or '',
-            f"Rs {bill.total_amount:.2f}",
-            f"Rs {bill.advance_amount:.2f}",
-            f"Rs {bill.remaining_amount:.2f}",
-            bill.status.title(),
-            bill.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            bill.due_date.strftime('%Y-%m-%d') if bill.due_date else '',
-            bill.paid_date.strftime('%Y-%m-%d %H:%M:%S') if bill.paid_date else '',
-            items_text,
-            bill.notes or ''
-        ])
-
-    output.seek(0)
-
-    # Create response
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = f'attachment; filename=bills_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-
-    return response
-
-def export_expenses_data():
-    """Export expenses data to CSV"""
-    # Get expenses for current user
-    expenses = Expense.query.filter_by(created_by=current_user.id).all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write header
-    writer.writerow([
-        'Date', 'Description', 'Category', 'Amount', 'Payment Method',
-        'Receipt Number', 'Notes', 'Created Date'
-    ])
-
-    # Write data
-    for expense in expenses:
-        writer.writerow([
-            expense.date.strftime('%Y-%m-%d'),
-            expense.description,
-            expense.category or '',
-            f"Rs {expense.amount:.2f}",
-            expense.payment_method or '',
-            expense.receipt_number or '',
-            expense.notes or '',
-            expense.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-
-    output.seek(0)
-
-    # Create response
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = f'attachment; filename=expenses_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-
-    return response
-
-def export_work_data():
-    """Export work entries data to CSV"""
-    # Get work entries for current user
-    work_entries = WorkEntry.query.filter_by(user_id=current_user.id).all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write header
-    writer.writerow([
-        'Project Name', 'Customer Name', 'Customer Phone', 'Service Type',
-        'Start Time', 'End Time', 'Duration (Hours)', 'Hourly Rate',
-        'Total Amount', 'Advance Amount', 'Remaining Amount',
-        'Work Status', 'Payment Status', 'Created Date'
-    ])
-
-    # Write data
-    for entry in work_entries:
-        duration_hours = (entry.duration_minutes / 60) if entry.duration_minutes else 0
-
-        writer.writerow([
-            entry.project_name or '',
-            entry.customer_name or '',
-            entry.customer_phone or '',
-            entry.service_type or '',
-            entry.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-            entry.end_time.strftime('%Y-%m-%d %H:%M:%S') if entry.end_time else '',
-            f"{duration_hours:.2f}",
-            f"Rs {entry.hourly_rate:.2f}",
-            f"Rs {entry.total_amount:.2f}",
-            f"Rs {entry.advance_amount:.2f}",
-            f"Rs {entry.remaining_amount:.2f}",
-            entry.work_status.title(),
-            entry.payment_status.title(),
-            entry.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-
-    output.seek(0)
-
-    # Create response
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = f'attachment; filename=work_entries_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-
-    return response
-
-def export_all_data():
-    """Export all data in a comprehensive CSV file"""
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write summary header
-    writer.writerow(['SMART BILLING SYSTEM - COMPLETE DATA EXPORT'])
-    writer.writerow([f'Export Date: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'])
-    writer.writerow([f'User: {current_user.username}'])
-    writer.writerow([''])
-
-    # BILLS SECTION
-    writer.writerow(['=== BILLS DATA ==='])
-    writer.writerow([
-        'Bill Number', 'Customer Name', 'Customer Email', 'Customer Phone',
-        'Total Amount', 'Advance Amount', 'Remaining Amount', 'Status',
-        'Created Date', 'Items Count', 'Notes'
-    ])
-
-    bills = Bill.query.filter_by(created_by=current_user.id).all()
-    for bill in bills:
-        writer.writerow([
-            bill.bill_number,
-            bill.customer.name,
-            bill.customer.email or '',
-            bill.customer.phone or '',
-            f"Rs {bill.total_amount:.2f}",
-            f"Rs {bill.advance_amount:.2f}",
-            f"Rs {bill.remaining_amount:.2f}",
-            bill.status.title(),
-            bill.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            len(bill.items),
-            bill.notes or ''
-        ])
-
-    writer.writerow([''])
-
-    # EXPENSES SECTION
-    writer.writerow(['=== EXPENSES DATA ==='])
-    writer.writerow([
-        'Date', 'Description', 'Category', 'Amount', 'Payment Method', 'Notes'
-    ])
-
-    expenses = Expense.query.filter_by(created_by=current_user.id).all()
-    for expense in expenses:
-        writer.writerow([
-            expense.date.strftime('%Y-%m-%d'),
-            expense.description,
-            expense.category or '',
-            f"Rs {expense.amount:.2f}",
-            expense.payment_method or '',
-            expense.notes or ''
-        ])
-
-    writer.writerow([''])
-
-    # WORK ENTRIES SECTION
-    writer.writerow(['=== WORK ENTRIES DATA ==='])
-    writer.writerow([
-        'Project Name', 'Customer Name', 'Service Type', 'Duration (Hours)',
-        'Total Amount', 'Work Status', 'Payment Status', 'Start Time'
-    ])
-
-    work_entries = WorkEntry.query.filter_by(user_id=current_user.id).all()
-    for entry in work_entries:
-        duration_hours = (entry.duration_minutes / 60) if entry.duration_minutes else 0
-        writer.writerow([
-            entry.project_name or '',
-            entry.customer_name or '',
-            entry.service_type or '',
-            f"{duration_hours:.2f}",
-            f"Rs {entry.total_amount:.2f}",
-            entry.work_status.title(),
-            entry.payment_status.title(),
-            entry.start_time.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-
-    writer.writerow([''])
-
-    # SUMMARY SECTION
-    writer.writerow(['=== SUMMARY ==='])
-    total_bills = len(bills)
-    total_revenue = sum(bill.total_amount for bill in bills)
-    total_expenses_amount = sum(expense.amount for expense in expenses)
-    total_work_entries = len(work_entries)
-    total_work_amount = sum(entry.total_amount for entry in work_entries)
-
-    writer.writerow(['Total Bills:', total_bills])
-    writer.writerow(['Total Revenue:', f"Rs {total_revenue:.2f}"])
-    writer.writerow(['Total Expenses:', f"Rs {total_expenses_amount:.2f}"])
-    writer.writerow(['Total Work Entries:', total_work_entries])
-    writer.writerow(['Total Work Amount:', f"Rs {total_work_amount:.2f}"])
-    writer.writerow(['Net Profit:', f"Rs {(total_revenue - total_expenses_amount):.2f}"])
-
-    output.seek(0)
-
-    # Create response
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = f'attachment; filename=complete_data_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-
-    return response
+@main_bp.route('/export/jobs', methods=['POST'])
+@login_required
+def start_export():
+    """Start an export: small ones download directly, large ones become background jobs"""
+    data = request.get_json(silent=True) or request.form
+    data_type = data.get('data_type', '')
+    export_format = data.get('format', 'csv')
+
+    if data_type not in VALID_EXPORT_TYPES:
+        return jsonify({'success': False, 'message': 'Invalid data type'}), 400
+    if export_format not in available_formats():
+        return jsonify({'success': False, 'message': 'Invalid export format'}), 400
+
+    try:
+        threshold = current_app.config.get('EXPORT_ASYNC_THRESHOLD', 5000)
+        if count_rows(data_type, current_user.id) <= threshold:
+            return jsonify({
+                'success': True,
+                'mode': 'direct',
+                'download_url': url_for('main.export_data', data_type=data_type, format=export_format)
+            })
+
+        job = create_export_job(current_user, data_type, export_format)
+        return jsonify({'success': True, 'mode': 'job', **export_job_info(job)}), 202
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Export failed: {str(e)}'}), 500
+
+def export_job_info(job):
+    """JSON-ready status of an export job"""
+    processed_rows = read_progress(job)
+    info = {
+        'job_id': job.id,
+        'data_type': job.data_type,
+        'format': job.export_format,
+        'status': job.status,
+        'total_rows': job.total_rows,
+        'processed_rows': processed_rows,
+        'progress': job.progress_for(processed_rows),
+        'status_url': url_for('main.export_job_status', job_id=job.id),
+        # Rows created after this are left out; earlier rows are exported as they are when it runs
+        'rows_created_before': job.created_at.strftime('%Y-%m-%d %H:%M:%S')
+    }
+    if job.status == 'completed':
+        info['download_url'] = url_for('main.download_export', job_id=job.id)
+    if job.status == 'failed':
+        info['error'] = job.error
+    return info
+
+@main_bp.route('/export/jobs/<int:job_id>')
+@login_required
+def export_job_status(job_id):
+    """Progress of a background export"""
+    job = get_or_404(ExportJob, job_id)
+
+    if job.user_id != current_user.id:
+        return jsonify({'success': False, 'message': 'Permission denied'}), 403
+
+    # A job left queued or running by a restarted worker reports an error instead
+    fail_stale_job(job)
+    return jsonify({'success': True, **export_job_info(job)})
+
+@main_bp.route('/export/jobs/<int:job_id>/download')
+@login_required
+def download_export(job_id):
+    """Download the file produced by a finished export job"""
+    job = get_or_404(ExportJob, job_id)
+
+    if job.user_id != current_user.id:
+        return "Permission denied", 403
+
+    if job.status != 'completed' or not job.file_path or not os.path.exists(job.file_path):
+        return "Export is not ready", 404
+
+    return send_file(job.file_path, mimetype=EXPORT_FORMATS[job.export_format][0], as_attachment=True,
+                     download_name=export_filename(job.data_type, job.export_format, job.created_at))
 
 @main_bp.route('/export/stats')
 @login_required
+@replica_reads
 def export_stats():
     """Get export statistics for the current user"""
     try:
-        # Count records for each data type
-        bills_count = Bill.query.filter_by(created_by=current_user.id).count()
-        expenses_count = Expense.query.filter_by(created_by=current_user.id).count()
-        work_count = WorkEntry.query.filter_by(user_id=current_user.id).count()
-
-        # Calculate totals
-        total_revenue = db.session.query(func.sum(Bill.total_amount)).filter_by(created_by=current_user.id).scalar() or 0
-        total_expenses = db.session.query(func.sum(Expense.amount)).filter_by(created_by=current_user.id).scalar() or 0
-        total_work_amount = db.session.query(func.sum(WorkEntry.total_amount)).filter_by(user_id=current_user.id).scalar() or 0
+        summary = get_user_summary(current_user.id)
 
         stats = {
             'bills': {
-                'count': bills_count,
-                'total_amount': float(total_revenue)
+                'count': summary['bills']['count'],
+                'total_amount': summary['bills']['total_amount']
             },
             'expenses': {
-                'count': expenses_count,
-                'total_amount': float(total_expenses)
+                'count': summary['expenses']['count'],
+                'total_amount': summary['expenses']['total_amount']
             },
             'work': {
-                'count': work_count,
-                'total_amount': float(total_work_amount)
+                'count': summary['work']['count'],
+                'total_amount': summary['work']['total_amount']
             },
             'summary': {
-                'total_records': bills_count + expenses_count + work_count,
-                'net_profit': float(total_revenue - total_expenses)
+                'total_records': summary['total_records'],
+                'net_profit': summary['net_profit']
             }
         }
 
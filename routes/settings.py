@@ -1,31 +1,20 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, send_from_directory
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_required, current_user
 from models import db
-from werkzeug.utils import secure_filename
-from werkzeug.security import check_password_hash, generate_password_hash
-import os
 from routes.auth import admin_required
-
-# Try to import PIL, but make it optional for deployment
-try:
-    from PIL import Image
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
+from utils.export_engine import format_choices
+from utils.profile_photos import (PIL_AVAILABLE, is_content_hashed, photo_folder, profile_photo_url,
+                                  queue_photo_variants, release_profile_photo, store_profile_photo)
+from utils.uploads import send_upload
 
 settings_bp = Blueprint('settings', __name__)
+settings_bp.add_app_template_global(profile_photo_url)
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-UPLOAD_FOLDER = 'static/uploads/profiles'
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def create_upload_folder():
-    """Create upload folder if it doesn't exist"""
-    if not os.path.exists(UPLOAD_FOLDER):
-        os.makedirs(UPLOAD_FOLDER)
-
 @settings_bp.route('/settings')
 @login_required
 @admin_required
@@ -34,8 +23,8 @@ def settings():
 
 @settings_bp.route('/uploads/profiles/<filename>')
 def uploaded_file(filename):
-    """Serve uploaded profile photos"""
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    """Serve uploaded profile photos (content-hashed names never change)"""
+    return send_upload(photo_folder(), filename, immutable=is_content_hashed(filename), private=False)
 
 @settings_bp.route('/settings/profile', methods=['GET', 'POST'])
 @login_required
@@ -46,49 +35,27 @@ def profile_settings():
         current_user.email = request.form.get('email')
         current_user.phone = request.form.get('phone')
         
-        # Handle profile photo upload
+        # Handle profile photo upload; resized copies are made in the background
+        new_photo = None
+        old_photo = current_user.profile_photo
         if 'profile_photo' in request.files:
             file = request.files['profile_photo']
             if file and file.filename != '' and allowed_file(file.filename):
-                create_upload_folder()
-
-                # Delete old profile photo if exists
-                if current_user.profile_photo:
-                    old_photo_path = current_user.profile_photo
-                    if os.path.exists(old_photo_path):
-                        try:
-                            os.remove(old_photo_path)
-                        except Exception as e:
-                            flash(f'Warning: Could not delete old photo: {str(e)}', 'warning')
-
-                # Save new photo
-                filename = secure_filename(f"user_{current_user.id}_{file.filename}")
-                file_path = os.path.join(UPLOAD_FOLDER, filename)
-                file.save(file_path)
-
-                # Resize image (only if PIL is available)
-                if PIL_AVAILABLE:
-                    try:
-                        with Image.open(file_path) as img:
-                            # Convert to RGB if necessary (for JPEG compatibility)
-                            if img.mode in ('RGBA', 'LA', 'P'):
-                                img = img.convert('RGB')
-                            img.thumbnail((300, 300), Image.LANCZOS)
-                            img.save(file_path, 'JPEG', quality=85)
-                    except Exception as e:
-                        # Clean up the uploaded file if processing fails
-                        if os.path.exists(file_path):
-                            os.remove(file_path)
-                        flash(f'Error processing image: {str(e)}', 'error')
-                        return redirect(url_for('settings.profile_settings'))
-                else:
-                    # If PIL is not available, just save the file as-is
+                try:
+                    new_photo = store_profile_photo(file)
+                except ValueError as e:
+                    db.session.rollback()
+                    flash(f'Error processing image: {str(e)}', 'error')
+                    return redirect(url_for('settings.profile_settings'))
+                current_user.profile_photo = new_photo
+                if not PIL_AVAILABLE:
                     flash('Image uploaded successfully (resizing not available)', 'info')
-
-                # Store relative path for web access
-                current_user.profile_photo = file_path
         
         db.session.commit()
+        if new_photo:
+            queue_photo_variants(new_photo)
+            if old_photo != new_photo:
+                release_profile_photo(old_photo)
         flash('Profile updated successfully!', 'success')
         return redirect(url_for('settings.profile_settings'))
     
@@ -100,17 +67,11 @@ def delete_profile_photo():
     """Delete user's profile photo"""
     try:
         if current_user.profile_photo:
-            # Delete the file from filesystem
+            # Remove from database, then the files once no other user shares them
             photo_path = current_user.profile_photo
-            if os.path.exists(photo_path):
-                try:
-                    os.remove(photo_path)
-                except Exception as e:
-                    return jsonify({'success': False, 'message': f'Error deleting photo file: {str(e)}'})
-
-            # Remove from database
             current_user.profile_photo = None
             db.session.commit()
+            release_profile_photo(photo_path)
 
             # Return JSON response for AJAX request
             if request.is_json or request.headers.get('Content-Type') == 'application/json':
@@ -140,7 +101,7 @@ def password_settings():
         confirm_password = request.form.get('confirm_password')
         
         # Validate current password
-        if not check_password_hash(current_user.password_hash, current_password):
+        if not current_user.check_password(current_password):
             flash('Current password is incorrect.', 'error')
             return render_template('settings/password.html')
         
@@ -154,7 +115,7 @@ def password_settings():
             return render_template('settings/password.html')
         
         # Update password
-        current_user.password_hash = generate_password_hash(new_password)
+        current_user.set_password(new_password)
         db.session.commit()
         
         flash('Password updated successfully!', 'success')
@@ -296,4 +257,4 @@ def account_settings():
             flash('Account deactivated successfully.', 'info')
             return redirect(url_for('auth.logout'))
         
-    return render_template('settings/account.html')
+    return render_template('settings/account.html', export_formats=format_choices())
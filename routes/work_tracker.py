@@ -1,8 +1,19 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import Blueprint, Response, render_template, request, flash, redirect, url_for, jsonify, current_app
 from flask_login import login_required, current_user
 from models import WorkEntry, db
 from datetime import datetime
+import queue
+import time
 from sqlalchemy import func
+from utils.work_reports import completed_entries_query, build_work_report
+from utils.work_catalog import CATALOG_KINDS, catalog_choices, search_catalog
+from utils.work_events import get_event_bus, format_sse
+from utils.work_bulk import apply_bulk_operation
+from utils.work_billing import (unbilled_entries_query, unbillable_entries, billable_query, preview_unbilled,
+                                bill_unbilled_work, AlreadyBilledError)
+from utils.customers import find_or_create_customer
+from utils.read_replica import replica_reads
+from utils.statements import get_or_404
 
 work_bp = Blueprint('work', __name__)
 
@@ -15,7 +26,9 @@ def entries():
     
     query = WorkEntry.query.filter_by(user_id=current_user.id)
     
-    if status:
+    if status == 'billed':
+        query = query.filter(WorkEntry.bill_id.isnot(None))
+    elif status:
         query = query.filter_by(work_status=status)
     
     if project:
@@ -25,9 +38,8 @@ def entries():
         page=page, per_page=10, error_out=False
     )
 
-    # Get unique projects for filter
-    projects_query = WorkEntry.query.with_entities(WorkEntry.project_name).distinct().filter_by(user_id=current_user.id)
-    projects = [p[0] for p in projects_query.all()]
+    # Get projects for filter from the cached catalog
+    projects = catalog_choices(current_user.id, 'project')
 
     return render_template('work/entries.html', entries=entries, status=status,
                          project=project, projects=projects)
@@ -51,6 +63,7 @@ def create():
 
         work_entry = WorkEntry(
             user_id=current_user.id,
+            customer_id=find_or_create_customer(customer_name, customer_phone),
             customer_name=customer_name,
             customer_phone=customer_phone,
             service_type=service_type,
@@ -85,7 +98,7 @@ def create():
 @work_bp.route('/entries/<int:id>')
 @login_required
 def view(id):
-    work_entry = WorkEntry.query.get_or_404(id)
+    work_entry = get_or_404(WorkEntry, id)
     
     if work_entry.user_id != current_user.id:
         flash('You do not have permission to view this work entry.', 'error')
@@ -96,7 +109,7 @@ def view(id):
 @work_bp.route('/entries/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit(id):
-    work_entry = WorkEntry.query.get_or_404(id)
+    work_entry = get_or_404(WorkEntry, id)
     
     if work_entry.user_id != current_user.id:
         flash('You do not have permission to edit this work entry.', 'error')
@@ -106,6 +119,7 @@ def edit(id):
         # Update customer information
         work_entry.customer_name = request.form.get('customer_name')
         work_entry.customer_phone = request.form.get('customer_phone')
+        work_entry.customer_id = find_or_create_customer(work_entry.customer_name, work_entry.customer_phone)
         work_entry.service_type = request.form.get('service_type')
 
         # Update work information
@@ -138,7 +152,7 @@ def edit(id):
 @work_bp.route('/entries/<int:id>/stop', methods=['POST'])
 @login_required
 def stop_timer(id):
-    work_entry = WorkEntry.query.get_or_404(id)
+    work_entry = get_or_404(WorkEntry, id)
     
     if work_entry.user_id != current_user.id:
         return jsonify({'success': False, 'message': 'Permission denied'})
@@ -162,7 +176,7 @@ def stop_timer(id):
 @work_bp.route('/entries/<int:id>/delete', methods=['POST'])
 @login_required
 def delete(id):
-    work_entry = WorkEntry.query.get_or_404(id)
+    work_entry = get_or_404(WorkEntry, id)
     
     if work_entry.user_id != current_user.id:
         flash('You do not have permission to delete this work entry.', 'error')
@@ -177,7 +191,7 @@ def delete(id):
 @work_bp.route('/entries/<int:id>/payment-info')
 @login_required
 def payment_info(id):
-    work_entry = WorkEntry.query.get_or_404(id)
+    work_entry = get_or_404(WorkEntry, id)
 
     if work_entry.user_id != current_user.id:
         return jsonify({'success': False, 'message': 'Permission denied'})
@@ -193,7 +207,7 @@ def payment_info(id):
 @work_bp.route('/entries/<int:id>/update-payment', methods=['POST'])
 @login_required
 def update_payment(id):
-    work_entry = WorkEntry.query.get_or_404(id)
+    work_entry = get_or_404(WorkEntry, id)
 
     if work_entry.user_id != current_user.id:
         return jsonify({'success': False, 'message': 'Permission denied'})
@@ -243,7 +257,7 @@ def update_payment(id):
 @work_bp.route('/entries/<int:id>/work-status-info')
 @login_required
 def work_status_info(id):
-    work_entry = WorkEntry.query.get_or_404(id)
+    work_entry = get_or_404(WorkEntry, id)
 
     if work_entry.user_id != current_user.id:
         return jsonify({'success': False, 'message': 'Permission denied'})
@@ -256,7 +270,7 @@ def work_status_info(id):
 @work_bp.route('/entries/<int:id>/update-work-status', methods=['POST'])
 @login_required
 def update_work_status(id):
-    work_entry = WorkEntry.query.get_or_404(id)
+    work_entry = get_or_404(WorkEntry, id)
 
     if work_entry.user_id != current_user.id:
         return jsonify({'success': False, 'message': 'Permission denied'})
@@ -287,58 +301,163 @@ def update_work_status(id):
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@work_bp.route('/entries/bulk', methods=['POST'])
+@login_required
+def bulk_update():
+    """Apply one status or payment operation to many entries at once"""
+    data = request.get_json(silent=True) or {}
+    operation = data.get('operation')
+    value = data.get('work_status') if operation == 'work_status' else data.get('payment_amount')
+
+    try:
+        entry_ids = [int(entry_id) for entry_id in data.get('ids', [])]
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid entry ids'}), 400
+    if not entry_ids:
+        return jsonify({'success': False, 'message': 'No entries selected'}), 400
+
+    try:
+        results = apply_bulk_operation(current_user.id, entry_ids, operation, value)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    updated = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': True,
+        'message': f'{updated} of {len(results)} entries updated',
+        'updated': updated,
+        'failed': len(results) - updated,
+        'results': results
+    })
+
+@work_bp.route('/bill-unbilled', methods=['GET', 'POST'])
+@login_required
+def bill_unbilled():
+    """Preview and create one bill per customer for completed, unbilled work"""
+    values = request.form if request.method == 'POST' else request.args
+    customer_phone = values.get('customer_phone', '')
+    start_date = values.get('start_date', '')
+    end_date = values.get('end_date', '')
+
+    try:
+        query = unbilled_entries_query(current_user.id, customer_phone, start_date, end_date)
+    except ValueError:
+        flash('Invalid date. Please use the date picker.', 'error')
+        return redirect(url_for('work.bill_unbilled'))
+
+    # Entries without a customer or a usable phone cannot go on a bill
+    skipped = unbillable_entries(query)
+
+    if request.method == 'POST':
+        try:
+            created = bill_unbilled_work(current_user.id, billable_query(query, skipped))
+        except AlreadyBilledError as e:
+            flash(f'{e}. Please review the list and try again.', 'error')
+            return redirect(url_for('work.bill_unbilled', customer_phone=customer_phone,
+                                    start_date=start_date, end_date=end_date))
+
+        if skipped:
+            flash(f'{len(skipped)} work entries were not billed because they have no valid customer phone: '
+                  f'{", ".join(sorted({entry["customer_name"] for entry in skipped}))}.', 'warning')
+        if not created:
+            flash('There is no unbilled work to bill.', 'info')
+            return redirect(url_for('work.bill_unbilled'))
+
+        entry_count = sum(bill['entries'] for bill in created)
+        flash(f'Created {len(created)} bills for {entry_count} work entries.', 'success')
+        if len(created) == 1:
+            return redirect(url_for('billing.view', id=created[0]['bill_id']))
+        return redirect(url_for('billing.bills'))
+
+    customers = preview_unbilled(billable_query(query, skipped))
+    return render_template('work/bill_unbilled.html', customers=customers, skipped=skipped,
+                         customer_phone=customer_phone, start_date=start_date, end_date=end_date)
+
 @work_bp.route('/reports')
 @login_required
+@replica_reads
 def reports():
     # Get date range from query parameters
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     project = request.args.get('project', '')
+    page = request.args.get('page', 1, type=int)
     
-    query = WorkEntry.query.filter_by(work_status='completed', user_id=current_user.id)
-    
-    if start_date:
-        query = query.filter(WorkEntry.start_time >= datetime.strptime(start_date, '%Y-%m-%d'))
-    
-    if end_date:
-        query = query.filter(WorkEntry.start_time <= datetime.strptime(end_date, '%Y-%m-%d'))
-    
-    if project:
-        query = query.filter(WorkEntry.project_name.contains(project))
-    
-    entries = query.all()
+    query = completed_entries_query(current_user.id, start_date, end_date, project)
     
-    # Calculate statistics
-    total_hours = sum(entry.duration_minutes or 0 for entry in entries) / 60
-    total_amount = sum(entry.total_amount or 0 for entry in entries)
+    # Statistics are aggregated in the database
+    report = build_work_report(query)
+    totals = report['totals']
     
-    # Group by project
-    project_stats = {}
-    for entry in entries:
-        if entry.project_name not in project_stats:
-            project_stats[entry.project_name] = {
-                'hours': 0,
-                'amount': 0,
-                'entries': 0
-            }
-        project_stats[entry.project_name]['hours'] += (entry.duration_minutes or 0) / 60
-        project_stats[entry.project_name]['amount'] += entry.total_amount or 0
-        project_stats[entry.project_name]['entries'] += 1
+    # Only the current page of detail rows is loaded
+    entries = query.order_by(WorkEntry.start_time.desc()).paginate(
+        page=page, per_page=20, error_out=False
+    )
     
-    # Get unique projects for filter
-    projects_query = WorkEntry.query.with_entities(WorkEntry.project_name).distinct().filter_by(user_id=current_user.id)
-    projects = [p[0] for p in projects_query.all()]
+    # Get projects for filter from the cached catalog
+    projects = catalog_choices(current_user.id, 'project')
     
     return render_template('work/reports.html', 
                          entries=entries,
-                         total_hours=total_hours,
-                         total_amount=total_amount,
-                         project_stats=project_stats,
+                         total_entries=totals['entries'],
+                         total_hours=totals['hours'],
+                         total_amount=totals['amount'],
+                         project_stats=report['project_stats'],
+                         service_stats=report['service_stats'],
+                         weekly_stats=report['weekly_stats'],
                          projects=projects,
                          start_date=start_date,
                          end_date=end_date,
                          selected_project=project)
 
+@work_bp.route('/reports/data')
+@login_required
+@replica_reads
+def reports_data():
+    """JSON version of the work report for charts"""
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    project = request.args.get('project', '')
+
+    query = completed_entries_query(current_user.id, start_date, end_date, project)
+    report = build_work_report(query)
+
+    def series(stats):
+        return {
+            'labels': [str(key) for key in stats],
+            'hours': [round(item['hours'], 2) for item in stats.values()],
+            'amount': [round(item['amount'], 2) for item in stats.values()],
+            'entries': [item['entries'] for item in stats.values()]
+        }
+
+    return jsonify({
+        'totals': report['totals'],
+        'projects': series(report['project_stats']),
+        'services': series(report['service_stats']),
+        'weekly': series(report['weekly_stats'])
+    })
+
+@work_bp.route('/catalog/<kind>')
+@login_required
+def catalog_autocomplete(kind):
+    """Project or service names matching a search term, most used first"""
+    if kind not in CATALOG_KINDS:
+        return jsonify({'success': False, 'message': 'Invalid catalog'}), 400
+
+    term = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 20, type=int), 50)
+    items = search_catalog(current_user.id, kind, term, limit)
+
+    return jsonify({
+        'success': True,
+        'items': [{
+            'name': item.name,
+            'entries': item.entry_count,
+            'last_used': item.last_used_at.strftime('%Y-%m-%d %H:%M:%S') if item.last_used_at else None
+        } for item in items]
+    })
+
 @work_bp.route('/timer')
 @login_required
 def timer():
@@ -346,6 +465,64 @@ def timer():
     active_timer = WorkEntry.query.filter_by(
         user_id=current_user.id,
         work_status='in_progress'
-    ).first()
+    ).order_by(WorkEntry.start_time.desc()).first()
     
     return render_template('work/timer.html', active_timer=active_timer)
+
+@work_bp.route('/events')
+@login_required
+def events():
+    """Server-Sent Events stream of the user's work entry changes"""
+    user_id = current_user.id
+    # EventSource resends Last-Event-ID itself; pages reopening a refused stream pass it in the URL
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    if last_event_id is None:
+        last_event_id = request.args.get('last_event_id', type=int)
+    heartbeat = current_app.config.get('WORK_EVENTS_HEARTBEAT', 15)
+    stream_seconds = current_app.config.get('WORK_EVENTS_STREAM_SECONDS', 25)
+    max_streams = current_app.config.get('WORK_EVENTS_MAX_STREAMS', 4)
+    bus = get_event_bus()
+
+    # Every open stream holds a worker thread; keep the rest free for page requests
+    if max_streams and bus.subscriber_count() >= max_streams:
+        return Response('Too many live update streams\n', status=503, mimetype='text/plain',
+                        headers={'Retry-After': str(stream_seconds)})
+
+    def generate():
+        subscription = bus.subscribe(user_id)
+        try:
+            yield 'retry: 3000\n\n'
+
+            cursor = subscription.cursor
+            if last_event_id is not None:
+                # Reconnect: send what was missed, or ask the page to reload
+                missed, complete = bus.replay(user_id, last_event_id)
+                if not complete:
+                    yield format_sse({'id': cursor, 'type': 'resync', 'data': {}})
+                    return
+                for item in missed:
+                    yield format_sse(item)
+                    cursor = max(cursor, item['id'])
+
+            # Streams end periodically so each connection frees its worker thread;
+            # the browser reconnects with Last-Event-ID and nothing is lost
+            deadline = time.monotonic() + stream_seconds
+            while time.monotonic() < deadline:
+                if subscription.overflowed:
+                    yield format_sse({'id': cursor, 'type': 'resync', 'data': {}})
+                    return
+                try:
+                    item = subscription.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if item['id'] > cursor:
+                    cursor = item['id']
+                    yield format_sse(item)
+        finally:
+            bus.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -162,6 +162,35 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Initialize calculations on page load
     calculateBillTotal();
+
+    // Catalog autocomplete (project names etc.)
+    const autocompleteInputs = document.querySelectorAll('input[data-autocomplete-url]');
+    autocompleteInputs.forEach(function(input) {
+        let timer = null;
+        const loadSuggestions = function() {
+            clearTimeout(timer);
+            timer = setTimeout(function() {
+                const url = input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(input.value);
+                fetch(url)
+                    .then(response => response.json())
+                    .then(data => {
+                        const datalist = document.getElementById(input.getAttribute('list'));
+                        if (!datalist || !data.success) {
+                            return;
+                        }
+                        datalist.innerHTML = '';
+                        data.items.forEach(function(item) {
+                            const option = document.createElement('option');
+                            option.value = item.name;
+                            datalist.appendChild(option);
+                        });
+                    })
+                    .catch(error => console.error('Autocomplete error:', error));
+            }, 250);
+        };
+        input.addEventListener('input', loadSuggestions);
+        input.addEventListener('focus', loadSuggestions);
+    });
 });
 
 // Utility functions
@@ -0,0 +1,65 @@
+// Live work entry updates for Smart Billing System
+// The server pushes timer, status and payment changes over Server-Sent Events,
+// so pages keep their entry data current without polling.
+
+const WORK_EVENT_TYPES = [
+    'timer_started', 'timer_stopped', 'status_changed', 'payment_changed',
+    'entry_created', 'entry_updated', 'entry_deleted'
+];
+
+function connectWorkEvents(url, onEvent) {
+    if (!window.EventSource) {
+        return null;
+    }
+
+    const live = { source: null, lastEventId: null };
+
+    function open() {
+        // A refused stream (server busy) is not retried by the browser, so
+        // reopen it ourselves and carry the last event id across
+        const streamUrl = live.lastEventId === null ? url
+            : `${url}?last_event_id=${encodeURIComponent(live.lastEventId)}`;
+        const source = new EventSource(streamUrl);
+        live.source = source;
+
+        WORK_EVENT_TYPES.forEach(function(type) {
+            source.addEventListener(type, function(event) {
+                live.lastEventId = event.lastEventId;
+                onEvent(type, JSON.parse(event.data));
+            });
+        });
+
+        // Too many events were missed to replay them; start again from the server's state
+        source.addEventListener('resync', function() {
+            source.close();
+            location.reload();
+        });
+
+        source.addEventListener('error', function() {
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(open, 5000 + Math.random() * 5000);
+            }
+        });
+    }
+
+    open();
+    return live;
+}
+
+function titleCase(value) {
+    return value.replace(/_/g, ' ').replace(/\b\w/g, function(c) { return c.toUpperCase(); });
+}
+
+function workStatusBadge(status) {
+    const color = status === 'delivered' ? 'success' : status === 'completed' ? 'info' : 'warning';
+    return `<span class="badge bg-${color}">${titleCase(status)}</span>`;
+}
+
+function paymentStatusBadge(status) {
+    const color = status === 'paid' ? 'success' : status === 'partial' ? 'warning' : 'danger';
+    return `<span class="badge bg-${color}">${titleCase(status)}</span>`;
+}
+
+function formatRupees(amount) {
+    return `Rs ${Number(amount || 0).toFixed(2)}`;
+}
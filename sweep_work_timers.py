@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Stop stale work timers and repair payment fields (run from cron, or once after upgrading)
+
+Usage:
+    python sweep_work_timers.py                       # stop stale timers, repair payment drift
+    python sweep_work_timers.py --recompute-durations # also recompute every finished entry
+"""
+
+import sys
+from app import app
+from models import db
+from utils.work_sweeper import run_sweep, recompute_durations
+
+def sweep():
+    """Stop stale timers (the running-timer index comes from the migrations)"""
+    with app.app_context():
+        try:
+            if '--recompute-durations' in sys.argv:
+                updated = recompute_durations()
+                print(f"✅ Recomputed durations for {updated} work entries")
+
+            result = run_sweep(app.config)
+            print(f"✅ Stopped {result['stopped']} stale timers, repaired {result['repaired']} entries")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error sweeping work timers: {e}")
+
+if __name__ == '__main__':
+    sweep()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test archiving old paid bills and reading them back
+"""
+
+from datetime import datetime, timedelta
+from app import app
+from models import db, User, Customer, Bill, BillItem, ArchivedBill, BillRollup
+from utils.bill_archive import archive_paid_bills, last_bill_id, restore_archived_bills
+from utils.export_engine import count_rows
+from utils.summary import get_user_summary, invalidate_user_summary
+from utils.users import user_activity
+
+EMAIL = 'archive_test@example.com'
+PASSWORD = 'archive-test-password'
+
+def login(client, email=EMAIL, password=PASSWORD):
+    return client.post('/auth/login', data={'email': email, 'password': password})
+
+def totals(user_id):
+    invalidate_user_summary(user_id)
+    summary = get_user_summary(user_id)
+    activity = user_activity([user_id])[user_id]
+    return (summary['bills']['count'], summary['bills']['total_amount'], summary['bills']['paid_amount'],
+            activity['bills'], activity['revenue'], count_rows('bills', user_id))
+
+def test_bill_archive():
+    """Old paid bills leave the bill table; totals, views and searches are unchanged"""
+    with app.app_context():
+        user = User(username='archive_test', email=EMAIL, role='user')
+        user.set_password(PASSWORD)
+        customer = Customer(name='Archive Customer', phone='9222200001')
+        db.session.add_all([user, customer])
+        db.session.flush()
+
+        old = datetime.utcnow() - timedelta(days=800)
+        bills = []
+        for number, (status, created, amount) in enumerate((
+            ('paid', old, 100.0), ('paid', old + timedelta(hours=2), 40.0),
+            ('sent', old, 70.0), ('paid', datetime.utcnow(), 25.0), ('draft', datetime.utcnow(), 10.0)
+        )):
+            bill = Bill(bill_number=f'ARCH-TEST-{number}', customer_id=customer.id, created_by=user.id,
+                        status=status, created_at=created, paid_date=created if status == 'paid' else None,
+                        total_amount=amount, subtotal=amount, advance_amount=amount if status == 'paid' else 0.0,
+                        remaining_amount=0.0 if status == 'paid' else amount)
+            bill.items = [BillItem(description='Printing', quantity=2.0, rate=amount / 2, total=amount)]
+            bills.append(bill)
+        db.session.add_all(bills)
+        db.session.commit()
+        user_id, customer_id = user.id, customer.id
+        bill_ids = [bill.id for bill in bills]
+        before = totals(user_id)
+
+    try:
+        with app.app_context():
+            assert archive_paid_bills(older_than_days=365) == 2
+            assert Bill.query.filter(Bill.id.in_(bill_ids)).count() == 3
+            assert ArchivedBill.query.filter_by(created_by=user_id).count() == 2
+            rollup = BillRollup.query.filter_by(created_by=user_id).one()
+            assert rollup.bill_count == 2 and rollup.total_amount == 140.0
+            print("✅ Two old paid bills archived into one daily rollup")
+
+            assert totals(user_id) == before
+            print("✅ Counts, revenue and export row counts unchanged")
+
+        client = app.test_client()
+        login(client)
+        response = client.get(f'/billing/bills/{bill_ids[0]}')
+        assert response.status_code == 200 and b'Archived' in response.data and b'Printing' in response.data
+        response = client.get('/billing/bills?search=ARCH-TEST-1')
+        assert b'Archived Invoices' in response.data and b'ARCH-TEST-1' in response.data
+        response = client.get(f'/billing/customers/{customer_id}')
+        assert b'ARCH-TEST-0' in response.data
+        assert client.get('/billing/bills/999999999').status_code == 404
+        print("✅ Archived bills found by view, search and customer page")
+
+        admin = app.test_client()
+        login(admin, 'admin@smartbilling.com', 'admin123')
+        for page in ('/dashboard', '/dashboard/api/chart-data?type=profit'):
+            assert client.get(page).status_code == 200
+            assert admin.get(page).status_code == 200
+        assert admin.get('/dashboard/analytics').status_code == 200
+        print("✅ Dashboards and analytics include the rollups")
+
+        with app.app_context():
+            assert restore_archived_bills(bill_ids) == 2
+            assert Bill.query.filter(Bill.id.in_(bill_ids)).count() == 5
+            assert BillRollup.query.filter_by(created_by=user_id).count() == 0
+            restored = db.session.get(Bill, bill_ids[0])
+            assert len(restored.items) == 1 and restored.items[0].total == 100.0
+            assert totals(user_id) == before
+            print("✅ Restored bills match the originals")
+    finally:
+        with app.app_context():
+            restore_archived_bills(bill_ids)
+            BillItem.query.filter(BillItem.bill_id.in_(bill_ids)).delete(synchronize_session=False)
+            Bill.query.filter(Bill.id.in_(bill_ids)).delete(synchronize_session=False)
+            db.session.delete(db.session.get(Customer, customer_id))
+            db.session.delete(db.session.get(User, user_id))
+            db.session.commit()
+
+def test_archived_ids_not_reused():
+    """Archiving the newest bill does not give its id or number to the next bill"""
+    with app.app_context():
+        user = User(username='archive_ids_test', email='archive_ids_test@example.com', role='user')
+        user.set_password(PASSWORD)
+        customer = Customer(name='Archive Ids Customer', phone='9222200002')
+        db.session.add_all([user, customer])
+        db.session.flush()
+        old = datetime.utcnow() - timedelta(days=800)
+        newest = Bill(bill_number=f'INV-{last_bill_id() + 1:06d}', customer_id=customer.id, created_by=user.id,
+                      status='paid', created_at=old, paid_date=old, total_amount=5.0, remaining_amount=0.0)
+        db.session.add(newest)
+        db.session.commit()
+        user_id, customer_id, archived_id = user.id, customer.id, newest.id
+        bill_ids = [archived_id]
+
+    try:
+        with app.app_context():
+            assert archive_paid_bills(older_than_days=365) >= 1
+            assert db.session.get(ArchivedBill, archived_id) is not None
+            assert last_bill_id() >= archived_id
+            bill = Bill(bill_number=f'INV-{last_bill_id() + 1:06d}', customer_id=customer_id, created_by=user_id,
+                        status='draft', total_amount=1.0, remaining_amount=1.0)
+            db.session.add(bill)
+            db.session.commit()
+            bill_ids.append(bill.id)
+            assert bill.id > archived_id
+            assert bill.bill_number != db.session.get(ArchivedBill, archived_id).bill_number
+            print("✅ New bill after archiving the newest one gets a fresh id and number")
+    finally:
+        with app.app_context():
+            restore_archived_bills(bill_ids)
+            Bill.query.filter(Bill.id.in_(bill_ids)).delete(synchronize_session=False)
+            db.session.delete(db.session.get(Customer, customer_id))
+            db.session.delete(db.session.get(User, user_id))
+            db.session.commit()
+
+if __name__ == '__main__':
+    test_bill_archive()
+    test_archived_ids_not_reused()
+    print("\n🎉 Bill archive tests completed!")
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Test customer phone normalization and work entry linking
+"""
+
+from app import app
+from models import db, normalize_phone, Customer
+from utils.customers import find_or_create_customer
+
+def test_normalize_phone():
+    """Common ways of writing one number normalize to the same digits"""
+    for phone in ('9876543210', '+91 98765 43210', '098765-43210', '(91) 9876543210'):
+        assert normalize_phone(phone) == '9876543210', phone
+    assert normalize_phone('') is None
+    assert normalize_phone(None) is None
+    print("✅ Phone numbers normalized")
+
+def test_find_or_create_customer():
+    """Differently formatted phones resolve to a single customer"""
+    with app.app_context():
+        first = find_or_create_customer('Dedup Test', '+91 91234 56789')
+        second = find_or_create_customer('Dedup Test', '09123456789')
+        try:
+            assert first is not None and first == second
+            assert Customer.query.filter_by(phone_normalized='9123456789').count() == 1
+            print("✅ Customers deduplicated by normalized phone")
+        finally:
+            db.session.delete(db.session.get(Customer, first))
+            db.session.commit()
+
+if __name__ == '__main__':
+    test_normalize_phone()
+    test_find_or_create_customer()
+    print("\n🎉 Customer tests completed!")
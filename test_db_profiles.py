@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Test database engine profile selection, overrides and SQLite pragmas
+"""
+
+import os
+import tempfile
+from sqlalchemy import create_engine, text
+from utils.db_profiles import apply_sqlite_pragmas, engine_options, profile_name, profile_settings
+
+def test_profile_selection():
+    """auto picks the profile from the URL; overrides come from the environment"""
+    assert profile_name('sqlite:///x.db', 'auto') == 'sqlite'
+    assert profile_name('postgresql://localhost/x', 'auto') == 'postgres'
+    assert profile_name('postgresql://localhost/x', 'postgres_batch') == 'postgres_batch'
+
+    settings = profile_settings('postgres', {'DB_POOL_SIZE': '16', 'DB_STATEMENT_TIMEOUT_MS': '5000'})
+    options = engine_options('postgresql://localhost/x', settings)
+    assert options['pool_size'] == 16 and options['pool_pre_ping'] is True
+    assert options['connect_args'] == {'options': '-c statement_timeout=5000'}
+    assert engine_options('sqlite:///x.db', profile_settings('sqlite', {})) == {}
+    assert profile_settings('default', {'DB_POOL_SIZE': '16'}) == {}
+    print("✅ Profiles selected and overridden")
+
+def test_sqlite_pragmas():
+    """Every new SQLite connection gets WAL and the other pragmas"""
+    engine = create_engine('sqlite:///' + os.path.join(tempfile.mkdtemp(), 'profile.db'))
+    apply_sqlite_pragmas(engine, profile_settings('sqlite', {'SQLITE_BUSY_TIMEOUT_MS': '2500'}))
+    with engine.connect() as connection:
+        assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert connection.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+        assert connection.execute(text('PRAGMA busy_timeout')).scalar() == 2500
+        assert connection.execute(text('PRAGMA cache_size')).scalar() == -65536
+    print("✅ SQLite pragmas applied on connect")
+
+if __name__ == '__main__':
+    test_profile_selection()
+    test_sqlite_pragmas()
+    print("\n🎉 Database profile tests completed!")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test cached expense categories and category id filtering
+"""
+
+from sqlalchemy import insert
+from app import app
+from models import db, Expense, ExpenseCategory, User
+from utils.cache import bump_file_stamp
+from utils.expense_categories import category_id, category_names
+
+def login(client):
+    """Login as admin"""
+    return client.post('/auth/login', data={
+        'email': 'admin@smartbilling.com',
+        'password': 'admin123'
+    }, follow_redirects=True)
+
+def test_expense_category_ids():
+    """Expenses get the id of their category, and new names become categories"""
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@smartbilling.com').first()
+        assert 'Travel' in category_names()
+
+        travel = Expense(title='Category Test Bus', amount=10, category='Travel', created_by=admin.id)
+        custom = Expense(title='Category Test Chai', amount=5, category='Category Test Tea', created_by=admin.id)
+        db.session.add_all([travel, custom])
+        db.session.commit()
+        try:
+            assert travel.category_id == category_id('Travel')
+            assert custom.category_id is not None
+            assert 'Category Test Tea' in category_names()
+            print("✅ Category ids assigned and cache refreshed")
+
+            custom.category = 'Travel'
+            db.session.commit()
+            assert custom.category_id == travel.category_id
+            print("✅ Category id follows category changes")
+
+            with app.test_client() as client:
+                login(client)
+                response = client.get('/expenses/?category=Travel')
+                assert response.status_code == 200
+                assert b'Category Test Chai' in response.data
+                response = client.get('/expenses/?category=No Such Category')
+                assert b'Category Test Bus' not in response.data
+            print("✅ Expenses filtered by category id")
+        finally:
+            for expense in (travel, custom):
+                db.session.delete(expense)
+            db.session.delete(ExpenseCategory.query.filter_by(name='Category Test Tea').first())
+            db.session.commit()
+
+def test_category_stamp():
+    """A category added by another worker shows up once the stamp changes"""
+    with app.app_context():
+        assert 'Travel' in category_names()
+
+        # Another worker's insert, without this process's commit hooks
+        db.session.execute(insert(ExpenseCategory).values(name='Category Stamp Test'))
+        db.session.commit()
+        try:
+            assert 'Category Stamp Test' not in category_names()
+            bump_file_stamp(app.config['EXPENSE_CATEGORY_STAMP'])
+            assert 'Category Stamp Test' in category_names()
+            print("✅ Stamp bump from another worker reloads cached categories")
+        finally:
+            db.session.delete(ExpenseCategory.query.filter_by(name='Category Stamp Test').first())
+            db.session.commit()
+
+if __name__ == '__main__':
+    test_expense_category_ids()
+    test_category_stamp()
+    print("\n🎉 Expense category tests completed!")
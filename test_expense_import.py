@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test streaming expense import from CSV and bank statements
+"""
+
+import io
+from datetime import datetime
+from app import app
+from models import db, Expense, User
+from utils.expense_import import detect_date_format, import_expenses
+
+STATEMENT = (
+    "Statement for A/c XXXX1234\n"
+    "\n"
+    "Txn Date,Narration,Withdrawal Amt.,Deposit Amt.\n"
+    "01/03/2024,Import Test Paper,\"1,250.00\",\n"
+    "01/03/2024,Import Test Paper,\"1,250.00\",\n"
+    "02/03/2024,Import Test Refund,,500.00\n"
+    "03/03/2024,Import Test Toner,450,\n"
+    "31/02/2024,Import Test Bad Date,10,\n"
+)
+
+def login(client):
+    """Login as admin"""
+    return client.post('/auth/login', data={
+        'email': 'admin@smartbilling.com',
+        'password': 'admin123'
+    }, follow_redirects=True)
+
+def upload(client, dry_run):
+    data = {'file': (io.BytesIO(STATEMENT.encode('utf-8')), 'statement.csv'), 'default_category': 'Office Supplies'}
+    if dry_run:
+        data['dry_run'] = '1'
+    return client.post('/expenses/import', data=data, content_type='multipart/form-data')
+
+def test_expense_import():
+    """Dry run, import and re-import of a bank statement"""
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@smartbilling.com').first()
+        manual = Expense(title='Import Test Toner', amount=450, category='Office Supplies',
+                         date=datetime(2024, 3, 3), created_by=admin.id)
+        db.session.add(manual)
+        db.session.commit()
+
+        def imported():
+            return Expense.query.filter(Expense.created_by == admin.id,
+                                        Expense.title.like('Import Test%')).count()
+
+        try:
+            with app.test_client() as client:
+                login(client)
+
+                response = upload(client, dry_run=True)
+                assert response.status_code == 200
+                assert b'Dry Run Result' in response.data
+                assert imported() == 1
+                print("✅ Dry run saved nothing")
+
+                response = upload(client, dry_run=False)
+                assert response.status_code == 200
+                # Both identical paper rows are kept, the toner already exists, the refund is a credit
+                assert imported() == 3
+                paper = Expense.query.filter_by(created_by=admin.id, title='Import Test Paper').first()
+                assert paper.amount == 1250.0 and paper.date == datetime(2024, 3, 1)
+                assert paper.category == 'Office Supplies' and paper.category_id is not None
+                assert b'Line 8' in response.data
+                print("✅ Statement imported with duplicates, credits and bad rows skipped")
+
+                upload(client, dry_run=False)
+                assert imported() == 3
+                print("✅ Re-import added nothing")
+        finally:
+            for expense in Expense.query.filter(Expense.created_by == admin.id,
+                                                Expense.title.like('Import Test%')):
+                db.session.delete(expense)
+            db.session.commit()
+
+def test_mixed_ambiguous_dates():
+    """One date format per file: a month-first date makes every date month-first, every run"""
+    values = ['05/03/2024', '12/25/2024', '01/02/2024', '05/03/2024']
+    for _ in range(3):
+        assert detect_date_format(values) == '%m/%d/%Y'
+    assert detect_date_format(['05/03/2024', '01/02/2024']) == '%d/%m/%Y'
+    print("✅ Ambiguous dates follow the column's format")
+
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@smartbilling.com').first()
+        csv_text = ("Date,Description,Amount\n"
+                    "05/03/2024,Mixed Date Test A,10\n"
+                    "12/25/2024,Mixed Date Test B,20\n"
+                    "01/02/2024,Mixed Date Test C,30\n")
+        try:
+            report = import_expenses(admin.id, io.StringIO(csv_text), chunk_size=2)
+            assert report['imported'] == 3 and report['date_format'] == '%m/%d/%Y'
+            dates = dict(db.session.query(Expense.title, Expense.date).filter(
+                Expense.title.like('Mixed Date Test %')))
+            assert dates == {'Mixed Date Test A': datetime(2024, 5, 3), 'Mixed Date Test B': datetime(2024, 12, 25),
+                             'Mixed Date Test C': datetime(2024, 1, 2)}
+            print("✅ Every row of the file imported with the same format")
+        finally:
+            Expense.query.filter(Expense.title.like('Mixed Date Test %')).delete(synchronize_session=False)
+            db.session.commit()
+
+if __name__ == '__main__':
+    test_expense_import()
+    test_mixed_ambiguous_dates()
+    print("\n🎉 Expense import tests completed!")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test per-IP and per-account login throttling
+"""
+
+from app import app
+from routes import auth
+from utils import login_throttle
+
+def attempt(client, email, password, ip, forwarded_for=None):
+    headers = {'X-Forwarded-For': forwarded_for} if forwarded_for else {}
+    return client.post('/auth/login', data={'email': email, 'password': password},
+                       environ_base={'REMOTE_ADDR': ip}, headers=headers)
+
+def test_login_throttle():
+    """Buckets and backoff refuse attempts with 429 before any password check"""
+    original = dict(app.config)
+    check_and_upgrade = auth.check_and_upgrade
+    checks = []
+    app.config.update(LOGIN_THROTTLE_STORE='', LOGIN_IP_BURST=6, LOGIN_IP_PER_MINUTE=1,
+                      LOGIN_ACCOUNT_BURST=20, LOGIN_BACKOFF_AFTER=3, LOGIN_BACKOFF_SECONDS=30)
+    auth.check_and_upgrade = lambda user, password: checks.append(user) or check_and_upgrade(user, password)
+    login_throttle._store = None
+    try:
+        client = app.test_client()
+        for number in range(3):
+            assert attempt(client, 'admin@smartbilling.com', 'wrong', '198.51.100.1').status_code == 200
+        response = attempt(client, 'admin@smartbilling.com', 'admin123', '198.51.100.2')
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) > 20
+        assert len(checks) == 3
+        print("✅ Account backs off after repeated failures, from any IP")
+
+        for number in range(6):
+            assert attempt(client, f'nobody{number}@example.com', 'wrong', '198.51.100.3').status_code == 200
+        response = attempt(client, 'someone@example.com', 'wrong', '198.51.100.3')
+        assert response.status_code == 429
+        assert attempt(client, 'someone@example.com', 'wrong', '198.51.100.5').status_code == 200
+        print("✅ IP bucket refuses once its burst is used up")
+
+        proxy = '10.0.0.1'
+        for number in range(6):
+            assert attempt(client, f'nobody{number}@example.com', 'wrong', proxy, '203.0.113.7').status_code == 200
+        assert attempt(client, 'someone@example.com', 'wrong', proxy, '203.0.113.7').status_code == 429
+        assert attempt(client, 'someone@example.com', 'wrong', proxy, '203.0.113.8').status_code == 200
+        print("✅ Clients behind the same proxy get their own IP buckets")
+
+        login_throttle._store = None
+        for number in range(10):
+            assert attempt(client, 'admin@smartbilling.com', 'admin123', '198.51.100.4').status_code == 302
+            client.get('/auth/logout')
+        print("✅ Successful sign-ins give their tokens back")
+    finally:
+        app.config.clear()
+        app.config.update(original)
+        auth.check_and_upgrade = check_and_upgrade
+        login_throttle._store = None
+
+if __name__ == '__main__':
+    test_login_throttle()
+    print("\n🎉 Login throttle tests completed!")
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test versioned schema migrations: up/down round trip, adopting old databases
+and the models-vs-migrations check
+"""
+
+import os
+import tempfile
+import sqlalchemy as sa
+from app import app
+from models import db
+from utils.migrations import VERSION_TABLE, check_models, current_version, downgrade, head_version, upgrade
+
+def temp_engine():
+    return sa.create_engine('sqlite:///' + os.path.join(tempfile.mkdtemp(), 'migrations.db'))
+
+def test_models_match_migrations():
+    """Fails when a model changes without a migration"""
+    with app.app_context():
+        problems = check_models(db.metadata)
+    assert problems == [], '\n'.join(problems)
+    print("✅ Models match the migrations")
+
+    changed = sa.MetaData()
+    for table in db.metadata.sorted_tables:
+        table.to_metadata(changed)
+    changed.tables['bill'].append_column(sa.Column('archived', sa.Boolean))
+    sa.Index('ix_bill_archived', changed.tables['bill'].c.archived)
+    problems = check_models(changed)
+    assert any('archived' in problem for problem in problems)
+    assert any('ix_bill_archived' in problem for problem in problems)
+    print("✅ Unmigrated model change detected")
+
+def test_upgrade_downgrade_round_trip():
+    """Every step can be reverted and re-applied"""
+    engine = temp_engine()
+    assert upgrade(engine) == list(range(1, head_version() + 1))
+    assert upgrade(engine) == []
+
+    try:
+        downgrade(engine, 0)
+        assert False, 'reverting the baseline must need force'
+    except RuntimeError:
+        assert current_version(engine) == head_version()
+    print("✅ Baseline downgrade refused without force")
+
+    downgrade(engine, 0, force=True)
+    assert current_version(engine) == 0
+    assert sa.inspect(engine).get_table_names() == [VERSION_TABLE]
+
+    upgrade(engine, 1)
+    assert current_version(engine) == 1
+    assert 'ix_bill_owner_created' not in [index['name'] for index in sa.inspect(engine).get_indexes('bill')]
+    upgrade(engine)
+    assert 'ix_bill_owner_created' in [index['name'] for index in sa.inspect(engine).get_indexes('bill')]
+    print("✅ Upgrade/downgrade round trip")
+
+def test_archive_downgrade_refused_with_archived_bills():
+    """Reverting the archive tables would drop archived bills"""
+    engine = temp_engine()
+    upgrade(engine)
+    with engine.begin() as connection:
+        connection.execute(sa.text(
+            "INSERT INTO archived_bill (id, bill_number, customer_id, created_by, payload)"
+            " VALUES (1, 'INV-000001', 1, 1, x'00')"
+        ))
+    try:
+        downgrade(engine, 2)
+        assert False, 'archived bills must be restored first'
+    except RuntimeError as e:
+        assert 'archive_bills.py --restore' in str(e)
+    assert 'archived_bill' in sa.inspect(engine).get_table_names()
+    print("✅ Archive downgrade refused while bills are archived")
+
+def test_bill_ids_continue_after_archive():
+    """Rebuilding bill with AUTOINCREMENT keeps its rows and skips archived ids"""
+    engine = temp_engine()
+    upgrade(engine, 8)
+    with engine.begin() as connection:
+        connection.execute(sa.text(
+            "INSERT INTO bill (id, bill_number, customer_id, created_by) VALUES (1, 'INV-000001', 1, 1)"
+        ))
+        connection.execute(sa.text(
+            "INSERT INTO archived_bill (id, bill_number, customer_id, created_by, payload)"
+            " VALUES (5, 'INV-000005', 1, 1, x'00')"
+        ))
+    upgrade(engine)
+    with engine.begin() as connection:
+        connection.execute(sa.text("INSERT INTO bill (bill_number, customer_id, created_by) VALUES ('INV-000006', 1, 1)"))
+        assert [row[0] for row in connection.execute(sa.text('SELECT id FROM bill ORDER BY id'))] == [1, 6]
+    assert 'ix_bill_owner_created' in [index['name'] for index in sa.inspect(engine).get_indexes('bill')]
+    print("✅ Bill ids continue after the archived ones")
+
+def test_adopt_existing_database():
+    """A database from before the migrations keeps its rows, gains missing columns and is backfilled"""
+    engine = temp_engine()
+    with engine.begin() as connection:
+        connection.execute(sa.text(
+            'CREATE TABLE expense (id INTEGER PRIMARY KEY, title VARCHAR(100) NOT NULL, description TEXT,'
+            ' amount FLOAT NOT NULL, category VARCHAR(50) NOT NULL, date DATETIME,'
+            ' created_by INTEGER NOT NULL, receipt_path VARCHAR(200))'
+        ))
+        connection.execute(sa.text(
+            'CREATE TABLE customer (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, email VARCHAR(120),'
+            ' phone VARCHAR(15), whatsapp VARCHAR(15), address TEXT, created_at DATETIME)'
+        ))
+        connection.execute(sa.text(
+            'CREATE TABLE work_entry (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL,'
+            ' customer_name VARCHAR(100) NOT NULL, customer_phone VARCHAR(15) NOT NULL,'
+            ' service_type VARCHAR(50) NOT NULL, project_name VARCHAR(100) NOT NULL,'
+            ' task_description TEXT NOT NULL, start_time DATETIME NOT NULL, created_at DATETIME)'
+        ))
+        connection.execute(sa.text(
+            "INSERT INTO expense (title, amount, category, date, created_by) VALUES ('Tea', 10, 'Snacks', '2024-01-05', 1)"
+        ))
+        connection.execute(sa.text("INSERT INTO customer (name, phone) VALUES ('Asha', '98765 43210')"))
+        connection.execute(sa.text(
+            "INSERT INTO work_entry (user_id, customer_name, customer_phone, service_type, project_name,"
+            " task_description, start_time) VALUES"
+            " (1, 'Asha', '+91 9876543210', 'Design', 'Site', 'Logo', '2024-01-05'),"
+            " (1, 'Ravi', '91234 56789', 'Design', 'Shop', 'Banner', '2024-01-06')"
+        ))
+    upgrade(engine)
+    columns = [column['name'] for column in sa.inspect(engine).get_columns('expense')]
+    assert 'category_id' in columns and 'dedup_key' in columns
+    with engine.connect() as connection:
+        assert connection.execute(sa.text('SELECT COUNT(*) FROM expense')).scalar() == 1
+        print("✅ Existing database adopted")
+
+        category_id, dedup_key = connection.execute(sa.text('SELECT category_id, dedup_key FROM expense')).one()
+        assert dedup_key and connection.execute(sa.text(
+            'SELECT name FROM expense_category WHERE id = :id'), {'id': category_id}
+        ).scalar() == 'Snacks'
+        assert connection.execute(sa.text(
+            "SELECT phone_normalized FROM customer WHERE name = 'Asha'")).scalar() == '9876543210'
+        links = dict(connection.execute(sa.text(
+            'SELECT work_entry.customer_name, customer.name FROM work_entry'
+            ' JOIN customer ON customer.id = work_entry.customer_id')).all())
+        assert links == {'Asha': 'Asha', 'Ravi': 'Ravi'}
+        assert connection.execute(sa.text('SELECT COUNT(*) FROM customer')).scalar() == 2
+        catalog = set(connection.execute(sa.text('SELECT kind, name, entry_count FROM work_catalog_item')).all())
+        assert catalog == {('service', 'Design', 2), ('project', 'Site', 1), ('project', 'Shop', 1)}
+    print("✅ Categories, dedup keys, customer links and the work catalog backfilled")
+
+if __name__ == '__main__':
+    test_models_match_migrations()
+    test_upgrade_downgrade_round_trip()
+    test_archive_downgrade_refused_with_archived_bills()
+    test_bill_ids_continue_after_archive()
+    test_adopt_existing_database()
+    print("\n🎉 Migration tests completed!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test configurable password hashing, rehash-on-login and the bounded pool
+"""
+
+from app import app
+from models import db, User
+from utils import passwords
+from utils.passwords import stored_policy
+
+EMAIL = 'hash_test@example.com'
+
+def login(client, password='hash-test-password'):
+    return client.post('/auth/login', data={'email': EMAIL, 'password': password})
+
+def stored_hash():
+    with app.app_context():
+        return User.query.filter_by(email=EMAIL).first().password_hash
+
+def test_rehash_on_login():
+    """Hashes follow the configured policy at the next successful login"""
+    original = dict(app.config)
+    with app.app_context():
+        app.config.update(PASSWORD_HASH_METHOD='pbkdf2', PASSWORD_HASH_COST=600000)
+        user = User(username='hash_test', email=EMAIL, role='user')
+        user.set_password('hash-test-password')
+        db.session.add(user)
+        db.session.commit()
+    try:
+        assert stored_policy(stored_hash()) == ('pbkdf2', 600000)
+
+        app.config.update(PASSWORD_HASH_METHOD='bcrypt', PASSWORD_HASH_COST=10)
+        before = stored_hash()
+        assert login(app.test_client(), 'wrong-password').status_code == 200
+        assert stored_hash() == before
+        assert login(app.test_client()).status_code == 302
+        if passwords.BCRYPT_AVAILABLE:
+            assert stored_policy(stored_hash()) == ('bcrypt', 10)
+        print("✅ Hash upgraded on login, untouched on a failed login")
+
+        app.config.update(PASSWORD_HASH_METHOD='pbkdf2', PASSWORD_HASH_COST=100000)
+        assert login(app.test_client()).status_code == 302
+        assert stored_policy(stored_hash()) == ('pbkdf2', 100000)
+        assert login(app.test_client()).status_code == 302
+        print("✅ Hash downgraded to a cheaper policy, login still works")
+
+        app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=0)
+        assert login(app.test_client()).status_code == 302
+        passwords._slots.acquire()
+        try:
+            assert login(app.test_client()).status_code == 503
+        finally:
+            passwords._slots.release()
+        print("✅ Pooled checks refuse logins beyond the queue limit")
+    finally:
+        app.config.clear()
+        app.config.update(original)
+        passwords._executor = None
+        passwords._slots = None
+        with app.app_context():
+            db.session.delete(User.query.filter_by(email=EMAIL).first())
+            db.session.commit()
+
+if __name__ == '__main__':
+    test_rehash_on_login()
+    print("\n🎉 Password hashing tests completed!")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test background profile photo resizing and cacheable serving
+"""
+
+import io
+import os
+import time
+from app import app
+from models import User
+from utils.profile_photos import FORMATS, PHOTO_SIZES, PIL_AVAILABLE, photo_folder, variant_filename
+from utils.uploads import submit
+
+def login(client):
+    """Login as admin"""
+    return client.post('/auth/login', data={
+        'email': 'admin@smartbilling.com',
+        'password': 'admin123'
+    }, follow_redirects=True)
+
+def photo_bytes():
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.effect_noise((2400, 1600), 40).convert('RGB').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def test_profile_photo_upload():
+    """Upload returns at once; sized JPEG/WebP copies are served as immutable"""
+    if not PIL_AVAILABLE:
+        print("⚠️  Pillow not installed, skipping")
+        return
+
+    client = app.test_client()
+    login(client)
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@smartbilling.com').first()
+        form = {'username': admin.username, 'email': admin.email, 'phone': admin.phone or ''}
+
+    response = client.post('/settings/profile', data=dict(form, profile_photo=(io.BytesIO(photo_bytes()), 'me.png')),
+                           content_type='multipart/form-data')
+    assert response.status_code == 302
+
+    with app.app_context():
+        photo_path = User.query.filter_by(email='admin@smartbilling.com').first().profile_photo
+        filename = os.path.basename(photo_path)
+        assert len(filename) == 68 and filename.endswith('.png')
+        folder = photo_folder()
+    print("✅ Photo stored under its content hash")
+
+    webp = os.path.join(folder, variant_filename(filename, 160, 'webp'))
+    variants = [os.path.join(folder, variant_filename(filename, size, extension))
+                for size in PHOTO_SIZES for extension, _, _ in FORMATS]
+    deadline = time.time() + 20
+    while not all(os.path.exists(variant) for variant in variants) and time.time() < deadline:
+        time.sleep(0.1)
+    assert all(os.path.exists(variant) for variant in variants)
+
+    page = client.get('/settings/profile', headers={'Accept': 'text/html,image/webp,*/*'})
+    assert variant_filename(filename, 160, 'webp').encode() in page.data
+    page = client.get('/settings/profile', headers={'Accept': 'text/html,*/*'})
+    assert variant_filename(filename, 160, 'jpg').encode() in page.data
+    print("✅ Pages pick the sized WebP or JPEG copy")
+
+    response = client.get(f'/uploads/profiles/{variant_filename(filename, 160, "webp")}')
+    assert response.status_code == 200 and response.mimetype == 'image/webp'
+    assert 'immutable' in response.headers['Cache-Control']
+    cached = client.get(f'/uploads/profiles/{variant_filename(filename, 160, "webp")}',
+                        headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+    print("✅ Copies served with immutable caching and conditional GET")
+
+    # Let resize jobs queued by the page views finish, or they write the copies again
+    with app.app_context():
+        submit(lambda: None).result(timeout=20)
+    client.post('/settings/profile/delete-photo', json={})
+    assert not os.path.exists(os.path.join(folder, filename)) and not os.path.exists(webp)
+    print("✅ Photo and copies removed")
+
+if __name__ == '__main__':
+    test_profile_photo_upload()
+    print("\n🎉 Profile photo tests completed!")
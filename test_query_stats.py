@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test per-request SQL instrumentation: Server-Timing, slow-query log and admin page
+"""
+
+import os
+import tempfile
+from app import app
+from models import db
+from utils.query_stats import init_query_stats, parameter_shape, query_stats, reset_query_stats, slow_query_log
+
+def login(client, email='admin@smartbilling.com', password='admin123'):
+    return client.post('/auth/login', data={'email': email, 'password': password})
+
+def test_parameter_shape():
+    """Slow-query parameters are logged as types, never values"""
+    assert parameter_shape((1, 'secret', None)) == '(int, str, None)'
+    assert parameter_shape({'id': 5, 'email': 'a@b.c'}) == '{id: int, email: str}'
+    assert parameter_shape([(1,), (2,)], executemany=True) == '2 x (int)'
+    assert parameter_shape(tuple(range(25))).endswith('... 25 parameters)')
+    print("✅ Parameter shapes hide values")
+
+def test_query_stats():
+    """Admins get a Server-Timing header; slow statements reach the log and the admin page"""
+    log_path = os.path.join(tempfile.mkdtemp(), 'slow_queries.log')
+    settings = {key: app.config[key] for key in ('SLOW_QUERY_MS', 'SLOW_QUERY_LOG')}
+    app.config.update(SLOW_QUERY_MS=0.0001, SLOW_QUERY_LOG=log_path)
+    try:
+        with app.app_context():
+            init_query_stats(app, db.engines.values())
+        reset_query_stats()
+
+        client = app.test_client()
+        anonymous = client.get('/auth/login')
+        assert anonymous.status_code == 200 and 'Server-Timing' not in anonymous.headers
+        print("✅ Anonymous responses carry no Server-Timing")
+
+        login(client)
+        response = client.get('/dashboard')
+        assert response.status_code == 200
+        timing = response.headers['Server-Timing']
+        assert timing.startswith('db;dur=') and 'queries' in timing and 'app;dur=' in timing
+        print(f"✅ Server-Timing: {timing}")
+
+        for handler in slow_query_log.handlers:
+            handler.flush()
+        with open(log_path, encoding='utf-8') as log:
+            lines = log.read().splitlines()
+        assert lines and any('main.dashboard' in line and 'params=' in line for line in lines)
+        assert not any('admin@smartbilling.com' in line for line in lines)
+        print(f"✅ {len(lines)} slow statements logged with parameter shapes")
+
+        stats = query_stats('db')
+        dashboard = next(row for row in stats['routes'] if row['endpoint'] == 'main.dashboard')
+        assert dashboard['max_statements'] > 10 and dashboard['slowest_statement']
+        assert stats['slow_queries']
+
+        page = client.get('/dashboard/query-stats?order=statements')
+        assert page.status_code == 200 and b'main.dashboard' in page.data
+        print("✅ Admin page lists the dashboard route and its slowest query")
+    finally:
+        with app.app_context():
+            app.config.update(settings)
+            init_query_stats(app, db.engines.values())
+
+if __name__ == '__main__':
+    test_parameter_shape()
+    test_query_stats()
+    print("\n🎉 Query statistics tests completed!")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test routing of report reads to the read replica
+"""
+
+import os
+import sqlite3
+import tempfile
+from datetime import date
+from sqlalchemy import create_engine, event
+from app import app
+from models import db, Expense
+from utils import read_replica
+
+def login(client, email='admin@smartbilling.com', password='admin123'):
+    return client.post('/auth/login', data={'email': email, 'password': password})
+
+def use_replica(engine):
+    """Install `engine` as the replica bind and forget the last health check and earlier writes"""
+    with app.app_context():
+        db.engines[read_replica.REPLICA_BIND] = engine
+    read_replica._health.update(checked_at=0.0, healthy=False, lag=None)
+    read_replica._last_writes.clear()
+
+def test_read_replica():
+    """Reports read from the replica, except after a write or when it is down"""
+    replica_path = os.path.join(tempfile.mkdtemp(), 'replica.db')
+    with app.app_context():
+        primary = sqlite3.connect(db.engine.url.database)
+        copy = sqlite3.connect(replica_path)
+        primary.backup(copy)
+        primary.close()
+        copy.close()
+
+    replica = create_engine(f'sqlite:///{replica_path}')
+    statements = []
+    event.listen(replica, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    use_replica(replica)
+
+    client = app.test_client()
+    login(client)
+    try:
+        assert client.get('/work/reports').status_code == 200
+        assert any('work_entry' in statement for statement in statements)
+        print("✅ Work report read from the replica")
+
+        statements.clear()
+        assert client.get('/dashboard').status_code == 200
+        assert not statements
+        print("✅ Unmarked views stay on the primary")
+
+        response = client.get('/export/work?format=csv')
+        assert response.status_code == 200 and response.data
+        assert not any('work_entry' in statement for statement in statements)
+        print("✅ Streamed export bodies read from the primary")
+
+        with app.test_request_context('/work/reports'):
+            assert read_replica.choose_replica() is None
+        print("✅ Requests without a session cookie stay on the primary")
+
+        response = client.post('/expenses/create', data={
+            'title': 'Replica test', 'description': '', 'amount': '12.50',
+            'category': 'Other', 'date': date.today().isoformat()
+        })
+        assert response.status_code == 302
+        statements.clear()
+        assert client.get('/work/reports').status_code == 200
+        assert not statements
+        print("✅ Reads after the user's own write go to the primary")
+
+        fresh = app.test_client()
+        login(fresh)
+        assert fresh.get('/work/reports').status_code == 200
+        assert not statements
+        print("✅ Also from a client that did not keep the updated cookie")
+
+        use_replica(create_engine('sqlite:////nonexistent/dir/replica.db'))
+        other = app.test_client()
+        login(other)
+        assert other.get('/work/reports/data').status_code == 200
+        assert read_replica._health['healthy'] is False
+        print("✅ Unreachable replica falls back to the primary")
+    finally:
+        with app.app_context():
+            db.engines.pop(read_replica.REPLICA_BIND, None)
+            Expense.query.filter_by(title='Replica test').delete()
+            db.session.commit()
+        read_replica._health.update(checked_at=0.0, healthy=False, lag=None)
+        read_replica._last_writes.clear()
+        replica.dispose()
+        os.remove(replica_path)
+
+if __name__ == '__main__':
+    test_read_replica()
+    print("\n🎉 Read replica tests completed!")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test receipt uploads, deduplication, background thumbnails and caching
+"""
+
+import io
+import os
+import tempfile
+import time
+from app import app
+from models import db, Expense
+from utils.receipts import PIL_AVAILABLE, variant_name
+
+def login(client):
+    """Login as admin"""
+    return client.post('/auth/login', data={
+        'email': 'admin@smartbilling.com',
+        'password': 'admin123'
+    }, follow_redirects=True)
+
+def receipt_image():
+    """A 3000x2000 JPEG, or a minimal JPEG header when Pillow is missing"""
+    if not PIL_AVAILABLE:
+        return b'\xff\xd8\xff\xe0' + os.urandom(1024)
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.effect_noise((3000, 2000), 64).convert('RGB').save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+def add_expense(client, title, data):
+    return client.post('/expenses/create', data={
+        'title': title, 'amount': '120', 'category': 'Office Supplies', 'date': '2024-03-01',
+        'description': '', 'receipt': (io.BytesIO(data), 'photo.jpg')
+    }, content_type='multipart/form-data')
+
+def test_receipt_upload():
+    """Duplicate receipts are stored once, resized off-request and served cacheably"""
+    app.config['RECEIPT_FOLDER'] = tempfile.mkdtemp()
+    image = receipt_image()
+
+    client = app.test_client()
+    login(client)
+    add_expense(client, 'Receipt Test One', image)
+    add_expense(client, 'Receipt Test Two', image)
+    response = client.post('/expenses/create', data={
+        'title': 'Receipt Test Bad', 'amount': '1', 'category': 'Other', 'date': '2024-03-01',
+        'receipt': (io.BytesIO(b'MZ not a receipt'), 'virus.jpg')
+    }, content_type='multipart/form-data', follow_redirects=True)
+    assert b'Only JPG, PNG' in response.data
+
+    with app.app_context():
+        expenses = Expense.query.filter(Expense.title.like('Receipt Test%')).order_by(Expense.id).all()
+        (first_id, receipt_path), (second_id, second_path) = [(e.id, e.receipt_path) for e in expenses]
+    assert receipt_path and receipt_path == second_path
+    path = os.path.join(app.config['RECEIPT_FOLDER'], receipt_path)
+    assert open(path, 'rb').read() == image
+    print("✅ Identical receipts stored once under their hash")
+
+    url = f'/expenses/receipts/{receipt_path}'
+    response = client.get(url)
+    assert response.status_code == 200 and response.data == image
+    assert 'immutable' in response.headers['Cache-Control']
+    cached = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+    print("✅ Receipts served with immutable caching and conditional GET")
+
+    if PIL_AVAILABLE:
+        thumb = os.path.join(app.config['RECEIPT_FOLDER'], variant_name(receipt_path, 'thumb'))
+        deadline = time.time() + 20
+        while not os.path.exists(thumb) and time.time() < deadline:
+            time.sleep(0.1)
+        response = client.get(url + '?size=thumb')
+        assert response.status_code == 200 and len(response.data) < len(image) // 10
+        assert 'immutable' in response.headers['Cache-Control']
+        print("✅ Thumbnail generated in the background")
+
+    client.post(f'/expenses/{first_id}/delete')
+    assert os.path.exists(path)
+    client.post(f'/expenses/{second_id}/delete')
+    assert not os.path.exists(path)
+    print("✅ Receipt removed with its last expense")
+
+if __name__ == '__main__':
+    test_receipt_upload()
+    print("\n🎉 Receipt tests completed!")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Test that importing the app creates no database state and loads no optional
+heavy modules, and that `python migrate.py init` is idempotent
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def run(code, database, **env):
+    environ = {name: value for name, value in os.environ.items() if name != 'AUTO_MIGRATE'}
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True,
+                          env=dict(environ, DATABASE_URL='sqlite:///' + database, **env)).stdout
+
+def tables(database):
+    with sqlite3.connect(database) as connection:
+        return {name for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+def test_import_creates_no_state():
+    """By default (AUTO_MIGRATE unset), importing app.py leaves a new database empty"""
+    database = os.path.join(tempfile.mkdtemp(), 'startup.db')
+    output = run("import sys, app; print(sorted({'reportlab', 'pywhatkit', 'openpyxl'} & set(sys.modules)))",
+                 database)
+    assert output.strip() == '[]'
+    assert not os.path.exists(database) or not tables(database)
+    print("✅ Import created no tables and loaded no PDF, WhatsApp or XLSX modules")
+
+def test_init_is_idempotent():
+    """migrate.py init creates the schema and default admin once"""
+    database = os.path.join(tempfile.mkdtemp(), 'startup.db')
+    for _ in range(2):
+        subprocess.run([sys.executable, 'migrate.py', 'init'], cwd=ROOT, check=True, capture_output=True,
+                       env=dict(os.environ, DATABASE_URL='sqlite:///' + database))
+    assert {'user', 'bill', 'schema_migrations'} <= tables(database)
+    with sqlite3.connect(database) as connection:
+        admins = connection.execute("SELECT COUNT(*) FROM user WHERE email = 'admin@smartbilling.com'").fetchone()
+    assert admins == (1,)
+    print("✅ migrate.py init created the schema and one default admin")
+
+if __name__ == '__main__':
+    test_import_creates_no_state()
+    test_init_is_idempotent()
+    print("\n🎉 Startup tests completed!")
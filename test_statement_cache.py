@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test the prebuilt hot-path statements and per-route query statistics
+"""
+
+from app import app
+from models import db, User, Bill
+from utils.query_stats import init_query_stats, query_stats, reset_query_stats
+from utils.statements import STATEMENTS, lookup, scalar
+
+def login(client, email='admin@smartbilling.com', password='admin123'):
+    return client.post('/auth/login', data={'email': email, 'password': password})
+
+def test_statements():
+    """Registered statements match the Query API results"""
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@smartbilling.com').first()
+        assert 'bill_count/owner' in STATEMENTS and 'user_count/owner' not in STATEMENTS
+        assert scalar('user_count') == User.query.count()
+        assert scalar('bill_count', owner=admin.id) == Bill.query.filter_by(created_by=admin.id).count()
+        assert lookup(User, admin.id) is admin
+        assert lookup(User, 999999999) is None
+        print("✅ Prebuilt statements agree with the Query API")
+
+def test_query_stats():
+    """Dashboards render from the statement cache and record per-route figures"""
+    with app.app_context():
+        init_query_stats(app, db.engines.values())
+    client = app.test_client()
+    login(client)
+    client.get('/dashboard')
+    reset_query_stats()
+
+    for _ in range(3):
+        assert client.get('/dashboard').status_code == 200
+    assert client.get('/billing/bills/999999999').status_code == 404
+    assert client.get('/work/entries/999999999').status_code == 404
+    print("✅ Dashboard renders; missing ids return 404")
+
+    stats = client.get('/dashboard/api/query-stats').get_json()
+    routes = {row['endpoint']: row for row in stats['routes']}
+    dashboard = routes['main.dashboard']
+    assert dashboard['requests'] == 3 and dashboard['avg_statements'] > 10
+    assert dashboard['cache_hit_rate'] > 90
+    assert query_stats()['compile_cache']['hits'] > 0
+    print(f"✅ Dashboard: {dashboard['avg_statements']} statements, "
+          f"{dashboard['cache_hit_rate']}% compile-cache hits")
+
+if __name__ == '__main__':
+    test_statements()
+    test_query_stats()
+    print("\n🎉 Statement cache tests completed!")
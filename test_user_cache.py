@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test the logged-in user cache and its invalidation
+"""
+
+from sqlalchemy import update
+from app import app
+from models import db, User
+from utils import user_cache
+from utils.user_cache import bump_stamp
+
+EMAIL = 'cache_test@example.com'
+
+def login(client, email='admin@smartbilling.com', password='admin123'):
+    return client.post('/auth/login', data={'email': email, 'password': password})
+
+def test_user_cache():
+    """Repeat requests skip the user query; changes reach the next request"""
+    with app.app_context():
+        user = User(username='cache_test', email=EMAIL, role='user')
+        user.set_password('cache-test-password')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    try:
+        client = app.test_client()
+        assert login(client, EMAIL, 'cache-test-password').status_code == 302
+        assert client.get('/dashboard').status_code == 200
+        hits = user_cache._cache.hits
+        assert client.get('/dashboard').status_code == 200
+        assert user_cache._cache.hits == hits + 1
+        print("✅ Second request served the user from the cache")
+
+        # Another worker changed the role outside this process's session
+        with app.app_context():
+            db.session.execute(update(User).where(User.id == user_id).values(role='admin'))
+            db.session.commit()
+        assert client.get('/auth/users').status_code == 302
+        with app.app_context():
+            bump_stamp()
+        assert client.get('/auth/users').status_code == 200
+        print("✅ Stamp bump from another worker reloads the user")
+
+        admin = app.test_client()
+        login(admin)
+        assert admin.get(f'/auth/users/{user_id}/toggle').status_code == 302
+        response = client.get('/dashboard')
+        assert response.status_code == 302 and '/auth/login' in response.headers['Location']
+        print("✅ Deactivated user is signed out on the next request")
+    finally:
+        with app.app_context():
+            db.session.delete(db.session.get(User, user_id))
+            db.session.commit()
+
+if __name__ == '__main__':
+    test_user_cache()
+    print("\n🎉 User cache tests completed!")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test the paginated admin user directory and its per-user aggregates
+"""
+
+from datetime import datetime
+from sqlalchemy import event
+from app import app
+from models import db, Bill, Customer, User, WorkEntry
+from utils.users import user_activity
+
+def login(client):
+    """Login as admin"""
+    return client.post('/auth/login', data={
+        'email': 'admin@smartbilling.com',
+        'password': 'admin123'
+    }, follow_redirects=True)
+
+def test_user_activity():
+    """Counts, paid revenue and open work come from grouped queries"""
+    with app.app_context():
+        user = User(username='directory_test', email='directory_test@example.com', role='user')
+        user.set_password('directory-test')
+        customer = Customer(name='Directory Customer', phone='9000000001')
+        db.session.add_all([user, customer])
+        db.session.flush()
+        for number, (status, amount) in enumerate([('paid', 100.0), ('paid', 50.0), ('draft', 999.0)]):
+            db.session.add(Bill(bill_number=f'DIR-TEST-{number}', customer_id=customer.id, created_by=user.id,
+                                status=status, total_amount=amount))
+        for status in ('in_progress', 'pending', 'delivered'):
+            db.session.add(WorkEntry(user_id=user.id, customer_name='Directory Customer', customer_phone='9000000001',
+                                     service_type='print', project_name='Directory', task_description='-',
+                                     start_time=datetime(2024, 1, 1), work_status=status))
+        db.session.commit()
+        user_id, customer_id = user.id, customer.id
+
+    try:
+        with app.app_context():
+            data = user_activity([user_id])[user_id]
+        assert data['bills'] == 3 and data['revenue'] == 150.0
+        assert data['work_entries'] == 3 and data['open_work'] == 2
+        assert data['last_activity'] is not None
+        print("✅ Per-user aggregates correct")
+
+        statements = []
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        client = app.test_client()
+        login(client)
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            response = client.get('/auth/users?search=directory_test')
+            searched = len(statements)
+            statements.clear()
+            assert client.get('/auth/users').status_code == 200
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+        assert response.status_code == 200 and b'directory_test' in response.data
+        assert b'Rs 150.00' in response.data
+        assert len(statements) == searched
+        print(f"✅ Directory page runs {searched} queries however many users and records")
+    finally:
+        with app.app_context():
+            Bill.query.filter_by(created_by=user_id).delete()
+            WorkEntry.query.filter_by(user_id=user_id).delete()
+            db.session.delete(db.session.get(Customer, customer_id))
+            db.session.delete(db.session.get(User, user_id))
+            db.session.commit()
+
+if __name__ == '__main__':
+    test_user_activity()
+    print("\n🎉 User directory tests completed!")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test billing completed work entries
+"""
+
+from datetime import datetime
+from app import app
+from models import db, User, Bill, WorkEntry
+from utils.work_billing import (unbilled_entries_query, unbillable_entries, billable_query, preview_unbilled,
+                                bill_unbilled_work)
+
+def test_bill_unbilled_work():
+    """One bill per customer phone, and entries are never billed twice"""
+    with app.app_context():
+        user = User.query.filter_by(email='admin@smartbilling.com').first()
+        entries = [WorkEntry(
+            user_id=user.id, customer_name=name, customer_phone=phone, service_type='printing',
+            project_name='Billing Test', task_description='Billing test', start_time=datetime.utcnow(),
+            hourly_rate=amount, total_amount=amount, advance_amount=paid, work_status='completed'
+        ) for name, phone, amount, paid in (
+            ('Asha', '9111100001', 100.0, 0.0),
+            ('Asha', '9111100001', 50.0, 50.0),
+            ('Ravi', '9111100002', 80.0, 80.0),
+            ('Walk-in', 'n/a', 30.0, 0.0)
+        )]
+        db.session.add_all(entries)
+        db.session.commit()
+        bill_ids = []
+
+        try:
+            query = unbilled_entries_query(user.id).filter(WorkEntry.project_name == 'Billing Test')
+            skipped = unbillable_entries(query)
+            assert [entry['customer_name'] for entry in skipped] == ['Walk-in']
+            preview = preview_unbilled(billable_query(query, skipped))
+            created = {bill['customer_phone']: bill for bill in bill_unbilled_work(user.id, query)}
+            bill_ids = [bill['bill_id'] for bill in created.values()]
+            assert created['9111100001']['entries'] == 2
+            assert created['9111100001']['total_amount'] == 150.0
+            print("✅ One bill per customer phone")
+
+            assert len(created) == len(preview) == 2
+            assert sum(row['total_amount'] for row in preview) == sum(bill['total_amount'] for bill in created.values())
+            print("✅ Entry without a usable phone is listed, left out of the preview and not billed")
+
+            asha = db.session.get(Bill, created['9111100001']['bill_id'])
+            ravi = db.session.get(Bill, created['9111100002']['bill_id'])
+            assert len(asha.items) == 2 and asha.remaining_amount == 100.0 and asha.status == 'draft'
+            assert ravi.remaining_amount == 0 and ravi.status == 'paid'
+            print("✅ Items and paid amounts carried over")
+
+            assert unbilled_entries_query(user.id).filter(WorkEntry.project_name == 'Billing Test').count() == 1
+            assert bill_unbilled_work(user.id, query) == []
+            print("✅ Billed entries are not billed again")
+        finally:
+            db.session.rollback()
+            for entry in entries:
+                db.session.delete(entry)
+            for bill_id in bill_ids:
+                db.session.delete(db.session.get(Bill, bill_id))
+            db.session.commit()
+
+if __name__ == '__main__':
+    test_bill_unbilled_work()
+    print("\n🎉 Work billing tests completed!")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test the bulk work entry endpoint
+"""
+
+from datetime import datetime, timedelta
+from app import app
+from models import db, User, WorkEntry
+
+def login(client):
+    client.post('/auth/login', data={
+        'email': 'admin@smartbilling.com',
+        'password': 'admin123'
+    })
+
+def test_bulk_update():
+    """Bulk operations report per-id results and keep calculate_duration amounts"""
+    client = app.test_client()
+    login(client)
+
+    with app.app_context():
+        user = User.query.filter_by(email='admin@smartbilling.com').first()
+        entries = [WorkEntry(
+            user_id=user.id, customer_name='Bulk Test', customer_phone='9000000000',
+            service_type='printing', project_name='Bulk Test', task_description='Bulk test',
+            start_time=datetime.utcnow() - timedelta(minutes=90), hourly_rate=60.0,
+            advance_amount=10.0, work_status=status
+        ) for status in ('in_progress', 'delivered')]
+        db.session.add_all(entries)
+        db.session.commit()
+        running, delivered = [entry.id for entry in entries]
+
+    try:
+        response = client.post('/work/entries/bulk', json={
+            'ids': [running, delivered, 999999], 'operation': 'stop'
+        })
+        results = {item['id']: item for item in response.get_json()['results']}
+        assert results[running]['success']
+        assert results[delivered]['message'] == 'Timer is not running'
+        assert results[999999]['message'] == 'Work entry not found'
+        print("✅ Per-id results returned")
+
+        with app.app_context():
+            entry = db.session.get(WorkEntry, running)
+            assert entry.work_status == 'completed'
+            assert (entry.duration_minutes, entry.total_amount, entry.remaining_amount,
+                    entry.payment_status) == (90, 90.0, 80.0, 'partial')
+        print("✅ Stopped timers priced like calculate_duration")
+
+        response = client.post('/work/entries/bulk', json={'ids': [running], 'operation': 'mark_paid'})
+        assert response.get_json()['updated'] == 1
+        response = client.post('/work/entries/bulk', json={'ids': [running], 'operation': 'explode'})
+        assert response.status_code == 400
+        print("✅ Payments applied and bad operations rejected")
+    finally:
+        with app.app_context():
+            for entry_id in (running, delivered):
+                db.session.delete(db.session.get(WorkEntry, entry_id))
+            db.session.commit()
+
+if __name__ == '__main__':
+    test_bulk_update()
+    print("\n🎉 Bulk work entry tests completed!")
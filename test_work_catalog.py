@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Test the work catalog: literal search terms and cross-worker cache invalidation
+"""
+
+from datetime import datetime
+from sqlalchemy import update
+from app import app
+from models import db, User, WorkCatalogItem, WorkEntry
+from utils.cache import bump_file_stamp
+from utils.work_catalog import catalog_names, search_catalog
+
+def test_work_catalog():
+    """Wildcards in a search are literal; a stamp bump reloads cached names"""
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@smartbilling.com').first()
+        entries = [
+            WorkEntry(user_id=admin.id, customer_name='Catalog Test', customer_phone='9800000001',
+                      project_name=name, service_type='Catalog Test Service', task_description='Catalog test',
+                      start_time=datetime.utcnow(), work_status='completed')
+            for name in ('Catalog 100% Cotton', 'Catalog 1000 Cotton', 'Catalog a_b', 'Catalog axb')
+        ]
+        db.session.add_all(entries)
+        db.session.commit()
+
+        try:
+            names = [item.name for item in search_catalog(admin.id, 'project', '100%')]
+            assert names == ['Catalog 100% Cotton']
+            names = [item.name for item in search_catalog(admin.id, 'project', 'CATALOG A_B')]
+            assert names == ['Catalog a_b']
+            print("✅ % and _ match themselves, case-insensitively")
+
+            assert 'Catalog axb' in catalog_names(admin.id, 'project')
+
+            # Another worker renamed the project without this process's hooks
+            db.session.execute(update(WorkCatalogItem).where(
+                WorkCatalogItem.user_id == admin.id, WorkCatalogItem.name == 'Catalog axb'
+            ).values(name='Catalog ayb'))
+            db.session.commit()
+            assert 'Catalog axb' in catalog_names(admin.id, 'project')
+
+            bump_file_stamp(app.config['WORK_CATALOG_STAMP'])
+            names = catalog_names(admin.id, 'project')
+            assert 'Catalog ayb' in names and 'Catalog axb' not in names
+            print("✅ Stamp bump from another worker reloads cached names")
+        finally:
+            for entry in entries:
+                db.session.delete(entry)
+            db.session.commit()
+            WorkCatalogItem.query.filter(WorkCatalogItem.user_id == admin.id,
+                                         WorkCatalogItem.name == 'Catalog ayb').delete()
+            db.session.commit()
+
+if __name__ == '__main__':
+    test_work_catalog()
+    print("\n🎉 Work catalog tests completed!")
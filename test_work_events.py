@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test live work events: broker fan-out between workers and the SSE stream
+"""
+
+import os
+import tempfile
+from app import app
+from utils.work_events import WorkEventBus
+
+def login(client):
+    client.post('/auth/login', data={
+        'email': 'admin@smartbilling.com',
+        'password': 'admin123'
+    })
+
+def test_broker_fan_out():
+    """An event published by one worker reaches subscribers in another"""
+    broker_path = os.path.join(tempfile.mkdtemp(), 'work_events.db')
+    publisher = WorkEventBus(broker_path=broker_path, poll_interval=0.05)
+    listener = WorkEventBus(broker_path=broker_path, poll_interval=0.05)
+
+    subscription = listener.subscribe(7)
+    publisher.publish(7, 'timer_stopped', {'id': 1, 'work_status': 'completed'})
+    publisher.publish(8, 'timer_stopped', {'id': 2, 'work_status': 'completed'})
+
+    item = subscription.get(timeout=2)
+    assert item['type'] == 'timer_stopped'
+    assert item['data']['id'] == 1
+    assert subscription.queue.empty()
+    print("✅ Events cross workers and stay per user")
+
+    events, complete = listener.replay(7, 0)
+    assert complete and [event['data']['id'] for event in events] == [1]
+    print("✅ Reconnecting clients get missed events")
+
+def test_event_stream():
+    """The stream endpoint speaks text/event-stream"""
+    client = app.test_client()
+    login(client)
+
+    response = client.get('/work/events', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert next(iter(response.response)).startswith(b'retry:')
+    response.close()
+    print("✅ Event stream opens")
+
+def test_stream_limit():
+    """A worker refuses streams beyond WORK_EVENTS_MAX_STREAMS"""
+    client = app.test_client()
+    login(client)
+    previous = app.config['WORK_EVENTS_MAX_STREAMS']
+    app.config['WORK_EVENTS_MAX_STREAMS'] = 1
+
+    try:
+        first = client.get('/work/events', buffered=False)
+        next(iter(first.response))  # the stream subscribes before its first message
+
+        refused = client.get('/work/events', buffered=False)
+        assert refused.status_code == 503
+        assert refused.headers['Retry-After'] == str(app.config['WORK_EVENTS_STREAM_SECONDS'])
+        refused.close()
+        first.close()
+        print("✅ Streams beyond the per-worker limit are refused")
+
+        reopened = client.get('/work/events', buffered=False)
+        assert reopened.status_code == 200
+        reopened.close()
+        print("✅ A closed stream frees its slot")
+    finally:
+        app.config['WORK_EVENTS_MAX_STREAMS'] = previous
+
+if __name__ == '__main__':
+    test_broker_fan_out()
+    test_event_stream()
+    test_stream_limit()
+    print("\n🎉 Work event tests completed!")
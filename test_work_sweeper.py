@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test the stale timer sweeper against WorkEntry.calculate_duration
+"""
+
+from datetime import datetime
+from app import app
+from models import db, User, WorkEntry
+from utils.work_sweeper import sweep_stale_timers, repair_payment_drift
+
+def make_entry(user, start_time, **fields):
+    entry = WorkEntry(
+        user_id=user.id, customer_name='Sweep Test', customer_phone='9000000000',
+        service_type='printing', project_name='Sweep Test', task_description='Sweep test',
+        start_time=start_time, hourly_rate=90.0, advance_amount=50.0, work_status='in_progress',
+        **fields
+    )
+    db.session.add(entry)
+    return entry
+
+def test_sweep_matches_calculate_duration():
+    """Stale timers stop at closing time with the same amounts as calculate_duration"""
+    config = dict(app.config, WORK_TIMER_POLICY='closing_time', WORK_CLOSING_TIME='21:00',
+                  WORK_UTC_OFFSET_MINUTES=330)
+    now = datetime(2030, 1, 2, 12, 0)
+
+    with app.app_context():
+        user = User.query.filter_by(email='admin@smartbilling.com').first()
+        stale = make_entry(user, datetime(2030, 1, 1, 4, 29, 59, 750000))
+        fresh = make_entry(user, datetime(2030, 1, 1, 16, 0))  # started after closing
+        db.session.commit()
+
+        try:
+            stopped = sweep_stale_timers(config, now)
+            assert stale.id in stopped and fresh.id not in stopped
+            db.session.expire_all()
+            assert stale.work_status == 'completed'
+            assert stale.end_time == datetime(2030, 1, 1, 15, 30)
+            print("✅ Stale timer stopped at closing time")
+
+            swept = (stale.duration_minutes, stale.total_amount, stale.remaining_amount, stale.payment_status)
+            stale.calculate_duration()
+            assert swept == (stale.duration_minutes, stale.total_amount, stale.remaining_amount, stale.payment_status)
+            db.session.rollback()
+            print("✅ Bulk recompute matches calculate_duration")
+
+            fresh.remaining_amount = 0
+            fresh.payment_status = 'paid'
+            fresh.total_amount = 90.0
+            db.session.commit()
+            assert fresh.id in repair_payment_drift(user.id)
+            db.session.expire_all()
+            assert (fresh.remaining_amount, fresh.payment_status) == (40.0, 'partial')
+            print("✅ Payment drift repaired")
+        finally:
+            db.session.rollback()
+            db.session.delete(stale)
+            db.session.delete(fresh)
+            db.session.commit()
+
+if __name__ == '__main__':
+    test_sweep_matches_calculate_duration()
+    print("\n🎉 Work sweeper tests completed!")
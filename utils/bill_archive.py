@@ -0,0 +1,271 @@
+"""
+Bill archive for Smart Billing System
+Paid bills older than BILL_ARCHIVE_AFTER_DAYS move, with their items, out of
+bill/bill_item into one compressed archived_bill row each, and their totals
+into per-day bill_rollup rows. Counts and revenue add the rollups, so totals
+do not change; bill views and searches fall back to the archive.
+"""
+
+import json
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import exists, func, or_
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from models import db, ArchivedBill, Bill, BillItem, BillRollup, Customer, WorkEntry
+
+BILL_FIELDS = [column.name for column in Bill.__table__.columns]
+ITEM_FIELDS = ('id', 'description', 'quantity', 'rate', 'total')
+DATETIME_FIELDS = [column.name for column in Bill.__table__.columns
+                   if isinstance(column.type, db.DateTime)]
+
+
+# ---------------------------------------------------------------------------
+# Payload
+# ---------------------------------------------------------------------------
+
+def _pack(bill):
+    """zlib-compressed JSON of a bill's columns and items"""
+    data = {field: getattr(bill, field) for field in BILL_FIELDS}
+    for field in DATETIME_FIELDS:
+        if data[field] is not None:
+            data[field] = data[field].isoformat()
+    data['items'] = [{field: getattr(item, field) for field in ITEM_FIELDS}
+                     for item in sorted(bill.items, key=lambda item: item.id)]
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+
+def _unpack(payload):
+    data = json.loads(zlib.decompress(payload).decode('utf-8'))
+    for field in DATETIME_FIELDS:
+        if data.get(field):
+            data[field] = datetime.fromisoformat(data[field])
+    return data
+
+
+def restore_bill(archived):
+    """A read-only Bill rebuilt from an archive row, for templates and PDFs
+
+    The bill and its items are never added to the session; the customer is
+    attached without touching Customer.bills.
+    """
+    data = _unpack(archived.payload)
+    items = [BillItem(bill_id=archived.id, **item) for item in data.pop('items')]
+    bill = Bill(**data)
+    set_committed_value(bill, 'items', items)
+    set_committed_value(bill, 'customer', archived.customer)
+    return bill
+
+
+# ---------------------------------------------------------------------------
+# Archiving
+# ---------------------------------------------------------------------------
+
+def last_bill_id():
+    """Highest id of any bill, live or archived; new INV- numbers continue after it"""
+    return max(db.session.query(func.max(Bill.id)).scalar() or 0,
+               db.session.query(func.max(ArchivedBill.id)).scalar() or 0)
+
+
+def _archivable(cutoff):
+    return (
+        Bill.status == 'paid',
+        Bill.created_at < cutoff,
+        or_(Bill.paid_date.is_(None), Bill.paid_date < cutoff),
+        # work_entry.bill_id references the bill, and marks the entry as billed
+        ~exists().where(WorkEntry.bill_id == Bill.id)
+    )
+
+
+def _add_to_rollups(bills):
+    """Add a batch of bills to their (owner, customer, day) rollup rows"""
+    days = [bill.created_at.date() for bill in bills]
+    existing = BillRollup.query.filter(
+        BillRollup.created_by.in_({bill.created_by for bill in bills}),
+        BillRollup.day >= min(days),
+        BillRollup.day <= max(days)
+    )
+    rollups = {(rollup.created_by, rollup.customer_id, rollup.day): rollup for rollup in existing}
+
+    for bill in bills:
+        key = (bill.created_by, bill.customer_id, bill.created_at.date())
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollup = rollups[key] = BillRollup(
+                created_by=bill.created_by, customer_id=bill.customer_id, day=key[2],
+                bill_count=0, total_amount=0.0, remaining_amount=0.0
+            )
+            db.session.add(rollup)
+        rollup.bill_count += 1
+        rollup.total_amount += bill.total_amount or 0
+        rollup.remaining_amount += bill.remaining_amount or 0
+        if rollup.last_created_at is None or bill.created_at > rollup.last_created_at:
+            rollup.last_created_at = bill.created_at
+
+
+def archive_paid_bills(older_than_days=365, batch_size=500, now=None):
+    """Move paid bills created and paid more than `older_than_days` ago into the archive
+
+    Each batch is archived, rolled up and deleted in one transaction.
+    Returns the number of bills archived.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    archived = 0
+    while True:
+        bills = Bill.query.options(selectinload(Bill.items)).filter(
+            *_archivable(cutoff)
+        ).order_by(Bill.id).limit(batch_size).with_for_update(skip_locked=True).all()
+        if not bills:
+            break
+        try:
+            for bill in bills:
+                db.session.add(ArchivedBill(
+                    id=bill.id, bill_number=bill.bill_number, customer_id=bill.customer_id,
+                    created_by=bill.created_by, total_amount=bill.total_amount,
+                    created_at=bill.created_at, paid_date=bill.paid_date, payload=_pack(bill)
+                ))
+            _add_to_rollups(bills)
+            ids = [bill.id for bill in bills]
+            BillItem.query.filter(BillItem.bill_id.in_(ids)).delete(synchronize_session=False)
+            Bill.query.filter(Bill.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        archived += len(bills)
+        if len(bills) < batch_size:
+            break
+    return archived
+
+
+def restore_archived_bills(bill_ids=None):
+    """Move archived bills (default: all) back into bill/bill_item; returns the number restored"""
+    query = ArchivedBill.query.order_by(ArchivedBill.id)
+    if bill_ids is not None:
+        query = query.filter(ArchivedBill.id.in_(bill_ids))
+    restored = 0
+    try:
+        for archived in query.all():
+            data = _unpack(archived.payload)
+            items = data.pop('items')
+            db.session.execute(Bill.__table__.insert(), [data])
+            if items:
+                db.session.execute(BillItem.__table__.insert(),
+                                   [dict(item, bill_id=archived.id) for item in items])
+
+            rollup = BillRollup.query.filter_by(
+                created_by=archived.created_by, customer_id=archived.customer_id,
+                day=archived.created_at.date()
+            ).first()
+            if rollup is not None:
+                rollup.bill_count -= 1
+                rollup.total_amount -= data['total_amount'] or 0
+                rollup.remaining_amount -= data['remaining_amount'] or 0
+                if rollup.bill_count <= 0:
+                    db.session.delete(rollup)
+            db.session.delete(archived)
+            restored += 1
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return restored
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def find_archived_bill(bill_id, user_id):
+    """The archived bill with this id as a read-only Bill, or None"""
+    archived = db.session.get(ArchivedBill, bill_id)
+    if archived is None or archived.created_by != user_id:
+        return None
+    return restore_bill(archived)
+
+
+def search_archived_bills(user_id, search='', customer_id=None, limit=20):
+    """Archive rows matching a bill number or customer name, newest first"""
+    query = ArchivedBill.query.filter(ArchivedBill.created_by == user_id)
+    if customer_id is not None:
+        query = query.filter(ArchivedBill.customer_id == customer_id)
+    if search:
+        query = query.join(Customer, ArchivedBill.customer_id == Customer.id).filter(
+            Customer.name.contains(search) | ArchivedBill.bill_number.contains(search)
+        )
+    return query.order_by(ArchivedBill.created_at.desc()).limit(limit).all()
+
+
+def _archived_for(user_id, query, max_id=None):
+    query = query.filter(ArchivedBill.created_by == user_id)
+    if max_id is not None:
+        query = query.filter(ArchivedBill.id <= max_id)
+    return query
+
+
+def archived_bill_count(user_id, max_id=None):
+    return _archived_for(user_id, db.session.query(func.count(ArchivedBill.id)), max_id).scalar() or 0
+
+
+def iter_archived_bills(user_id, chunk_size=500, max_id=None):
+    """Yield (bill dict with 'items', customer name, email, phone) for a user's archived bills, oldest first"""
+    query = _archived_for(user_id, db.session.query(
+        ArchivedBill.payload, Customer.name, Customer.email, Customer.phone
+    ).join(Customer, ArchivedBill.customer_id == Customer.id), max_id)
+    for payload, name, email, phone in query.order_by(ArchivedBill.id).yield_per(chunk_size):
+        yield _unpack(payload), name, email, phone
+
+
+def _day(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def rollup_query(*columns, created_by=None, start=None, end=None):
+    """Query over bill_rollup for an owner and a [start, end) created range
+
+    Archived bills are counted by the day they were created, so the bounds
+    apply to whole days.
+    """
+    query = db.session.query(*columns)
+    if created_by is not None:
+        query = query.filter(BillRollup.created_by == created_by)
+    if start is not None:
+        query = query.filter(BillRollup.day >= _day(start))
+    if end is not None:
+        query = query.filter(BillRollup.day < _day(end))
+    return query
+
+
+def archived_totals(created_by=None, start=None, end=None):
+    """(count, total_amount, remaining_amount) of archived bills"""
+    count, total, remaining = rollup_query(
+        func.coalesce(func.sum(BillRollup.bill_count), 0),
+        func.coalesce(func.sum(BillRollup.total_amount), 0),
+        func.coalesce(func.sum(BillRollup.remaining_amount), 0),
+        created_by=created_by, start=start, end=end
+    ).one()
+    return int(count), float(total), float(remaining)
+
+
+def merge_rows(rows, archived_rows, key):
+    """Live grouped rows plus the same grouping over the rollups, sorted by `key`
+
+    Both queries must label their columns alike; all but `key` are summed.
+    """
+    merged = {}
+    fields = None
+    for row in list(rows) + list(archived_rows):
+        values = row._asdict()
+        fields = fields or tuple(values)
+        current = merged.get(values[key])
+        if current is None:
+            merged[values[key]] = values
+            continue
+        for field in fields:
+            if field != key:
+                current[field] = (current[field] or 0) + (values[field] or 0)
+    if fields is None:
+        return []
+    Totals = namedtuple('Totals', fields)
+    return [Totals(**merged[value]) for value in sorted(merged, key=lambda value: (value is None, value))]
@@ -0,0 +1,94 @@
+"""
+Small in-process caches for Smart Billing System
+Each gunicorn worker keeps its own copy; entries expire after a TTL so
+workers converge even when an invalidation only reached one of them. Caches
+that must not serve stale data also compare a stamp file that every worker on
+the host can see and that is replaced whenever the cached rows change.
+"""
+
+import os
+import threading
+import time
+
+
+def file_stamp(path):
+    """Version of a shared stamp file (None when unused, 0 before the first bump)"""
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 0
+    # The file is replaced on every bump, so a new inode also marks a change
+    # made within the filesystem's timestamp resolution
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def bump_file_stamp(path):
+    """Replace the stamp file so every worker sees a new version"""
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w') as handle:
+            handle.write(str(os.getpid()))
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Cache stamp update failed: {str(e)}")
+
+
+class TTLCache:
+    """Thread-safe dictionary whose entries expire after `ttl` seconds"""
+
+    def __init__(self, ttl=60, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.maxsize and key not in self._data:
+                self._evict()
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def get_or_set(self, key, factory):
+        """Return the cached value, computing and storing it on a miss"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _evict(self):
+        """Drop expired entries, or the oldest one when nothing has expired"""
+        now = time.monotonic()
+        expired = [key for key, (expires, _) in self._data.items() if expires < now]
+        for key in expired:
+            del self._data[key]
+        if not expired and self._data:
+            oldest = min(self._data, key=lambda key: self._data[key][0])
+            del self._data[oldest]
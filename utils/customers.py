@@ -0,0 +1,103 @@
+"""
+Customer lookup for Smart Billing System
+Work entries and bills share Customer rows, matched on a normalized phone
+number so "98765 43210", "+91 9876543210" and "09876543210" are one customer
+"""
+
+from datetime import datetime
+from sqlalchemy import func
+from models import db, normalize_phone, Bill, BillRollup, Customer, WorkEntry
+
+BATCH_SIZE = 500
+
+
+def _chunks(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def resolve_customer_ids(names_by_phone):
+    """Map normalized phone -> customer id, creating missing customers in one INSERT
+
+    `names_by_phone` maps normalized phones to the name to use for new
+    customers. When several customers share a phone, the oldest one wins.
+    """
+    phones = [phone for phone in names_by_phone if phone]
+    found = {}
+
+    def lookup(chunk):
+        for customer_id, phone in db.session.query(Customer.id, Customer.phone_normalized).filter(
+            Customer.phone_normalized.in_(chunk)
+        ).order_by(Customer.id.desc()):
+            found[phone] = customer_id
+
+    for chunk in _chunks(phones):
+        lookup(chunk)
+
+    missing = [phone for phone in phones if phone not in found]
+    if missing:
+        now = datetime.utcnow()
+        db.session.execute(Customer.__table__.insert(), [{
+            'name': names_by_phone[phone], 'email': None, 'phone': phone,
+            'phone_normalized': phone, 'whatsapp': phone, 'address': '', 'created_at': now
+        } for phone in missing])
+        for chunk in _chunks(missing):
+            lookup(chunk)
+    return found
+
+
+def find_or_create_customer(name, phone):
+    """Customer id for a single work entry (None without a usable phone)"""
+    normalized = normalize_phone(phone)
+    if not normalized:
+        return None
+    return resolve_customer_ids({normalized: name}).get(normalized)
+
+
+# ---------------------------------------------------------------------------
+# Customer-scoped activity
+# ---------------------------------------------------------------------------
+
+def customer_activity(user_id, customer_ids):
+    """Per customer: bill count/total/remaining and work count/total for one user
+
+    Both aggregates are indexed joins on customer_id.
+    """
+    activity = {customer_id: {
+        'bills': 0, 'billed_amount': 0.0, 'bill_remaining': 0.0,
+        'work_entries': 0, 'work_amount': 0.0, 'last_activity': None
+    } for customer_id in customer_ids}
+    if not activity:
+        return activity
+
+    bill_rows = db.session.query(
+        Bill.customer_id, func.count(Bill.id), func.coalesce(func.sum(Bill.total_amount), 0),
+        func.coalesce(func.sum(Bill.remaining_amount), 0), func.max(Bill.created_at)
+    ).filter(Bill.created_by == user_id, Bill.customer_id.in_(customer_ids)).group_by(Bill.customer_id)
+    for customer_id, count, total, remaining, last in bill_rows:
+        data = activity[customer_id]
+        data.update(bills=count, billed_amount=float(total), bill_remaining=float(remaining), last_activity=last)
+
+    archived_rows = db.session.query(
+        BillRollup.customer_id, func.sum(BillRollup.bill_count), func.coalesce(func.sum(BillRollup.total_amount), 0),
+        func.coalesce(func.sum(BillRollup.remaining_amount), 0), func.max(BillRollup.last_created_at)
+    ).filter(BillRollup.created_by == user_id, BillRollup.customer_id.in_(customer_ids)).group_by(BillRollup.customer_id)
+    for customer_id, count, total, remaining, last in archived_rows:
+        data = activity[customer_id]
+        data['bills'] += int(count or 0)
+        data['billed_amount'] += float(total)
+        data['bill_remaining'] += float(remaining)
+        if last and (data['last_activity'] is None or last > data['last_activity']):
+            data['last_activity'] = last
+
+    work_rows = db.session.query(
+        WorkEntry.customer_id, func.count(WorkEntry.id),
+        func.coalesce(func.sum(WorkEntry.total_amount), 0), func.max(WorkEntry.start_time)
+    ).filter(WorkEntry.user_id == user_id, WorkEntry.customer_id.in_(customer_ids)).group_by(WorkEntry.customer_id)
+    for customer_id, count, total, last in work_rows:
+        data = activity[customer_id]
+        data.update(work_entries=count, work_amount=float(total))
+        if last and (data['last_activity'] is None or last > data['last_activity']):
+            data['last_activity'] = last
+
+    return activity
@@ -0,0 +1,107 @@
+"""
+Database engine profiles for Smart Billing System
+DB_PROFILE picks a named set of engine settings: connection pooling and a
+statement timeout for PostgreSQL, WAL journaling and related pragmas for
+SQLite (so gunicorn workers can write at the same time without "database is
+locked" errors). Individual settings can be overridden from the environment.
+"""
+
+import os
+from sqlalchemy import event
+
+PROFILES = {
+    # SQLAlchemy defaults: rollback journal on SQLite, a 5 + 10 connection pool on PostgreSQL
+    'default': {},
+
+    'sqlite': {
+        'journal_mode': 'WAL',        # readers never block the writer and vice versa
+        'synchronous': 'NORMAL',      # fsync at checkpoints only; safe with WAL
+        'busy_timeout': 10000,        # ms a writer waits for the lock before failing
+        'cache_size': -65536,         # KiB (negative) of page cache per connection
+        'mmap_size': 268435456        # bytes of the file read through mmap
+    },
+
+    'postgres': {
+        'pool_size': 8,               # one per gunicorn thread (GUNICORN_THREADS)
+        'max_overflow': 4,
+        'pool_timeout': 10,
+        'pool_pre_ping': True,        # drop connections closed by the server or a proxy
+        'pool_recycle': 1800,
+        'statement_timeout': 30000    # ms; runaway report queries are cancelled
+    },
+
+    # Migrations, exports and other scripts: few connections, no statement timeout
+    'postgres_batch': {
+        'pool_size': 2,
+        'max_overflow': 0,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+        'statement_timeout': 0
+    }
+}
+
+SQLITE_PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size')
+POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_pre_ping', 'pool_recycle')
+
+# Environment overrides: variable -> (setting, type)
+OVERRIDES = {
+    'DB_POOL_SIZE': ('pool_size', int),
+    'DB_MAX_OVERFLOW': ('max_overflow', int),
+    'DB_POOL_TIMEOUT': ('pool_timeout', int),
+    'DB_POOL_RECYCLE': ('pool_recycle', int),
+    'DB_STATEMENT_TIMEOUT_MS': ('statement_timeout', int),
+    'SQLITE_SYNCHRONOUS': ('synchronous', str),
+    'SQLITE_BUSY_TIMEOUT_MS': ('busy_timeout', int),
+    'SQLITE_CACHE_SIZE_KB': ('cache_size', lambda value: -abs(int(value))),
+    'SQLITE_MMAP_SIZE_MB': ('mmap_size', lambda value: int(value) * 1024 * 1024)
+}
+
+
+def profile_name(database_url, name=None):
+    """Profile for a database URL: DB_PROFILE, or 'sqlite'/'postgres' by URL when unset or 'auto'"""
+    name = (name or os.environ.get('DB_PROFILE') or 'auto').lower()
+    if name == 'auto':
+        if database_url.startswith('sqlite'):
+            return 'sqlite'
+        if database_url.startswith('postgresql'):
+            return 'postgres'
+        return 'default'
+    if name not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{name}' (choose from {', '.join(sorted(PROFILES))})")
+    return name
+
+
+def profile_settings(name, environ=None):
+    """Settings of a profile with environment overrides applied"""
+    environ = os.environ if environ is None else environ
+    settings = dict(PROFILES[name])
+    if name == 'default':
+        return settings
+    for variable, (setting, convert) in OVERRIDES.items():
+        if environ.get(variable):
+            settings[setting] = convert(environ[variable])
+    return settings
+
+
+def engine_options(database_url, settings):
+    """SQLALCHEMY_ENGINE_OPTIONS for the settings"""
+    options = {}
+    if database_url.startswith('postgresql'):
+        options.update({key: settings[key] for key in POOL_OPTIONS if key in settings})
+        if 'statement_timeout' in settings:
+            options['connect_args'] = {'options': f"-c statement_timeout={settings['statement_timeout']}"}
+    return options
+
+
+def apply_sqlite_pragmas(engine, settings):
+    """Set the profile's pragmas on every new SQLite connection"""
+    pragmas = [(pragma, settings[pragma]) for pragma in SQLITE_PRAGMAS if pragma in settings]
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas:
+            cursor.execute(f'PRAGMA {pragma}={value}')
+        cursor.close()
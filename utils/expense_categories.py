@@ -0,0 +1,155 @@
+"""
+Expense categories for Smart Billing System
+Categories live in ExpenseCategory and are cached per process, checked against
+EXPENSE_CATEGORY_STAMP, which every commit that changes a category replaces;
+expenses keep their category name for display but filter and group on the
+indexed category_id
+"""
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from models import db, Expense, ExpenseCategory
+from utils.cache import TTLCache, bump_file_stamp, file_stamp
+
+DEFAULT_CATEGORIES = [
+    ('Office Supplies', 'Stationery, equipment, and office materials'),
+    ('Travel', 'Business travel and transportation expenses'),
+    ('Meals', 'Business meals and entertainment'),
+    ('Utilities', 'Electricity, internet, phone bills'),
+    ('Software', 'Software licenses and subscriptions'),
+    ('Marketing', 'Advertising and promotional expenses'),
+    ('Equipment', 'Hardware and equipment purchases'),
+    ('Rent', 'Office rent and facility costs'),
+    ('Insurance', 'Business insurance premiums'),
+    ('Other', 'Miscellaneous business expenses')
+]
+
+_category_cache = TTLCache(ttl=300, maxsize=1)
+
+
+def ensure_default_categories():
+    """Add any missing default categories (caller commits)"""
+    existing = {row[0] for row in db.session.query(ExpenseCategory.name)}
+    for name, description in DEFAULT_CATEGORIES:
+        if name not in existing:
+            db.session.add(ExpenseCategory(name=name, description=description))
+
+
+def _load_categories():
+    return [tuple(row) for row in db.session.query(
+        ExpenseCategory.id, ExpenseCategory.name
+    ).order_by(ExpenseCategory.name)]
+
+
+def _stamp_path():
+    return current_app.config.get('EXPENSE_CATEGORY_STAMP') if has_app_context() else None
+
+
+def _cached_categories(stamp):
+    entry = _category_cache.get('categories')
+    return entry[1] if entry is not None and entry[0] == stamp else None
+
+
+def expense_categories():
+    """All categories as (id, name) pairs, alphabetically (cached per process)"""
+    stamp = file_stamp(_stamp_path())
+    categories = _cached_categories(stamp)
+    if categories is None:
+        categories = _load_categories()
+        _category_cache.set('categories', (stamp, categories))
+    return categories
+
+
+def category_names():
+    return [name for _, name in expense_categories()]
+
+
+def category_names_by_id():
+    return dict(expense_categories())
+
+
+def category_id(name):
+    """Id of the category called `name`, or None if there is no such category"""
+    for existing_id, existing_name in expense_categories():
+        if existing_name == name:
+            return existing_id
+
+    # Added by another worker since this process cached the list
+    existing_id = db.session.query(ExpenseCategory.id).filter_by(name=name).scalar()
+    if existing_id is not None:
+        invalidate_categories()
+    return existing_id
+
+
+def resolve_category_ids(names, create=True):
+    """Map category name -> id, adding missing categories unless `create` is False
+
+    Missing names map to None when not created. The caller commits.
+    """
+    known = {name: existing_id for existing_id, name in expense_categories()}
+    missing = [name for name in set(names) if name and name not in known]
+    if missing:
+        known.update(db.session.query(ExpenseCategory.name, ExpenseCategory.id).filter(
+            ExpenseCategory.name.in_(missing)
+        ))
+        missing = [name for name in missing if name not in known]
+    if missing and create:
+        created = [ExpenseCategory(name=name) for name in missing]
+        db.session.add_all(created)
+        db.session.flush()
+        known.update((category.name, category.id) for category in created)
+    return {name: known.get(name) for name in names}
+
+
+def invalidate_categories():
+    _category_cache.clear()
+
+
+# Keep Expense.category_id in step with the category name, creating
+# categories that do not exist yet, and drop the cache when categories change.
+
+@event.listens_for(Session, 'before_flush')
+def _assign_expense_categories(session, flush_context, instances):
+    cached = None
+    created = {}
+    for instance in list(session.new) + list(session.dirty):
+        if not isinstance(instance, Expense) or not instance.category:
+            continue
+        if instance.category_id is not None and not get_history(instance, 'category').added:
+            continue
+        if cached is None:
+            cached = {name: cached_id for cached_id, name in _cached_categories(file_stamp(_stamp_path())) or ()}
+
+        existing_id = cached.get(instance.category)
+        if existing_id is None:
+            with session.no_autoflush:
+                existing_id = session.query(ExpenseCategory.id).filter_by(name=instance.category).scalar()
+        if existing_id is not None:
+            instance.category_id = existing_id
+        else:
+            if instance.category not in created:
+                created[instance.category] = ExpenseCategory(name=instance.category)
+            instance.category_ref = created[instance.category]
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_category_changes(session, flush_context):
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, ExpenseCategory):
+            session.info['expense_categories_changed'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_expense_categories(session):
+    if session.info.pop('expense_categories_changed', False):
+        invalidate_categories()
+        # Other workers reload the list on the next read
+        bump_file_stamp(_stamp_path())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_expense_categories(session):
+    session.info.pop('expense_categories_changed', None)
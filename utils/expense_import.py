@@ -0,0 +1,287 @@
+"""
+Expense import for Smart Billing System
+Streams CSV files and bank statement exports in chunks: columns are mapped
+from the header, dates and amounts are parsed a chunk at a time, and new rows
+are inserted with executemany, one transaction per chunk
+"""
+
+import csv
+import hashlib
+import itertools
+import math
+import re
+from datetime import datetime
+from sqlalchemy import event, func
+from models import db, Expense
+from utils.expense_categories import resolve_category_ids
+from utils.summary import invalidate_user_summary
+
+CHUNK_SIZE = 2000
+LOOKUP_SIZE = 500
+MAX_ERRORS = 20
+# Bank exports put account details above the column header
+HEADER_SCAN_ROWS = 30
+
+COLUMN_ALIASES = {
+    'date': ('date', 'txn date', 'transaction date', 'value date', 'posting date', 'tran date'),
+    'title': ('title', 'narration', 'particulars', 'description', 'transaction details', 'details', 'remarks'),
+    'amount': ('amount', 'amount (inr)', 'transaction amount'),
+    'debit': ('debit', 'withdrawal', 'withdrawal amt', 'withdrawal amount', 'debit amount', 'dr'),
+    'category': ('category',),
+    'description': ('notes', 'note', 'memo')
+}
+
+# Day-first formats come before month-first ones, as on Indian bank statements
+DATE_FORMATS = [
+    '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%d-%m-%y',
+    '%d-%b-%Y', '%d %b %Y', '%d-%b-%y', '%d %b %y', '%d %B %Y',
+    '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%m/%d/%Y'
+]
+
+_AMOUNT_NOISE = re.compile(r'(?i)rs\.?|inr|₹|\$|,|\s')
+
+
+def expense_dedup_key(date, amount, title):
+    """Hash of the expense day, amount in paise and whitespace/case-normalized title"""
+    text = f"{date:%Y-%m-%d}|{round((amount or 0) * 100)}|{' '.join((title or '').lower().split())}"
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+# Expenses saved through the ORM (the expense form) get their key here;
+# the importer and migration 0005 write it themselves.
+
+@event.listens_for(Expense, 'before_insert')
+@event.listens_for(Expense, 'before_update')
+def _set_dedup_key(mapper, connection, target):
+    if target.date is None:
+        target.date = datetime.utcnow()
+    target.dedup_key = expense_dedup_key(target.date, target.amount, target.title)
+
+
+# ---------------------------------------------------------------------------
+# Column mapping and batch parsing
+# ---------------------------------------------------------------------------
+
+def _header_name(value):
+    return ' '.join((value or '').lower().replace('.', ' ').replace('_', ' ').split())
+
+
+def map_columns(header, overrides=None):
+    """Column index per field for a header row
+
+    `overrides` maps a field to the header text to use instead of the aliases.
+    """
+    names = [_header_name(name) for name in header]
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        if overrides and overrides.get(field):
+            aliases = (_header_name(overrides[field]),)
+        for alias in aliases:
+            if alias in names:
+                mapping[field] = names.index(alias)
+                break
+    return mapping
+
+
+def _complete(mapping):
+    return 'date' in mapping and 'title' in mapping and ('amount' in mapping or 'debit' in mapping)
+
+
+def _parse_amount(value):
+    value = _AMOUNT_NOISE.sub('', value or '')
+    marker = value[-2:].lower()
+    if marker in ('dr', 'cr'):
+        value = value[:-2]
+        if marker == 'cr':
+            return None  # credits are not expenses
+    negative = value.startswith('(') and value.endswith(')')
+    value = value.strip('()')
+    if not value or value == '-':
+        return None
+    amount = float(value)
+    if not math.isfinite(amount):
+        raise ValueError(value)
+    return -amount if negative else amount
+
+
+def parse_amounts(values):
+    """Parse a batch of amount strings: floats, None for blanks, ValueError instances for junk
+
+    Each distinct string is parsed once per batch.
+    """
+    parsed = {}
+    for value in set(values):
+        try:
+            parsed[value] = _parse_amount(value)
+        except ValueError as e:
+            parsed[value] = e
+    return [parsed[value] for value in values]
+
+
+def _parse_date(value, date_format):
+    try:
+        return datetime.strptime(value, date_format)
+    except ValueError:
+        return None
+
+
+def detect_date_format(values, formats=DATE_FORMATS):
+    """The date format for a whole column, judged from a sample of its values
+
+    The first of `formats` that parses every non-blank value wins, so
+    ambiguous dates such as 05/03/2024 are read day-first unless a value like
+    12/25/2024 rules that out. Otherwise the format parsing the most values
+    is used (the rest become errors); None when nothing parses.
+    """
+    values = [value for value in dict.fromkeys((value or '').strip() for value in values) if value]
+    best, best_count = None, 0
+    for date_format in formats:
+        count = sum(1 for value in values if _parse_date(value, date_format))
+        if values and count == len(values):
+            return date_format
+        if count > best_count:
+            best, best_count = date_format, count
+    return best
+
+
+def parse_dates(values, date_format):
+    """Parse a batch of date strings with one format: datetimes, None for blanks or mismatches
+
+    Each distinct string is parsed once per batch.
+    """
+    parsed = {}
+    for value in dict.fromkeys(values):
+        value_text = (value or '').strip()
+        parsed[value] = _parse_date(value_text, date_format) if value_text and date_format else None
+    return [parsed[value] for value in values]
+
+
+def _open_reader(stream):
+    """CSV reader over a text stream, with the delimiter sniffed from the first lines"""
+    sample = list(itertools.islice(stream, HEADER_SCAN_ROWS))
+    try:
+        delimiter = csv.Sniffer().sniff(''.join(sample), delimiters=',;\t|').delimiter
+    except csv.Error:
+        delimiter = ','
+    return csv.reader(itertools.chain(sample, stream), delimiter=delimiter)
+
+
+# ---------------------------------------------------------------------------
+# Import
+# ---------------------------------------------------------------------------
+
+def _existing_counts(user_id, keys, existing):
+    """Add the number of stored expenses per key for keys not looked up yet"""
+    missing = [key for key in set(keys) if key not in existing]
+    for start in range(0, len(missing), LOOKUP_SIZE):
+        chunk = missing[start:start + LOOKUP_SIZE]
+        existing.update(dict.fromkeys(chunk, 0))
+        existing.update(db.session.query(Expense.dedup_key, func.count(Expense.id)).filter(
+            Expense.created_by == user_id, Expense.dedup_key.in_(chunk)
+        ).group_by(Expense.dedup_key))
+
+
+def import_expenses(user_id, stream, overrides=None, default_category='Other',
+                    date_format=None, dry_run=False, chunk_size=CHUNK_SIZE):
+    """Import expenses for `user_id` from a CSV text stream
+
+    Rows are read `chunk_size` at a time; each chunk is parsed in one pass
+    and inserted with a single executemany and commit, so memory stays
+    bounded by the chunk (plus one entry per distinct dedup key). A row is a
+    duplicate when its (date, amount, title) key already exists as often as
+    it has been seen, so re-importing a statement adds nothing while repeated
+    identical purchases in one file are kept. Bank statement credits are
+    skipped. With `dry_run` nothing is written.
+
+    Returns a report dict; raises ValueError when no usable header is found.
+    """
+    reader = _open_reader(stream)
+
+    header = None
+    for row in itertools.islice(reader, HEADER_SCAN_ROWS):
+        mapping = map_columns(row, overrides)
+        if _complete(mapping):
+            header = row
+            break
+    if header is None:
+        raise ValueError('Could not find date, description and amount (or debit) columns')
+
+    report = {
+        'dry_run': dry_run, 'rows': 0, 'imported': 0, 'duplicates': 0, 'skipped': 0,
+        'error_count': 0, 'errors': [], 'new_categories': [],
+        'columns': {field: header[index] for field, index in mapping.items()},
+        'date_format': date_format
+    }
+    amount_field = 'amount' if 'amount' in mapping else 'debit'
+    existing = {}
+    new_categories = set()
+
+    def cell(row, field):
+        index = mapping.get(field)
+        return row[index].strip() if index is not None and index < len(row) else ''
+
+    def error(line, message):
+        report['error_count'] += 1
+        if len(report['errors']) < MAX_ERRORS:
+            report['errors'].append({'line': line, 'message': message})
+
+    while True:
+        chunk = [(reader.line_num, row) for row in itertools.islice(reader, chunk_size)]
+        if not chunk:
+            break
+        rows = [(line, row) for line, row in chunk if any(value.strip() for value in row)]
+        report['rows'] += len(rows)
+        report['skipped'] += len(chunk) - len(rows)
+
+        date_cells = [cell(row, 'date') for _, row in rows]
+        if date_format is None:
+            # One format for the whole file, from the first chunk with dates
+            date_format = detect_date_format(date_cells)
+            report['date_format'] = date_format
+        dates = parse_dates(date_cells, date_format)
+        amounts = parse_amounts([cell(row, amount_field) for _, row in rows])
+
+        candidates = []
+        for (line, row), date, amount in zip(rows, dates, amounts):
+            title = cell(row, 'title')[:100]
+            if isinstance(amount, ValueError):
+                error(line, f'Invalid amount "{cell(row, amount_field)}"')
+            elif date is None:
+                error(line, f'Invalid date "{cell(row, "date")}"')
+            elif not title:
+                error(line, 'Missing description')
+            elif not amount:
+                report['skipped'] += 1  # credits or zero amounts are not expenses
+            else:
+                category = cell(row, 'category')[:50] or default_category
+                candidates.append((date, abs(amount), title, category, cell(row, 'description')))
+
+        keys = [expense_dedup_key(date, amount, title) for date, amount, title, _, _ in candidates]
+        _existing_counts(user_id, keys, existing)
+
+        category_ids = resolve_category_ids({candidate[3] for candidate in candidates}, create=not dry_run)
+        new_categories.update(name for name, category_id in category_ids.items() if category_id is None)
+
+        records = []
+        for key, (date, amount, title, category, description) in zip(keys, candidates):
+            if existing[key] > 0:
+                existing[key] -= 1
+                report['duplicates'] += 1
+                continue
+            records.append({
+                'title': title, 'description': description or None, 'amount': amount,
+                'category': category, 'category_id': category_ids[category], 'date': date,
+                'created_by': user_id, 'receipt_path': None, 'dedup_key': key
+            })
+        report['imported'] += len(records)
+
+        if dry_run:
+            continue
+        if records:
+            db.session.execute(Expense.__table__.insert(), records)
+        db.session.commit()
+
+    report['new_categories'] = sorted(new_categories)
+    if report['imported'] and not dry_run:
+        invalidate_user_summary(user_id)
+    return report
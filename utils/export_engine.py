@@ -0,0 +1,409 @@
+"""
+Export engine for Smart Billing System
+Renders exports as CSV, gzip-compressed CSV, JSON Lines or XLSX and runs
+large exports as background jobs. A job exports the rows that existed when it
+was created (an id cutoff); rows edited or deleted before it runs appear as
+they are when it runs.
+"""
+
+import importlib.util
+import json
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from models import db, ExportJob, Bill, Expense, WorkEntry
+from utils.bill_archive import archived_bill_count
+from utils.export_stream import (
+    CHUNK_SIZE, BILL_COLUMNS, BILL_SUMMARY_COLUMNS, EXPENSE_COLUMNS, WORK_COLUMNS,
+    WORK_SUMMARY_COLUMNS, iter_bill_records, iter_bill_summary_records,
+    iter_expense_records, iter_work_records, iter_work_summary_records,
+    iter_rows, iter_all_rows, stream_csv, take_snapshot
+)
+
+# openpyxl is optional for deployment, and imported only when a workbook is written
+OPENPYXL_AVAILABLE = importlib.util.find_spec('openpyxl') is not None
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'csv.gz': ('application/gzip', 'csv.gz'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx')
+}
+
+# Formats that can be produced incrementally straight into a response
+STREAMABLE_FORMATS = ('csv', 'csv.gz', 'ndjson')
+
+# data_type -> [(section name, columns, record iterator)]
+EXPORT_SECTIONS = {
+    'bills': [('bills', BILL_COLUMNS, iter_bill_records)],
+    'expenses': [('expenses', EXPENSE_COLUMNS, iter_expense_records)],
+    'work': [('work', WORK_COLUMNS, iter_work_records)],
+    'all': [
+        ('bills', BILL_SUMMARY_COLUMNS, iter_bill_summary_records),
+        ('expenses', EXPENSE_COLUMNS, iter_expense_records),
+        ('work', WORK_SUMMARY_COLUMNS, iter_work_summary_records)
+    ]
+}
+
+FILENAME_PREFIXES = {
+    'bills': 'bills_export',
+    'expenses': 'expenses_export',
+    'work': 'work_entries_export',
+    'all': 'complete_data_export'
+}
+
+FORMAT_LABELS = {
+    'csv': 'CSV',
+    'csv.gz': 'CSV (gzip compressed)',
+    'ndjson': 'JSON Lines',
+    'xlsx': 'Excel (XLSX)'
+}
+
+_executor = None
+
+
+def available_formats():
+    """Formats usable in this environment"""
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'xlsx' or OPENPYXL_AVAILABLE]
+
+
+def format_choices():
+    """(format, label) pairs for export format dropdowns"""
+    return [(fmt, FORMAT_LABELS[fmt]) for fmt in available_formats()]
+
+
+def export_filename(data_type, export_format, when):
+    """Download name such as bills_export_20240101_120000.csv.gz"""
+    extension = EXPORT_FORMATS[export_format][1]
+    return f'{FILENAME_PREFIXES[data_type]}_{when.strftime("%Y%m%d_%H%M%S")}.{extension}'
+
+
+def column_key(header):
+    """JSON key for a column header: 'Duration (Hours)' -> 'duration_hours'"""
+    return re.sub(r'[^a-z0-9]+', '_', header.lower()).strip('_')
+
+
+def json_value(kind, value):
+    """Typed JSON value for a raw column value"""
+    if value is None:
+        return 0 if kind in ('money', 'number') else None
+    if kind == 'money':
+        return round(float(value), 2)
+    if kind == 'hours':
+        return round(value / 60, 2)
+    if kind == 'datetime':
+        return value.isoformat()
+    if kind == 'date':
+        return value.date().isoformat() if isinstance(value, datetime) else value.isoformat()
+    return value
+
+
+def xlsx_value(kind, value):
+    """Native spreadsheet value for a raw column value"""
+    if kind == 'money':
+        return round(float(value or 0), 2)
+    if kind == 'hours':
+        return round((value or 0) / 60, 2)
+    if kind == 'title':
+        return (value or '').title()
+    return value
+
+
+def count_rows(data_type, user_id, snapshot=None):
+    """Number of data rows an export will contain"""
+    counts = {
+        'bills': (Bill, Bill.created_by, 'bill'),
+        'expenses': (Expense, Expense.created_by, 'expense'),
+        'work': (WorkEntry, WorkEntry.user_id, 'work_entry')
+    }
+    total = 0
+    for section, _, _ in EXPORT_SECTIONS[data_type]:
+        model, owner_column, snapshot_key = counts[section]
+        query = db.session.query(func.count(model.id)).filter(owner_column == user_id)
+        if snapshot:
+            query = query.filter(model.id <= snapshot[snapshot_key])
+        total += query.scalar() or 0
+        if section == 'bills':
+            total += archived_bill_count(user_id, snapshot[snapshot_key] if snapshot else None)
+    return total
+
+
+def _counted(items, progress):
+    """Pass items through, reporting how many have been seen every chunk"""
+    seen = 0
+    for item in items:
+        seen += 1
+        if progress and seen % CHUNK_SIZE == 0:
+            progress(seen)
+        yield item
+    if progress:
+        progress(seen)
+
+
+def _iter_csv(data_type, user_id, username, export_time, snapshot, progress):
+    """CSV text chunks, laid out exactly like the classic CSV exports"""
+    if data_type == 'all':
+        rows = iter_all_rows(user_id, username, export_time, snapshot=snapshot)
+    else:
+        _, columns, records = EXPORT_SECTIONS[data_type][0]
+        rows = iter_rows(columns, records(user_id, snapshot=snapshot))
+    for text in stream_csv(_counted(rows, progress)):
+        yield text.encode('utf-8')
+
+
+def _iter_ndjson(data_type, user_id, snapshot, progress):
+    """One JSON object per line; the combined export tags each line with its section"""
+    def records():
+        for section, columns, record_fn in EXPORT_SECTIONS[data_type]:
+            keys = [column_key(header) for header, _ in columns]
+            kinds = [kind for _, kind in columns]
+            for record in record_fn(user_id, snapshot=snapshot):
+                obj = {key: json_value(kind, value) for key, kind, value in zip(keys, kinds, record)}
+                if data_type == 'all':
+                    obj = {'section': section, **obj}
+                yield obj
+
+    lines = []
+    for obj in _counted(records(), progress):
+        lines.append(json.dumps(obj, default=str))
+        if len(lines) >= CHUNK_SIZE:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _gzip(chunks):
+    """Compress a byte stream incrementally into gzip format"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    first = True
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if first:
+            # Sync-flush the header chunk so the download starts immediately
+            compressed += compressor.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_export(data_type, export_format, user_id, username, export_time,
+                snapshot=None, progress=None):
+    """Byte chunks of a streamable export"""
+    if export_format == 'ndjson':
+        return _iter_ndjson(data_type, user_id, snapshot, progress)
+    chunks = _iter_csv(data_type, user_id, username, export_time, snapshot, progress)
+    if export_format == 'csv.gz':
+        return _gzip(chunks)
+    return chunks
+
+
+def write_xlsx(fileobj, data_type, user_id, snapshot=None, progress=None):
+    """Write an XLSX workbook (one sheet per section) in openpyxl write-only mode"""
+    if not OPENPYXL_AVAILABLE:
+        raise ValueError("XLSX export is not available in this environment (openpyxl not installed)")
+
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+
+    def rows():
+        for section, columns, record_fn in EXPORT_SECTIONS[data_type]:
+            sheet = workbook.create_sheet(title=section.title())
+            sheet.append([header for header, _ in columns])
+            for record in record_fn(user_id, snapshot=snapshot):
+                yield sheet, [xlsx_value(kind, value) for (_, kind), value in zip(columns, record)]
+
+    for sheet, row in _counted(rows(), progress):
+        sheet.append(row)
+
+    workbook.save(fileobj)
+
+
+def write_export(fileobj, data_type, export_format, user_id, username, export_time,
+                 snapshot=None, progress=None):
+    """Write any supported export format to a binary file object"""
+    if export_format == 'xlsx':
+        write_xlsx(fileobj, data_type, user_id, snapshot, progress)
+        return
+    for chunk in iter_export(data_type, export_format, user_id, username, export_time,
+                             snapshot, progress):
+        fileobj.write(chunk)
+
+
+# ---------------------------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------------------------
+
+def export_folder():
+    """Directory holding finished export files"""
+    folder = current_app.config.get('EXPORT_FOLDER') or os.path.join(current_app.instance_path, 'exports')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=current_app.config.get('EXPORT_WORKERS', 2),
+            thread_name_prefix='export'
+        )
+    return _executor
+
+
+def _progress_path(job):
+    return os.path.join(export_folder(), f'job_{job.id}.progress')
+
+
+def read_progress(job):
+    """Rows processed so far; running jobs report through a sidecar file"""
+    if job.status != 'running':
+        return job.processed_rows or 0
+    try:
+        with open(_progress_path(job)) as handle:
+            return int(handle.read() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+STALE_JOB_ERROR = 'The export did not finish, probably because the server restarted. Please start it again.'
+
+
+def _stale_cutoff():
+    return datetime.utcnow() - timedelta(minutes=current_app.config.get('EXPORT_JOB_TIMEOUT_MINUTES', 60))
+
+
+def _mark_stale(job):
+    job.status = 'failed'
+    job.error = STALE_JOB_ERROR
+    job.completed_at = datetime.utcnow()
+
+
+def fail_stale_job(job):
+    """Fail one queued or running job past EXPORT_JOB_TIMEOUT_MINUTES; True if it was"""
+    if job.status not in ('queued', 'running') or job.created_at >= _stale_cutoff():
+        return False
+    _mark_stale(job)
+    db.session.commit()
+    return True
+
+
+def fail_stale_jobs():
+    """Fail queued and running jobs past EXPORT_JOB_TIMEOUT_MINUTES
+
+    Jobs run on an in-process thread pool, so a restart leaves them queued or
+    running with nothing working on them. Failed, they report an error to
+    pollers and are purged with the other finished jobs.
+    """
+    stale = ExportJob.query.filter(
+        ExportJob.created_at < _stale_cutoff(),
+        ExportJob.status.in_(['queued', 'running'])
+    ).all()
+    for job in stale:
+        _mark_stale(job)
+    if stale:
+        db.session.commit()
+    return len(stale)
+
+
+def purge_expired_jobs():
+    """Delete export jobs (and their files) older than the retention window"""
+    fail_stale_jobs()
+    hours = current_app.config.get('EXPORT_RETENTION_HOURS', 24)
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    expired = ExportJob.query.filter(
+        ExportJob.created_at < cutoff,
+        ExportJob.status.in_(['completed', 'failed'])
+    ).all()
+    for job in expired:
+        if job.file_path and os.path.exists(job.file_path):
+            try:
+                os.remove(job.file_path)
+            except OSError:
+                pass
+        db.session.delete(job)
+    if expired:
+        db.session.commit()
+
+
+def create_export_job(user, data_type, export_format):
+    """Record the id cutoff, queue the export and return the job"""
+    purge_expired_jobs()
+
+    snapshot = take_snapshot()
+    job = ExportJob(
+        user_id=user.id,
+        data_type=data_type,
+        export_format=export_format,
+        status='queued',
+        total_rows=count_rows(data_type, user.id, snapshot),
+        snapshot_bill_id=snapshot['bill'],
+        snapshot_bill_item_id=snapshot['bill_item'],
+        snapshot_expense_id=snapshot['expense'],
+        snapshot_work_entry_id=snapshot['work_entry']
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    _get_executor().submit(run_export_job, app, job.id)
+    return job
+
+
+def run_export_job(app, job_id):
+    """Build an export file for a queued job (runs on a worker thread)"""
+    with app.app_context():
+        job = db.session.get(ExportJob, job_id)
+        if job is None or job.status != 'queued':
+            return
+
+        job.status = 'running'
+        db.session.commit()
+
+        user = job.user
+        export_time = job.created_at
+        file_path = os.path.join(
+            export_folder(), f'job_{job.id}_' + export_filename(job.data_type, job.export_format, export_time)
+        )
+        progress_path = _progress_path(job)
+
+        def progress(rows):
+            with open(progress_path, 'w') as handle:
+                handle.write(str(rows))
+
+        try:
+            # Read everything inside one transaction; on Postgres the rows are consistent
+            # as of when this worker starts (the id cutoff still dates from job creation)
+            if db.engine.dialect.name == 'postgresql':
+                db.session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+
+            with open(file_path, 'wb') as handle:
+                write_export(handle, job.data_type, job.export_format, user.id, user.username,
+                             export_time, snapshot=job.snapshot, progress=progress)
+            db.session.rollback()
+
+            job = db.session.get(ExportJob, job_id)
+            job.status = 'completed'
+            job.file_path = file_path
+            job.processed_rows = job.total_rows
+            job.completed_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Export job {job_id} failed: {str(e)}")
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            job = db.session.get(ExportJob, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            job.completed_at = datetime.utcnow()
+            db.session.commit()
+        finally:
+            if os.path.exists(progress_path):
+                os.remove(progress_path)
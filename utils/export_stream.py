@@ -0,0 +1,271 @@
+"""
+Streaming export helpers for Smart Billing System
+Builds CSV exports row by row from server-side cursors so memory stays flat
+"""
+
+import csv
+import io
+from itertools import islice
+from sqlalchemy import func
+from models import db, Bill, BillItem, Customer, Expense, WorkEntry
+from utils.bill_archive import iter_archived_bills
+from utils.summary import get_user_summary
+
+# Number of rows fetched per cursor round trip (and flushed per response chunk)
+CHUNK_SIZE = 500
+
+# Column definitions: (header, kind). The kind decides how a raw value is rendered.
+BILL_COLUMNS = [
+    ('Bill Number', 'text'), ('Customer Name', 'text'), ('Customer Email', 'text'),
+    ('Customer Phone', 'text'), ('Total Amount', 'money'), ('Advance Amount', 'money'),
+    ('Remaining Amount', 'money'), ('Status', 'title'), ('Created Date', 'datetime'),
+    ('Due Date', 'date'), ('Paid Date', 'datetime'), ('Items', 'text'), ('Notes', 'text')
+]
+
+BILL_SUMMARY_COLUMNS = [
+    ('Bill Number', 'text'), ('Customer Name', 'text'), ('Customer Email', 'text'),
+    ('Customer Phone', 'text'), ('Total Amount', 'money'), ('Advance Amount', 'money'),
+    ('Remaining Amount', 'money'), ('Status', 'title'), ('Created Date', 'datetime'),
+    ('Items Count', 'number'), ('Notes', 'text')
+]
+
+EXPENSE_COLUMNS = [
+    ('Date', 'date'), ('Title', 'text'), ('Description', 'text'),
+    ('Category', 'text'), ('Amount', 'money'), ('Receipt', 'text')
+]
+
+WORK_COLUMNS = [
+    ('Project Name', 'text'), ('Customer Name', 'text'), ('Customer Phone', 'text'),
+    ('Service Type', 'text'), ('Start Time', 'datetime'), ('End Time', 'datetime'),
+    ('Duration (Hours)', 'hours'), ('Hourly Rate', 'money'), ('Total Amount', 'money'),
+    ('Advance Amount', 'money'), ('Remaining Amount', 'money'), ('Work Status', 'title'),
+    ('Payment Status', 'title'), ('Created Date', 'datetime')
+]
+
+WORK_SUMMARY_COLUMNS = [
+    ('Project Name', 'text'), ('Customer Name', 'text'), ('Service Type', 'text'),
+    ('Duration (Hours)', 'hours'), ('Total Amount', 'money'), ('Work Status', 'title'),
+    ('Payment Status', 'title'), ('Start Time', 'datetime')
+]
+
+
+def iter_chunks(iterable, size=CHUNK_SIZE):
+    """Yield lists of at most `size` items from any iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def format_cell(kind, value):
+    """Render a raw column value the way CSV exports have always shown it"""
+    if kind == 'money':
+        return f"Rs {(value or 0):.2f}"
+    if kind == 'hours':
+        return f"{((value or 0) / 60):.2f}"
+    if kind == 'datetime':
+        return value.strftime('%Y-%m-%d %H:%M:%S') if value else ''
+    if kind == 'date':
+        return value.strftime('%Y-%m-%d') if value else ''
+    if kind == 'title':
+        return (value or '').title()
+    if kind == 'number':
+        return value or 0
+    return value or ''
+
+
+def format_row(columns, record):
+    """Render a raw record tuple using its column definitions"""
+    return [format_cell(kind, value) for (_, kind), value in zip(columns, record)]
+
+
+def take_snapshot():
+    """Highest ids per table right now: an id cutoff for a later export
+
+    Rows added after this are left out. It is not a point-in-time copy: rows
+    edited or deleted before the export runs appear as they are then.
+    """
+    return {
+        'bill': db.session.query(func.max(Bill.id)).scalar() or 0,
+        'bill_item': db.session.query(func.max(BillItem.id)).scalar() or 0,
+        'expense': db.session.query(func.max(Expense.id)).scalar() or 0,
+        'work_entry': db.session.query(func.max(WorkEntry.id)).scalar() or 0
+    }
+
+
+def _bill_query(user_id, chunk_size, snapshot=None):
+    """Bills joined with their customer, read through a server-side cursor"""
+    query = db.session.query(
+        Bill.id, Bill.bill_number, Customer.name, Customer.email, Customer.phone,
+        Bill.total_amount, Bill.advance_amount, Bill.remaining_amount, Bill.status,
+        Bill.created_at, Bill.due_date, Bill.paid_date, Bill.notes
+    ).join(Customer, Bill.customer_id == Customer.id).filter(
+        Bill.created_by == user_id
+    )
+    if snapshot:
+        query = query.filter(Bill.id <= snapshot['bill'])
+    return query.order_by(Bill.id).yield_per(chunk_size)
+
+
+def _bill_items_filter(query, chunk, snapshot):
+    """Restrict a BillItem query to the bills of one chunk (and the snapshot)"""
+    query = query.filter(BillItem.bill_id.in_([row.id for row in chunk]))
+    if snapshot:
+        query = query.filter(BillItem.id <= snapshot['bill_item'])
+    return query
+
+
+def _archived_bills(user_id, chunk_size, snapshot):
+    """Archived bills (old and paid) of a user; their ids all predate any snapshot"""
+    return iter_archived_bills(user_id, chunk_size, snapshot['bill'] if snapshot else None)
+
+
+def iter_bill_records(user_id, chunk_size=CHUNK_SIZE, snapshot=None):
+    """Yield raw bill records (BILL_COLUMNS order) with items batch-loaded per chunk"""
+    for chunk in iter_chunks(_bill_query(user_id, chunk_size, snapshot), chunk_size):
+        # One query for all items of this chunk instead of one per bill
+        items_by_bill = {}
+        item_rows = _bill_items_filter(db.session.query(
+            BillItem.bill_id, BillItem.description, BillItem.quantity, BillItem.rate
+        ), chunk, snapshot).order_by(BillItem.id)
+        for bill_id, description, quantity, rate in item_rows:
+            items_by_bill.setdefault(bill_id, []).append(
+                f"{description} (Qty: {quantity}, Rate: Rs {rate})"
+            )
+
+        for row in chunk:
+            yield (
+                row.bill_number, row.name, row.email, row.phone,
+                row.total_amount, row.advance_amount, row.remaining_amount, row.status,
+                row.created_at, row.due_date, row.paid_date,
+                '; '.join(items_by_bill.get(row.id, [])), row.notes
+            )
+
+    for bill, name, email, phone in _archived_bills(user_id, chunk_size, snapshot):
+        yield (
+            bill['bill_number'], name, email, phone,
+            bill['total_amount'], bill['advance_amount'], bill['remaining_amount'], bill['status'],
+            bill['created_at'], bill['due_date'], bill['paid_date'],
+            '; '.join(f"{item['description']} (Qty: {item['quantity']}, Rate: Rs {item['rate']})"
+                      for item in bill['items']), bill['notes']
+        )
+
+
+def iter_bill_summary_records(user_id, chunk_size=CHUNK_SIZE, snapshot=None):
+    """Yield raw bill records (BILL_SUMMARY_COLUMNS order) with item counts per chunk"""
+    for chunk in iter_chunks(_bill_query(user_id, chunk_size, snapshot), chunk_size):
+        item_counts = dict(_bill_items_filter(db.session.query(
+            BillItem.bill_id, func.count(BillItem.id)
+        ), chunk, snapshot).group_by(BillItem.bill_id))
+
+        for row in chunk:
+            yield (
+                row.bill_number, row.name, row.email, row.phone,
+                row.total_amount, row.advance_amount, row.remaining_amount, row.status,
+                row.created_at, item_counts.get(row.id, 0), row.notes
+            )
+
+    for bill, name, email, phone in _archived_bills(user_id, chunk_size, snapshot):
+        yield (
+            bill['bill_number'], name, email, phone,
+            bill['total_amount'], bill['advance_amount'], bill['remaining_amount'], bill['status'],
+            bill['created_at'], len(bill['items']), bill['notes']
+        )
+
+
+def iter_expense_records(user_id, chunk_size=CHUNK_SIZE, snapshot=None):
+    """Yield raw expense records (EXPENSE_COLUMNS order)"""
+    query = db.session.query(
+        Expense.date, Expense.title, Expense.description,
+        Expense.category, Expense.amount, Expense.receipt_path
+    ).filter(Expense.created_by == user_id)
+    if snapshot:
+        query = query.filter(Expense.id <= snapshot['expense'])
+    return query.order_by(Expense.id).yield_per(chunk_size)
+
+
+def iter_work_records(user_id, chunk_size=CHUNK_SIZE, snapshot=None):
+    """Yield raw work entry records (WORK_COLUMNS order)"""
+    query = db.session.query(
+        WorkEntry.project_name, WorkEntry.customer_name, WorkEntry.customer_phone,
+        WorkEntry.service_type, WorkEntry.start_time, WorkEntry.end_time,
+        WorkEntry.duration_minutes, WorkEntry.hourly_rate, WorkEntry.total_amount,
+        WorkEntry.advance_amount, WorkEntry.remaining_amount, WorkEntry.work_status,
+        WorkEntry.payment_status, WorkEntry.created_at
+    ).filter(WorkEntry.user_id == user_id)
+    if snapshot:
+        query = query.filter(WorkEntry.id <= snapshot['work_entry'])
+    return query.order_by(WorkEntry.id).yield_per(chunk_size)
+
+
+def iter_work_summary_records(user_id, chunk_size=CHUNK_SIZE, snapshot=None):
+    """Yield raw work entry records (WORK_SUMMARY_COLUMNS order)"""
+    query = db.session.query(
+        WorkEntry.project_name, WorkEntry.customer_name, WorkEntry.service_type,
+        WorkEntry.duration_minutes, WorkEntry.total_amount, WorkEntry.work_status,
+        WorkEntry.payment_status, WorkEntry.start_time
+    ).filter(WorkEntry.user_id == user_id)
+    if snapshot:
+        query = query.filter(WorkEntry.id <= snapshot['work_entry'])
+    return query.order_by(WorkEntry.id).yield_per(chunk_size)
+
+
+def iter_rows(columns, records):
+    """Header row followed by formatted data rows"""
+    yield [header for header, _ in columns]
+    for record in records:
+        yield format_row(columns, record)
+
+
+def iter_all_rows(user_id, username, export_time, chunk_size=CHUNK_SIZE, snapshot=None):
+    """Rows of the combined export, ending with the SQL-computed summary"""
+    yield ['SMART BILLING SYSTEM - COMPLETE DATA EXPORT']
+    yield [f'Export Date: {export_time.strftime("%Y-%m-%d %H:%M:%S")}']
+    yield [f'User: {username}']
+    yield ['']
+
+    sections = [
+        ('=== BILLS DATA ===', BILL_SUMMARY_COLUMNS, iter_bill_summary_records),
+        ('=== EXPENSES DATA ===', EXPENSE_COLUMNS, iter_expense_records),
+        ('=== WORK ENTRIES DATA ===', WORK_SUMMARY_COLUMNS, iter_work_summary_records)
+    ]
+    for title, columns, records in sections:
+        yield [title]
+        yield from iter_rows(columns, records(user_id, chunk_size, snapshot))
+        yield ['']
+
+    summary = get_user_summary(user_id, snapshot)
+    total_revenue = summary['bills']['total_amount']
+    total_expenses_amount = summary['expenses']['total_amount']
+
+    yield ['=== SUMMARY ===']
+    yield ['Total Bills:', summary['bills']['count']]
+    yield ['Total Revenue:', f"Rs {total_revenue:.2f}"]
+    yield ['Total Expenses:', f"Rs {total_expenses_amount:.2f}"]
+    yield ['Total Work Entries:', summary['work']['count']]
+    yield ['Total Work Amount:', f"Rs {summary['work']['total_amount']:.2f}"]
+    yield ['Net Profit:', f"Rs {summary['net_profit']:.2f}"]
+
+
+def stream_csv(rows, chunk_size=CHUNK_SIZE):
+    """Encode rows as CSV text, flushing the first row at once and then every chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    pending = 0
+    first_sent = False
+
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        # Flush right after the header so the client gets its first byte immediately
+        if pending >= chunk_size or not first_sent:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+            first_sent = True
+
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,182 @@
+"""
+Login throttling for Smart Billing System
+Every sign-in attempt takes a token from a bucket for the client IP and one
+for the account; an empty bucket or an account in backoff is refused before
+the user lookup and password hash. Buckets live in memory or, for several
+gunicorn workers, in a small SQLite file on the host.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app
+
+# Buckets untouched for this long are dropped (they would be full again)
+IDLE_SECONDS = 3600
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _refill(state, burst, per_minute, now):
+    """Bucket state [tokens, updated, failures, blocked_until] advanced to `now`"""
+    if state is None:
+        return [float(burst), now, 0, 0.0]
+    tokens, updated, failures, blocked_until = state
+    tokens = min(float(burst), tokens + (now - updated) * per_minute / 60.0)
+    return [tokens, now, failures, blocked_until]
+
+
+class MemoryStore:
+    """Buckets for one process"""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, change):
+        """Apply change(state) -> (new_state, result) atomically; returns result"""
+        with self._lock:
+            state, result = change(self._buckets.get(key))
+            self._buckets[key] = state
+            if len(self._buckets) > self.maxsize:
+                self._prune(state[1])
+            return result
+
+    def _prune(self, now):
+        idle = [key for key, state in self._buckets.items()
+                if state[1] < now - IDLE_SECONDS and state[3] < now]
+        for key in idle:
+            del self._buckets[key]
+
+
+class SQLiteStore:
+    """Buckets shared by every worker on the host through a SQLite file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._last_prune = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS login_bucket ('
+            ' key TEXT PRIMARY KEY,'
+            ' tokens REAL NOT NULL,'
+            ' updated REAL NOT NULL,'
+            ' failures INTEGER NOT NULL,'
+            ' blocked_until REAL NOT NULL)'
+        )
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA busy_timeout=5000')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def update(self, key, change):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT tokens, updated, failures, blocked_until FROM login_bucket WHERE key = ?', (key,)
+            ).fetchone()
+            state, result = change(list(row) if row else None)
+            connection.execute('INSERT OR REPLACE INTO login_bucket VALUES (?, ?, ?, ?, ?)', [key] + state)
+            if state[1] - self._last_prune > 60:
+                connection.execute('DELETE FROM login_bucket WHERE updated < ? AND blocked_until < ?',
+                                   (state[1] - IDLE_SECONDS, state[1]))
+                self._last_prune = state[1]
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return result
+
+
+def _get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = current_app.config.get('LOGIN_THROTTLE_STORE')
+                _store = SQLiteStore(path) if path else MemoryStore()
+    return _store
+
+
+def _buckets(ip, email):
+    """(key, burst, per_minute) for each bucket a login attempt draws from"""
+    config = current_app.config
+    buckets = []
+    if config.get('LOGIN_IP_BURST', 20):
+        buckets.append((f'ip:{ip or "unknown"}', config.get('LOGIN_IP_BURST', 20),
+                        config.get('LOGIN_IP_PER_MINUTE', 10)))
+    if config.get('LOGIN_ACCOUNT_BURST', 5) and email:
+        buckets.append((f'account:{email.strip().lower()}', config.get('LOGIN_ACCOUNT_BURST', 5),
+                        config.get('LOGIN_ACCOUNT_PER_MINUTE', 3)))
+    return buckets
+
+
+def check_login(ip, email):
+    """Take a token for this attempt; returns 0, or the seconds to wait when refused
+
+    Call before looking up the user so refused attempts cost no hashing.
+    """
+    now = time.time()
+    for key, burst, per_minute in _buckets(ip, email):
+        def take(state, burst=burst, per_minute=per_minute):
+            state = _refill(state, burst, per_minute, now)
+            if state[3] > now:
+                return state, state[3] - now
+            if state[0] < 1:
+                return state, (1 - state[0]) * 60.0 / per_minute if per_minute else IDLE_SECONDS
+            state[0] -= 1
+            return state, 0
+        wait = _get_store().update(key, take)
+        if wait:
+            return max(1, int(wait + 0.999))
+    return 0
+
+
+def login_succeeded(ip, email):
+    """Return the attempt's tokens and clear the account's failures"""
+    now = time.time()
+    for key, burst, per_minute in _buckets(ip, email):
+        def refund(state, burst=burst, per_minute=per_minute):
+            state = _refill(state, burst, per_minute, now)
+            state[0] = min(float(burst), state[0] + 1)
+            state[2], state[3] = 0, 0.0
+            return state, None
+        _get_store().update(key, refund)
+
+
+def login_failed(ip, email):
+    """Count a failed password for the account and start or extend its backoff
+
+    After LOGIN_BACKOFF_AFTER failures in a row the account is refused for
+    LOGIN_BACKOFF_SECONDS, doubling with each further failure up to
+    LOGIN_BACKOFF_MAX.
+    """
+    config = current_app.config
+    after = config.get('LOGIN_BACKOFF_AFTER', 3)
+    base = config.get('LOGIN_BACKOFF_SECONDS', 2)
+    maximum = config.get('LOGIN_BACKOFF_MAX', 300)
+    now = time.time()
+    for key, burst, per_minute in _buckets(ip, email):
+        if not key.startswith('account:'):
+            continue
+        def fail(state, burst=burst, per_minute=per_minute):
+            state = _refill(state, burst, per_minute, now)
+            state[2] += 1
+            if base and state[2] >= after:
+                state[3] = now + min(base * 2 ** min(state[2] - after, 20), maximum)
+            return state, None
+        _get_store().update(key, fail)
@@ -0,0 +1,248 @@
+"""
+Versioned schema migrations for Smart Billing System
+Each file in migrations/ named NNNN_description.py has upgrade(op) and
+downgrade(op) steps; applied versions are recorded in schema_migrations.
+A step whose downgrade destroys data sets REQUIRES_FORCE to say what, and is
+only reverted with force=True (migrate.py downgrade <version> --force).
+Works on SQLite and PostgreSQL, both of which run DDL inside a transaction,
+so a step is applied completely or not at all.
+"""
+
+import importlib
+import os
+import re
+from datetime import datetime
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+VERSION_TABLE = 'schema_migrations'
+
+_FILENAME = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+_version_table = sa.Table(
+    VERSION_TABLE, sa.MetaData(),
+    sa.Column('version', sa.Integer, primary_key=True),
+    sa.Column('name', sa.String(100), nullable=False),
+    sa.Column('applied_at', sa.DateTime, nullable=False)
+)
+
+
+class Operations:
+    """Schema changes available to a migration step, bound to its connection"""
+
+    def __init__(self, connection, force=False):
+        self.connection = connection
+        self.dialect = connection.dialect.name
+        self.force = force
+
+    def _inspector(self):
+        # Fresh each time: earlier operations in the step change what exists
+        return sa.inspect(self.connection)
+
+    def _quote(self, name):
+        return self.connection.dialect.identifier_preparer.quote(name)
+
+    def has_table(self, table_name):
+        return self._inspector().has_table(table_name)
+
+    def has_column(self, table_name, column_name):
+        return column_name in [column['name'] for column in self._inspector().get_columns(table_name)]
+
+    def has_index(self, table_name, index_name):
+        return index_name in [index['name'] for index in self._inspector().get_indexes(table_name)]
+
+    def execute(self, statement, parameters=None):
+        if isinstance(statement, str):
+            statement = sa.text(statement)
+        return self.connection.execute(statement, parameters or {})
+
+    def create_all(self, metadata):
+        """Create missing tables, then add missing columns and indexes to existing ones"""
+        for table in metadata.sorted_tables:
+            if not self.has_table(table.name):
+                table.create(self.connection)
+                continue
+            for column in table.columns:
+                if not self.has_column(table.name, column.name):
+                    self.add_column(table.name, column)
+            for index in table.indexes:
+                index.create(self.connection, checkfirst=True)
+
+    def drop_all(self, metadata):
+        metadata.drop_all(self.connection, checkfirst=True)
+
+    def create_table(self, name, *columns):
+        table = sa.Table(name, sa.MetaData(), *columns)
+        table.create(self.connection, checkfirst=True)
+        return table
+
+    def drop_table(self, name):
+        self.execute(f'DROP TABLE IF EXISTS {self._quote(name)}')
+
+    def add_column(self, table_name, column):
+        """ALTER TABLE ... ADD COLUMN (foreign keys are not added to existing tables)"""
+        if self.has_column(table_name, column.name):
+            return
+        column = column._copy()
+        column.foreign_keys.clear()
+        column.constraints = set()
+        definition = sa.schema.CreateColumn(column).compile(dialect=self.connection.dialect)
+        self.execute(f'ALTER TABLE {self._quote(table_name)} ADD COLUMN {definition}')
+
+    def drop_column(self, table_name, column_name):
+        """ALTER TABLE ... DROP COLUMN (SQLite 3.35+; drop indexes on the column first)"""
+        if self.has_column(table_name, column_name):
+            self.execute(f'ALTER TABLE {self._quote(table_name)} DROP COLUMN {self._quote(column_name)}')
+
+    def create_index(self, name, table_name, columns, unique=False):
+        if self.has_index(table_name, name):
+            return
+        self.execute('CREATE {}INDEX {} ON {} ({})'.format(
+            'UNIQUE ' if unique else '', self._quote(name), self._quote(table_name),
+            ', '.join(self._quote(column) for column in columns)
+        ))
+
+    def drop_index(self, name, table_name=None):
+        self.execute(f'DROP INDEX IF EXISTS {self._quote(name)}')
+
+
+def migrations():
+    """[(version, name, module)] for every file in migrations/, in order"""
+    found = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _FILENAME.match(filename)
+        if match:
+            module = importlib.import_module(f'migrations.{filename[:-3]}')
+            found.append((int(match.group(1)), match.group(2), module))
+    found.sort(key=lambda migration: migration[0])
+    versions = [version for version, _, _ in found]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError('Two migrations share a version number')
+    return found
+
+
+def applied_versions(engine):
+    with engine.connect() as connection:
+        if not sa.inspect(connection).has_table(VERSION_TABLE):
+            return set()
+        return {row[0] for row in connection.execute(sa.select(_version_table.c.version))}
+
+
+def current_version(engine):
+    return max(applied_versions(engine), default=0)
+
+
+def head_version():
+    return max((version for version, _, _ in migrations()), default=0)
+
+
+def upgrade(engine, target=None):
+    """Apply pending migrations up to `target` (default: all); returns the versions applied
+
+    The version row is inserted before the step runs (which also opens the
+    transaction on SQLite), so when several workers start at once the others
+    wait on it and then skip the step.
+    """
+    _version_table.create(engine, checkfirst=True)
+    done = applied_versions(engine)
+    applied = []
+    for version, name, module in migrations():
+        if version in done or (target is not None and version > target):
+            continue
+        try:
+            with engine.begin() as connection:
+                connection.execute(_version_table.insert().values(
+                    version=version, name=name, applied_at=datetime.utcnow()
+                ))
+                module.upgrade(Operations(connection))
+        except IntegrityError:
+            continue  # applied by another process meanwhile
+        applied.append(version)
+    return applied
+
+
+def downgrade(engine, target, force=False):
+    """Revert applied migrations newer than `target`, newest first; returns the versions reverted
+
+    Refuses before reverting anything when one of the steps has
+    REQUIRES_FORCE and `force` is not set. Steps may also refuse themselves
+    (raising RuntimeError) unless `op.force`, e.g. while they hold data.
+    """
+    done = applied_versions(engine)
+    pending = [(version, name, module) for version, name, module in reversed(migrations())
+               if version > target and version in done]
+    for version, name, module in pending:
+        reason = getattr(module, 'REQUIRES_FORCE', None)
+        if reason and not force:
+            raise RuntimeError(f'Reverting {version:04d} {name} {reason}; pass --force to do it anyway')
+    reverted = []
+    for version, name, module in pending:
+        with engine.begin() as connection:
+            # Write first: pysqlite only opens the transaction at the first DML statement
+            connection.execute(_version_table.delete().where(_version_table.c.version == version))
+            module.downgrade(Operations(connection, force=force))
+        reverted.append(version)
+    return reverted
+
+
+# ---------------------------------------------------------------------------
+# Models vs migrations
+# ---------------------------------------------------------------------------
+
+def _describe(inspector, dialect, table_names):
+    """Comparable description of tables, columns, indexes, unique constraints and foreign keys"""
+    schema = {}
+    for table_name in table_names:
+        schema[table_name] = {
+            'columns': {
+                column['name']: (column['type'].compile(dialect=dialect), bool(column['nullable']))
+                for column in inspector.get_columns(table_name)
+            },
+            'indexes': {
+                index['name']: (tuple(index['column_names']), bool(index['unique']))
+                for index in inspector.get_indexes(table_name)
+            },
+            'unique': sorted(tuple(constraint['column_names'])
+                             for constraint in inspector.get_unique_constraints(table_name)),
+            'foreign_keys': sorted((tuple(key['constrained_columns']), key['referred_table'])
+                                   for key in inspector.get_foreign_keys(table_name))
+        }
+    return schema
+
+
+def check_models(metadata):
+    """Differences between the models and a database built by the migrations ([] when in sync)
+
+    Both schemas are built on scratch in-memory SQLite databases and read
+    back through the inspector, so a model change without a migration (or
+    the other way round) shows up as a difference.
+    """
+    migrated = sa.create_engine('sqlite://')
+    upgrade(migrated)
+    modelled = sa.create_engine('sqlite://')
+    metadata.create_all(modelled)
+
+    migrated_inspector, modelled_inspector = sa.inspect(migrated), sa.inspect(modelled)
+    migrated_tables = set(migrated_inspector.get_table_names()) - {VERSION_TABLE}
+    modelled_tables = set(modelled_inspector.get_table_names())
+
+    problems = [f'table {name} has no migration' for name in sorted(modelled_tables - migrated_tables)]
+    problems += [f'table {name} is not in the models' for name in sorted(migrated_tables - modelled_tables)]
+
+    shared = sorted(migrated_tables & modelled_tables)
+    dialect = migrated.dialect
+    migrated_schema = _describe(migrated_inspector, dialect, shared)
+    modelled_schema = _describe(modelled_inspector, dialect, shared)
+    for table_name in shared:
+        for part, label in (('columns', 'column'), ('indexes', 'index')):
+            expected, actual = modelled_schema[table_name][part], migrated_schema[table_name][part]
+            for name in sorted(set(expected) | set(actual)):
+                if expected.get(name) != actual.get(name):
+                    problems.append(f'{table_name}: {label} {name}: models {expected.get(name)}, '
+                                    f'migrations {actual.get(name)}')
+        for part, label in (('unique', 'unique constraints'), ('foreign_keys', 'foreign keys')):
+            expected, actual = modelled_schema[table_name][part], migrated_schema[table_name][part]
+            if expected != actual:
+                problems.append(f'{table_name}: {label}: models {expected}, migrations {actual}')
+    return problems
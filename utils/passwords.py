@@ -0,0 +1,136 @@
+"""
+Password hashing for Smart Billing System
+The algorithm and cost come from PASSWORD_HASH_METHOD / PASSWORD_HASH_COST;
+hashes stored with other settings are replaced at the user's next login, and
+login checks can run on a small bounded thread pool
+"""
+
+import base64
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Optional: without bcrypt the pbkdf2 policy is used
+try:
+    import bcrypt
+    BCRYPT_AVAILABLE = True
+except ImportError:
+    BCRYPT_AVAILABLE = False
+
+# method -> default cost (PBKDF2 iterations / bcrypt log2 rounds)
+DEFAULT_COSTS = {
+    'pbkdf2': 600000,
+    'bcrypt': 12
+}
+
+# bcrypt only reads 72 bytes, so passwords are pre-hashed; the prefix marks that
+BCRYPT_PREFIX = 'bcrypt-sha256$'
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+
+
+class PasswordCheckBusy(Exception):
+    """Too many password checks are already waiting for the pool"""
+
+
+def hash_policy(config=None):
+    """(method, cost) from the app config"""
+    config = config if config is not None else current_app.config
+    method = (config.get('PASSWORD_HASH_METHOD') or 'pbkdf2').lower()
+    if method not in DEFAULT_COSTS or (method == 'bcrypt' and not BCRYPT_AVAILABLE):
+        method = 'pbkdf2'
+    cost = int(config.get('PASSWORD_HASH_COST') or DEFAULT_COSTS[method])
+    return method, cost
+
+
+def _bcrypt_input(password):
+    return base64.b64encode(hashlib.sha256(password.encode('utf-8')).digest())
+
+
+def hash_password(password, method=None, cost=None):
+    """Hash with the configured policy (or the given method and cost)"""
+    if method is None:
+        method, cost = hash_policy()
+    cost = cost or DEFAULT_COSTS[method]
+    if method == 'bcrypt':
+        hashed = bcrypt.hashpw(_bcrypt_input(password), bcrypt.gensalt(rounds=cost))
+        return BCRYPT_PREFIX + hashed.decode('ascii')
+    return generate_password_hash(password, method=f'pbkdf2:sha256:{cost}')
+
+
+def verify_password(stored, password):
+    """Check a password against a bcrypt or Werkzeug hash"""
+    if not stored or password is None:
+        return False
+    if stored.startswith(BCRYPT_PREFIX):
+        if not BCRYPT_AVAILABLE:
+            return False
+        return bcrypt.checkpw(_bcrypt_input(password), stored[len(BCRYPT_PREFIX):].encode('ascii'))
+    return check_password_hash(stored, password)
+
+
+def stored_policy(stored):
+    """(method, cost) a stored hash was made with, or (None, None) if unknown"""
+    if not stored:
+        return None, None
+    try:
+        if stored.startswith(BCRYPT_PREFIX):
+            return 'bcrypt', int(stored[len(BCRYPT_PREFIX):].split('$')[2])
+        method = stored.split('$', 1)[0].split(':')
+        if method[0] == 'pbkdf2' and len(method) == 3 and method[1] == 'sha256':
+            return 'pbkdf2', int(method[2])
+    except (IndexError, ValueError):
+        pass
+    return None, None
+
+
+def needs_rehash(stored, config=None):
+    """True when a stored hash was not made with the current policy (stronger or weaker)"""
+    return stored_policy(stored) != hash_policy(config)
+
+
+# ---------------------------------------------------------------------------
+# Bounded verification pool
+# ---------------------------------------------------------------------------
+
+def _get_executor():
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = current_app.config.get('PASSWORD_HASH_WORKERS', 0)
+                _slots = threading.BoundedSemaphore(workers + current_app.config.get('PASSWORD_HASH_QUEUE', 16))
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+    return _executor
+
+
+def run_hashing(function, *args):
+    """Run a hashing call on the pool (or inline when PASSWORD_HASH_WORKERS is 0)
+
+    At most PASSWORD_HASH_WORKERS hashes run at once, so logins can never
+    occupy every request thread; when PASSWORD_HASH_QUEUE more are already
+    waiting, PasswordCheckBusy is raised instead of queueing further.
+    """
+    if not current_app.config.get('PASSWORD_HASH_WORKERS', 0):
+        return function(*args)
+    executor = _get_executor()
+    if not _slots.acquire(blocking=False):
+        raise PasswordCheckBusy('Too many sign-ins in progress')
+    try:
+        return executor.submit(function, *args).result()
+    finally:
+        _slots.release()
+
+
+def check_and_upgrade(user, password):
+    """Verify a login and re-hash the password if the policy changed (caller commits)"""
+    if not run_hashing(verify_password, user.password_hash, password):
+        return False
+    if needs_rehash(user.password_hash):
+        method, cost = hash_policy()  # read here: pool threads have no app context
+        user.password_hash = run_hashing(hash_password, password, method, cost)
+    return True
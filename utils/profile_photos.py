@@ -0,0 +1,123 @@
+"""
+Profile photos for Smart Billing System
+Uploads are stored under their content hash and accepted straight away;
+square JPEG and WebP copies in a few sizes are made on a background thread
+and pages ask for the smallest copy that fits
+"""
+
+import os
+import re
+from flask import current_app, request, url_for
+from models import User
+from utils.uploads import remove_files, store_upload, submit
+
+# Optional: without Pillow the uploaded photo is served as-is
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+UPLOAD_FOLDER = 'static/uploads/profiles'
+ALLOWED_TYPES = ('jpg', 'png', 'gif', 'webp')
+
+# Square sizes in pixels; templates ask for a display size and get the next one up
+PHOTO_SIZES = (96, 160, 320)
+FORMATS = (('webp', 'WEBP', 80), ('jpg', 'JPEG', 85))
+
+_HASHED_NAME = re.compile(r'^[0-9a-f]{64}(_\d+)?\.(jpg|png|gif|webp)$')
+
+
+def photo_folder():
+    return os.path.join(current_app.root_path, UPLOAD_FOLDER)
+
+
+def is_content_hashed(filename):
+    return bool(_HASHED_NAME.match(filename))
+
+
+def variant_filename(filename, size, extension):
+    """<hash>_<size>.<extension> for an original <hash>.<ext>"""
+    return f"{filename.rsplit('.', 1)[0]}_{size}.{extension}"
+
+
+def store_profile_photo(file):
+    """Save an uploaded photo as-is and return the stored path (static/uploads/profiles/<sha256>.<ext>)
+
+    Raises ValueError for files that are not images or are too large.
+    """
+    max_bytes = current_app.config.get('PROFILE_PHOTO_MAX_MB', 10) * 1024 * 1024
+    filename = store_upload(file, photo_folder(), max_bytes, ALLOWED_TYPES, shard=False)
+    return f'{UPLOAD_FOLDER}/{filename}'
+
+
+def queue_photo_variants(photo_path):
+    """Make the resized copies of a stored photo off the request thread"""
+    if not PIL_AVAILABLE or not photo_path:
+        return None
+    return submit(make_photo_variants, photo_folder(), os.path.basename(photo_path))
+
+
+def make_photo_variants(folder, filename):
+    """Write each missing size as WebP and JPEG; returns the files written
+
+    The photo is decoded once (at reduced scale for JPEGs), centre-cropped
+    to a square and scaled down from the largest size to the smallest.
+    """
+    source = os.path.join(folder, filename)
+    written = []
+    if not os.path.exists(source):
+        return written  # replaced before the job ran
+    try:
+        with Image.open(source) as image:
+            image.draft('RGB', (PHOTO_SIZES[-1], PHOTO_SIZES[-1]))
+            image = ImageOps.exif_transpose(image)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            for size in sorted(PHOTO_SIZES, reverse=True):
+                image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+                for extension, image_format, quality in FORMATS:
+                    target = os.path.join(folder, variant_filename(filename, size, extension))
+                    if os.path.exists(target):
+                        continue
+                    temp_path = f'{target}.tmp'
+                    image.save(temp_path, image_format, quality=quality)
+                    os.replace(temp_path, target)
+                    written.append(os.path.basename(target))
+    except Exception as e:
+        print(f"Profile photo variants for {filename} failed: {str(e)}")
+    return written
+
+
+def release_profile_photo(photo_path):
+    """Delete a photo and its copies once no user refers to it (call after commit)"""
+    if not photo_path or User.query.filter_by(profile_photo=photo_path).first() is not None:
+        return
+    filename = os.path.basename(photo_path)
+    remove_files(photo_folder(), [filename] + [
+        variant_filename(filename, size, extension)
+        for size in PHOTO_SIZES for extension, _, _ in FORMATS
+    ])
+
+
+def profile_photo_url(user, size=160):
+    """URL of the smallest copy of a user's photo at least `size` pixels wide
+
+    WebP is used when the page request says the browser accepts it; until
+    the copies exist (or for photos from before they were made) the
+    original is returned.
+    """
+    if not user or not user.profile_photo:
+        return None
+    filename = os.path.basename(user.profile_photo)
+    if is_content_hashed(filename):
+        folder = photo_folder()
+        wanted = next((candidate for candidate in PHOTO_SIZES if candidate >= size), PHOTO_SIZES[-1])
+        # Only an explicit image/webp counts; */* is sent by browsers without WebP too
+        accepts_webp = 'image/webp' in request.headers.get('Accept', '')
+        extensions = [extension for extension, _, _ in FORMATS if extension != 'webp' or accepts_webp]
+        for extension in extensions:
+            name = variant_filename(filename, wanted, extension)
+            if os.path.exists(os.path.join(folder, name)):
+                return url_for('settings.uploaded_file', filename=name)
+    return url_for('settings.uploaded_file', filename=filename)
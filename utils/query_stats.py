@@ -0,0 +1,247 @@
+"""
+Query statistics for Smart Billing System
+With QUERY_STATS on, each request records its wall time, the time spent
+waiting on the database, the statements it ran and the slowest of them, and
+each statement whether its compiled form came from SQLAlchemy's compile
+cache. The rest of the request time is Python overhead (query building, ORM
+loading, templates). Responses to signed-in admins carry the figures in a
+Server-Timing header (others never see them), and statements slower than SLOW_QUERY_MS go to a rotating slow-query log
+with the shape (not the values) of their parameters. Figures are per process.
+"""
+
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from flask import g, has_request_context, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import CacheStats
+
+SLOWEST_PER_REQUEST = 5
+RECENT_SLOW_QUERIES = 50
+MAX_STATEMENT_LENGTH = 1000
+MAX_SHAPE_PARAMETERS = 10
+
+slow_query_log = logging.getLogger('smart_billing.slow_queries')
+slow_query_log.propagate = False
+
+_lock = threading.Lock()
+_cache = {'hits': 0, 'misses': 0, 'uncached': 0}
+_routes = {}
+_recent_slow = deque(maxlen=RECENT_SLOW_QUERIES)
+_watched = set()
+_settings = {'slow_ms': 0}
+
+
+def statement_text(statement):
+    """A statement on one line, cut to MAX_STATEMENT_LENGTH characters"""
+    text = re.sub(r'\s+', ' ', statement).strip()
+    return text if len(text) <= MAX_STATEMENT_LENGTH else text[:MAX_STATEMENT_LENGTH] + '...'
+
+
+def _type_name(value):
+    return 'None' if value is None else type(value).__name__
+
+
+def parameter_shape(parameters, executemany=False):
+    """The types of a statement's bound parameters, e.g. "(int, str)" or "3 x {id: int}" """
+    if executemany:
+        parameters = list(parameters or ())
+        return f"{len(parameters)} x {parameter_shape(parameters[0])}" if parameters else '[]'
+    if isinstance(parameters, dict):
+        items = [f'{name}: {_type_name(value)}' for name, value in parameters.items()]
+        opening, closing = '{', '}'
+    else:
+        items = [_type_name(value) for value in parameters or ()]
+        opening, closing = '(', ')'
+    if len(items) > MAX_SHAPE_PARAMETERS:
+        items = items[:MAX_SHAPE_PARAMETERS] + [f'... {len(items)} parameters']
+    return opening + ', '.join(items) + closing
+
+
+def _endpoint():
+    return (request.endpoint or 'unmatched') if has_request_context() else '-'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_stats_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_stats_start'].pop()
+    cache_hit = getattr(context, 'cache_hit', None)
+    outcome = ('hits' if cache_hit == CacheStats.CACHE_HIT
+               else 'misses' if cache_hit == CacheStats.CACHE_MISS else 'uncached')
+    with _lock:
+        _cache[outcome] += 1
+
+    stats = g.get('query_stats') if has_request_context() else None
+    if stats is not None:
+        stats['db'] += elapsed
+        stats['statements'] += 1
+        stats[outcome] += 1
+        # Keep the slowest few; the counter breaks ties without comparing text
+        entry = (elapsed, stats['statements'], statement)
+        if len(stats['slowest']) < SLOWEST_PER_REQUEST:
+            heapq.heappush(stats['slowest'], entry)
+        elif entry > stats['slowest'][0]:
+            heapq.heapreplace(stats['slowest'], entry)
+
+    slow_ms = _settings['slow_ms']
+    if slow_ms and elapsed * 1000 >= slow_ms:
+        _record_slow_query(elapsed, statement, parameters, executemany)
+
+
+def _record_slow_query(elapsed, statement, parameters, executemany):
+    try:
+        slow = {
+            'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'endpoint': _endpoint(),
+            'ms': round(elapsed * 1000, 2),
+            'statement': statement_text(statement),
+            'parameters': parameter_shape(parameters, executemany)
+        }
+        with _lock:
+            _recent_slow.append(slow)
+        slow_query_log.warning('%.1fms %s %s params=%s', slow['ms'], slow['endpoint'],
+                               slow['statement'], slow['parameters'])
+    except Exception as e:
+        print(f"Slow query logging failed: {str(e)}")
+
+
+def watch_engine(engine):
+    if engine not in _watched:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        _watched.add(engine)
+
+
+def _start_request():
+    g.query_stats = {'start': time.perf_counter(), 'db': 0.0, 'statements': 0,
+                     'hits': 0, 'misses': 0, 'uncached': 0, 'slowest': []}
+
+
+def _server_timing(response):
+    stats = g.get('query_stats')
+    if stats is not None and current_user.is_authenticated and current_user.is_admin():
+        total = time.perf_counter() - stats['start']
+        response.headers['Server-Timing'] = (
+            f'db;dur={stats["db"] * 1000:.1f};desc="{stats["statements"]} queries", '
+            f'app;dur={(total - stats["db"]) * 1000:.1f}'
+        )
+    return response
+
+
+def _finish_request(exc=None):
+    stats = g.pop('query_stats', None)
+    if stats is None:
+        return
+    total = time.perf_counter() - stats['start']
+    endpoint = request.endpoint or 'unmatched'
+    slowest = max(stats['slowest'], default=None)
+    with _lock:
+        route = _routes.setdefault(endpoint, {
+            'requests': 0, 'total': 0.0, 'db': 0.0, 'statements': 0, 'hits': 0, 'misses': 0, 'uncached': 0,
+            'max_total': 0.0, 'max_statements': 0, 'slowest': None
+        })
+        route['requests'] += 1
+        route['total'] += total
+        for key in ('db', 'statements', 'hits', 'misses', 'uncached'):
+            route[key] += stats[key]
+        route['max_total'] = max(route['max_total'], total)
+        route['max_statements'] = max(route['max_statements'], stats['statements'])
+        if slowest is not None and (route['slowest'] is None or slowest[0] > route['slowest'][0]):
+            route['slowest'] = (slowest[0], slowest[2])
+
+
+def _open_slow_query_log(path, max_mb, backups):
+    path = os.path.abspath(path)
+    for handler in list(slow_query_log.handlers):
+        if getattr(handler, 'baseFilename', None) == path:
+            return
+        # One log per process: a new SLOW_QUERY_LOG replaces the previous file
+        slow_query_log.removeHandler(handler)
+        handler.close()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handler = RotatingFileHandler(path, maxBytes=max_mb * 1024 * 1024, backupCount=backups,
+                                  encoding='utf-8', delay=True)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(process)d %(message)s'))
+    slow_query_log.addHandler(handler)
+    slow_query_log.setLevel(logging.WARNING)
+
+
+def init_query_stats(app, engines):
+    """Record statistics for every request of `app` and statement on `engines`"""
+    for engine in engines:
+        watch_engine(engine)
+    _settings['slow_ms'] = app.config.get('SLOW_QUERY_MS', 0)
+    if _settings['slow_ms'] and app.config.get('SLOW_QUERY_LOG'):
+        try:
+            _open_slow_query_log(app.config['SLOW_QUERY_LOG'], app.config.get('SLOW_QUERY_LOG_MB', 5),
+                                 app.config.get('SLOW_QUERY_LOG_BACKUPS', 3))
+        except OSError as e:
+            print(f"Opening slow query log failed: {str(e)}")
+    if not app.extensions.get('query_stats'):
+        app.before_request(_start_request)
+        app.after_request(_server_timing)
+        app.teardown_request(_finish_request)
+        app.extensions['query_stats'] = True
+
+
+def _hit_rate(counts):
+    compiled = counts['hits'] + counts['misses']
+    return round(counts['hits'] / compiled * 100, 1) if compiled else None
+
+
+ROUTE_ORDER = {
+    'python': lambda row: row['avg_python_ms'] * row['requests'],
+    'db': lambda row: row['total_db_ms'],
+    'statements': lambda row: row['avg_statements'],
+    'slowest': lambda row: row['max_ms']
+}
+
+
+def query_stats(order='python'):
+    """Compile cache counts, per-route figures (ms) and recent slow queries
+
+    Routes come worst first by `order`: 'python' (total Python overhead),
+    'db' (total database time), 'statements' (per request) or 'slowest'.
+    """
+    with _lock:
+        cache = dict(_cache)
+        routes = {endpoint: dict(route) for endpoint, route in _routes.items()}
+        slow_queries = list(reversed(_recent_slow))
+    cache['hit_rate'] = _hit_rate(cache)
+
+    rows = []
+    for endpoint, route in routes.items():
+        requests = route['requests']
+        slowest = route['slowest']
+        rows.append({
+            'endpoint': endpoint,
+            'requests': requests,
+            'avg_ms': round(route['total'] / requests * 1000, 2),
+            'max_ms': round(route['max_total'] * 1000, 2),
+            'avg_db_ms': round(route['db'] / requests * 1000, 2),
+            'total_db_ms': round(route['db'] * 1000, 2),
+            'avg_python_ms': round((route['total'] - route['db']) / requests * 1000, 2),
+            'avg_statements': round(route['statements'] / requests, 1),
+            'max_statements': route['max_statements'],
+            'cache_hit_rate': _hit_rate(route),
+            'slowest_ms': round(slowest[0] * 1000, 2) if slowest else None,
+            'slowest_statement': statement_text(slowest[1]) if slowest else None
+        })
+    rows.sort(key=ROUTE_ORDER.get(order, ROUTE_ORDER['python']), reverse=True)
+    return {'compile_cache': cache, 'routes': rows, 'slow_queries': slow_queries}
+
+
+def reset_query_stats():
+    with _lock:
+        _cache.update(hits=0, misses=0, uncached=0)
+        _routes.clear()
+        _recent_slow.clear()
@@ -0,0 +1,164 @@
+"""
+Read replica routing for Smart Billing System
+Views marked @replica_reads (analytics, reports, exports) send their SELECTs
+to the 'replica' bind (REPLICA_DATABASE_URL) so long reports do not hold
+primary connections needed by billing. The primary is used instead when the
+replica is unreachable or more than REPLICA_MAX_LAG seconds behind, and for
+a user who wrote within that window (read-your-writes). Requests without a
+session cookie cannot carry their last write, so they always use the primary.
+"""
+
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context, request, session as flask_session
+from flask_login import current_user
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+REPLICA_BIND = 'replica'
+
+# Seconds behind the primary; an idle primary counts as no lag
+POSTGRES_LAG_QUERY = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+_health = {'checked_at': 0.0, 'healthy': False, 'lag': None}
+_health_lock = threading.Lock()
+_watched = set()
+# user id -> time of their last write, for clients that do not send back the updated cookie
+_last_writes = {}
+
+
+class RoutingSession(FlaskSession):
+    """Flask-SQLAlchemy session that reads from the replica chosen for the request"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and isinstance(clause, Select) and has_app_context():
+            replica = g.get('read_replica')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_lag(engine):
+    """Seconds the replica is behind the primary (0 where the database cannot tell)"""
+    with engine.connect() as connection:
+        if engine.dialect.name == 'postgresql':
+            return float(connection.execute(text(POSTGRES_LAG_QUERY)).scalar() or 0)
+        connection.execute(text('SELECT 1'))
+        return 0.0
+
+
+def mark_replica_down():
+    """Send reads to the primary until the next health check"""
+    with _health_lock:
+        _health.update(checked_at=time.monotonic(), healthy=False)
+
+
+def _on_replica_error(context):
+    # Lost or refused connections take the replica out of rotation at once
+    if context.is_disconnect or context.connection is None:
+        mark_replica_down()
+
+
+def _watch(engine):
+    if engine not in _watched:
+        event.listen(engine, 'handle_error', _on_replica_error)
+        _watched.add(engine)
+
+
+def replica_healthy(engine):
+    """Cached health check: reachable and within REPLICA_MAX_LAG"""
+    config = current_app.config
+    now = time.monotonic()
+    with _health_lock:
+        if now - _health['checked_at'] < config.get('REPLICA_CHECK_INTERVAL', 5):
+            return _health['healthy']
+        _health['checked_at'] = now  # other threads keep the old answer meanwhile
+    _watch(engine)
+    try:
+        lag = replica_lag(engine)
+        healthy = lag <= config.get('REPLICA_MAX_LAG', 10)
+    except Exception as e:
+        print(f"Read replica check failed: {str(e)}")
+        lag, healthy = None, False
+    with _health_lock:
+        _health.update(healthy=healthy, lag=lag)
+    return healthy
+
+
+def _user_id():
+    return current_user.get_id() if current_user.is_authenticated else None
+
+
+def choose_replica():
+    """Replica engine for this request, or None to stay on the primary"""
+    engine = current_app.extensions['sqlalchemy'].engines.get(REPLICA_BIND)
+    if engine is None:
+        return None
+    last_write = None
+    if has_request_context():
+        if current_app.config['SESSION_COOKIE_NAME'] not in request.cookies:
+            return None
+        last_write = max(flask_session.get('_last_write', 0), _last_writes.get(_user_id(), 0))
+    if last_write and time.time() - last_write < current_app.config.get('REPLICA_MAX_LAG', 10):
+        return None
+    return engine if replica_healthy(engine) else None
+
+
+def replica_reads(view):
+    """Run a read-only view against the replica when it is usable
+
+    If the replica fails during the view, it is marked down and the view is
+    run once more on the primary. Streamed responses query after the view has
+    returned, where that retry cannot reach, so their body reads the primary.
+    """
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        g.read_replica = choose_replica()
+        if g.read_replica is None:
+            return view(*args, **kwargs)
+        try:
+            response = view(*args, **kwargs)
+        except DBAPIError as e:
+            print(f"Read replica query failed, retrying on primary: {str(e)}")
+            mark_replica_down()
+            current_app.extensions['sqlalchemy'].session.rollback()
+            g.read_replica = None
+            return view(*args, **kwargs)
+        if getattr(response, 'is_streamed', False):
+            g.read_replica = None
+        return response
+    return decorated_function
+
+
+# ---------------------------------------------------------------------------
+# Read-your-writes
+# ---------------------------------------------------------------------------
+
+@event.listens_for(Session, 'after_flush')
+def _stop_replica_reads(session, flush_context):
+    # Anything read after a write in the same request must see it
+    session.info['wrote'] = True
+    if has_app_context():
+        g.pop('read_replica', None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _remember_write(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        now = time.time()
+        flask_session['_last_write'] = now
+        user_id = _user_id()
+        if user_id is not None:
+            _last_writes[user_id] = now
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_write(session):
+    session.info.pop('wrote', None)
@@ -0,0 +1,101 @@
+"""
+Expense receipts for Smart Billing System
+Uploads are streamed to disk in chunks under their SHA-256, so the same
+receipt is stored once; thumbnails and compressed copies are made on a
+background thread and every file is served with immutable cache headers
+"""
+
+import os
+from flask import current_app
+from models import Expense
+from utils.uploads import remove_files, store_upload, submit
+
+# Optional: without Pillow receipts are stored and served, just not resized
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+ALLOWED_TYPES = ('jpg', 'png', 'gif', 'webp', 'pdf')
+IMAGE_EXTENSIONS = {'jpg', 'png', 'gif', 'webp'}
+
+# variant name -> (longest side in pixels, JPEG quality)
+VARIANTS = {
+    'thumb': (300, 80),
+    'large': (1600, 82)
+}
+
+
+def receipt_folder():
+    """Directory holding receipt files and their variants"""
+    folder = current_app.config.get('RECEIPT_FOLDER') or os.path.join(current_app.instance_path, 'receipts')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def is_image(receipt_path):
+    return (receipt_path or '').rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS
+
+
+def variant_name(receipt_path, variant):
+    """Relative path of a resized copy: ab/<hash>_thumb.jpg"""
+    return f"{receipt_path.rsplit('.', 1)[0]}_{variant}.jpg"
+
+
+def store_receipt(file, max_bytes=None):
+    """Save an uploaded receipt and return its relative path (ab/<sha256>.<ext>)
+
+    Identical receipts are stored once. Raises ValueError for unsupported or
+    oversized files.
+    """
+    max_bytes = max_bytes or current_app.config.get('RECEIPT_MAX_MB', 15) * 1024 * 1024
+    return store_upload(file, receipt_folder(), max_bytes, ALLOWED_TYPES)
+
+
+def release_receipt(receipt_path):
+    """Delete a receipt and its variants once no expense refers to it (call after commit)"""
+    if not receipt_path or Expense.query.filter_by(receipt_path=receipt_path).first() is not None:
+        return
+    remove_files(receipt_folder(), [receipt_path] + [variant_name(receipt_path, variant) for variant in VARIANTS])
+
+
+# ---------------------------------------------------------------------------
+# Thumbnails and compressed copies (background thread)
+# ---------------------------------------------------------------------------
+
+def queue_variants(receipt_path):
+    """Make the resized copies of an image receipt off the request thread"""
+    if not PIL_AVAILABLE or not is_image(receipt_path):
+        return None
+    return submit(make_variants, receipt_folder(), receipt_path)
+
+
+def make_variants(folder, receipt_path):
+    """Write each missing variant as a JPEG; returns the variants written
+
+    JPEGs are decoded at a reduced scale (Image.draft), so a large phone
+    photo is never held in memory at full resolution.
+    """
+    source = os.path.join(folder, receipt_path)
+    written = []
+    if not os.path.exists(source):
+        return written  # released before the job ran
+    for variant, (size, quality) in VARIANTS.items():
+        target = os.path.join(folder, variant_name(receipt_path, variant))
+        if os.path.exists(target):
+            continue
+        try:
+            with Image.open(source) as image:
+                image.draft('RGB', (size, size))
+                image = ImageOps.exif_transpose(image)
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
+                image.thumbnail((size, size), Image.LANCZOS)
+                temp_path = f'{target}.tmp'
+                image.save(temp_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+                os.replace(temp_path, target)
+                written.append(variant)
+        except Exception as e:
+            print(f"Receipt variant {variant} for {receipt_path} failed: {str(e)}")
+    return written
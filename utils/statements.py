@@ -0,0 +1,110 @@
+"""
+Prebuilt statements for Smart Billing System
+The query shapes every request runs (primary-key lookups, per-user counts
+and the dashboard aggregates) are built once, at import, with bind
+parameters. Calls pass only the values: nothing is rebuilt through the
+Query API and the compiled form comes straight from the engine's cache.
+"""
+
+from flask import abort
+from sqlalchemy import bindparam, func, select
+from models import db, Bill, Customer, Expense, ExportJob, User, WorkEntry
+
+OPEN_WORK_STATUSES = ('pending', 'in_progress')
+
+# name -> statement; names ending in '/owner' take an :owner parameter
+STATEMENTS = {}
+
+
+def register(name, statement, owner=None):
+    """Add a statement, plus '<name>/owner' restricted to rows where `owner` = :owner"""
+    STATEMENTS[name] = statement
+    if owner is not None:
+        STATEMENTS[f'{name}/owner'] = statement.where(owner == bindparam('owner'))
+
+
+def execute(name, owner=None, **params):
+    """Run a registered statement; with `owner`, its per-owner variant"""
+    if owner is not None:
+        name, params['owner'] = f'{name}/owner', owner
+    return db.session.execute(STATEMENTS[name], params)
+
+
+def scalar(name, owner=None, **params):
+    return execute(name, owner, **params).scalar()
+
+
+def objects(name, owner=None, **params):
+    return execute(name, owner, **params).scalars().all()
+
+
+# ---------------------------------------------------------------------------
+# Primary-key lookups
+# ---------------------------------------------------------------------------
+
+_LOOKUPS = {model: f'{model.__tablename__}_by_id'
+            for model in (Bill, Customer, Expense, ExportJob, User, WorkEntry)}
+for _model, _name in _LOOKUPS.items():
+    register(_name, select(_model).where(_model.id == bindparam('ident')))
+
+
+def lookup(model, ident):
+    """The row with this primary key, or None, through the model's prebuilt lookup"""
+    return execute(_LOOKUPS[model], ident=ident).scalar_one_or_none()
+
+
+def get_or_404(model, ident):
+    """model.query.get_or_404(ident) through the model's prebuilt lookup"""
+    instance = lookup(model, ident)
+    if instance is None:
+        abort(404)
+    return instance
+
+
+# ---------------------------------------------------------------------------
+# Dashboard aggregates (:start/:end bound the current month)
+# ---------------------------------------------------------------------------
+
+def _between(column):
+    return (column >= bindparam('start'), column < bindparam('end'))
+
+
+register('bill_count', select(func.count(Bill.id)), Bill.created_by)
+register('bill_count_between', select(func.count(Bill.id)).where(*_between(Bill.created_at)), Bill.created_by)
+register('paid_revenue', select(func.sum(Bill.total_amount)).where(Bill.status == 'paid'), Bill.created_by)
+register('paid_revenue_between', select(func.sum(Bill.total_amount)).where(
+    Bill.status == 'paid', *_between(Bill.created_at)
+), Bill.created_by)
+register('bill_remaining', select(func.sum(Bill.remaining_amount)), Bill.created_by)
+register('bill_remaining_between', select(func.sum(Bill.remaining_amount)).where(
+    *_between(Bill.created_at)
+), Bill.created_by)
+register('bill_pending', select(func.sum(Bill.remaining_amount)).where(Bill.remaining_amount > 0), Bill.created_by)
+register('recent_bills', select(Bill).order_by(Bill.created_at.desc()).limit(5), Bill.created_by)
+
+register('expense_total', select(func.sum(Expense.amount)), Expense.created_by)
+register('expense_total_between', select(func.sum(Expense.amount)).where(*_between(Expense.date)), Expense.created_by)
+register('recent_expenses', select(Expense).order_by(Expense.date.desc()).limit(5), Expense.created_by)
+
+register('work_count', select(func.count(WorkEntry.id)), WorkEntry.user_id)
+register('work_count_between', select(func.count(WorkEntry.id)).where(
+    *_between(WorkEntry.created_at)
+), WorkEntry.user_id)
+register('work_status_count', select(func.count(WorkEntry.id)).where(
+    WorkEntry.work_status == bindparam('status')
+), WorkEntry.user_id)
+register('work_paid_revenue', select(func.sum(WorkEntry.total_amount)).where(
+    WorkEntry.payment_status == 'paid'
+), WorkEntry.user_id)
+register('work_paid_revenue_between', select(func.sum(WorkEntry.total_amount)).where(
+    WorkEntry.payment_status == 'paid', *_between(WorkEntry.created_at)
+), WorkEntry.user_id)
+register('work_pending', select(func.sum(WorkEntry.remaining_amount)).where(
+    WorkEntry.remaining_amount > 0
+), WorkEntry.user_id)
+register('work_open_today', select(func.count(WorkEntry.id)).where(
+    WorkEntry.work_status.in_(OPEN_WORK_STATUSES), func.date(WorkEntry.created_at) == bindparam('today')
+), WorkEntry.user_id)
+register('recent_work', select(WorkEntry).order_by(WorkEntry.created_at.desc()).limit(5), WorkEntry.user_id)
+
+register('user_count', select(func.count(User.id)))
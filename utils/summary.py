@@ -0,0 +1,136 @@
+"""
+Per-user data summary for Smart Billing System
+Counts and totals for bills, expenses and work entries, computed in the
+database with one grouped query per table sent as a single statement
+(archived bills are counted from their rollups)
+"""
+
+from sqlalchemy import event, select, union_all, literal, cast, null, func, String
+from sqlalchemy.orm import Session
+from models import db, Bill, BillRollup, Expense, WorkEntry
+from utils.cache import TTLCache
+
+# Summaries are cheap to rebuild; the TTL bounds staleness across workers
+_summary_cache = TTLCache(ttl=60)
+
+
+def _empty_section():
+    return {'count': 0, 'total_amount': 0.0, 'remaining_amount': 0.0, 'by_status': {}}
+
+
+def _summary_statement(user_id, snapshot=None):
+    """UNION ALL of one grouped aggregate per table"""
+    bills = select(
+        literal('bills').label('section'),
+        Bill.status.label('status'),
+        func.count(Bill.id).label('count'),
+        func.coalesce(func.sum(Bill.total_amount), 0).label('total_amount'),
+        func.coalesce(func.sum(Bill.remaining_amount), 0).label('remaining_amount')
+    ).where(Bill.created_by == user_id)
+
+    expenses = select(
+        literal('expenses'),
+        cast(null(), String),
+        func.count(Expense.id),
+        func.coalesce(func.sum(Expense.amount), 0),
+        literal(0.0)
+    ).where(Expense.created_by == user_id)
+
+    work = select(
+        literal('work'),
+        WorkEntry.work_status,
+        func.count(WorkEntry.id),
+        func.coalesce(func.sum(WorkEntry.total_amount), 0),
+        func.coalesce(func.sum(WorkEntry.remaining_amount), 0)
+    ).where(WorkEntry.user_id == user_id)
+
+    # Archived bills are all paid and older than any snapshot, so the rollups always count
+    archived = select(
+        literal('bills'),
+        literal('paid'),
+        func.coalesce(func.sum(BillRollup.bill_count), 0),
+        func.coalesce(func.sum(BillRollup.total_amount), 0),
+        func.coalesce(func.sum(BillRollup.remaining_amount), 0)
+    ).where(BillRollup.created_by == user_id).having(func.count(BillRollup.id) > 0)
+
+    if snapshot:
+        bills = bills.where(Bill.id <= snapshot['bill'])
+        expenses = expenses.where(Expense.id <= snapshot['expense'])
+        work = work.where(WorkEntry.id <= snapshot['work_entry'])
+
+    return union_all(
+        bills.group_by(Bill.status),
+        archived,
+        expenses,
+        work.group_by(WorkEntry.work_status)
+    )
+
+
+def _build_summary(user_id, snapshot=None):
+    summary = {
+        'bills': _empty_section(),
+        'expenses': _empty_section(),
+        'work': _empty_section()
+    }
+
+    for section, status, count, total_amount, remaining_amount in db.session.execute(
+        _summary_statement(user_id, snapshot)
+    ):
+        data = summary[section]
+        data['count'] += count
+        data['total_amount'] += float(total_amount or 0)
+        data['remaining_amount'] += float(remaining_amount or 0)
+        if status is not None:
+            by_status = data['by_status'].setdefault(status, {'count': 0, 'total_amount': 0.0})
+            by_status['count'] += count
+            by_status['total_amount'] += float(total_amount or 0)
+
+    summary['bills']['paid_amount'] = summary['bills']['by_status'].get('paid', {}).get('total_amount', 0.0)
+    summary['total_records'] = sum(summary[section]['count'] for section in ('bills', 'expenses', 'work'))
+    summary['net_profit'] = summary['bills']['total_amount'] - summary['expenses']['total_amount']
+    return summary
+
+
+def get_user_summary(user_id, snapshot=None):
+    """Counts and totals of a user's bills, expenses and work entries
+
+    Results are cached per process; snapshot summaries (used by background
+    exports) are always computed fresh.
+    """
+    if snapshot:
+        return _build_summary(user_id, snapshot)
+    return _summary_cache.get_or_set(user_id, lambda: _build_summary(user_id))
+
+
+def invalidate_user_summary(user_id):
+    _summary_cache.invalidate(user_id)
+
+
+# Invalidate on commit for every user whose bills, expenses or work entries changed
+
+def _owner_id(instance):
+    if isinstance(instance, (Bill, Expense)):
+        return instance.created_by
+    if isinstance(instance, WorkEntry):
+        return instance.user_id
+    return None
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_summary_owners(session, flush_context):
+    owners = session.info.setdefault('summary_owners', set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        owner_id = _owner_id(instance)
+        if owner_id is not None:
+            owners.add(owner_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_summary_owners(session):
+    for owner_id in session.info.pop('summary_owners', ()):
+        invalidate_user_summary(owner_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_summary_owners(session):
+    session.info.pop('summary_owners', None)
@@ -0,0 +1,132 @@
+"""
+Uploaded file storage for Smart Billing System
+Files are streamed to disk in chunks and named after their SHA-256, so an
+identical upload is stored once and a URL always refers to the same bytes;
+image processing runs on a small background thread pool
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, send_from_directory
+
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes -> stored extension
+SIGNATURES = [
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'%PDF-', 'pdf')
+]
+
+# Browsers may keep content-addressed files for a year without revalidating
+IMMUTABLE_MAX_AGE = 31536000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def detect_extension(head):
+    """File type from its first bytes, or None"""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    for signature, extension in SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+def store_upload(file, folder, max_bytes, allowed, shard=True):
+    """Save an uploaded file under its content hash; returns the path relative to `folder`
+
+    The upload is copied in CHUNK_SIZE pieces into a temporary file while it
+    is hashed, then renamed to <sha256>.<ext> (inside a two-character
+    subdirectory when `shard` is set); a file that is already stored is
+    reused. Raises ValueError when the type is not in `allowed` or the file
+    is empty or larger than `max_bytes`.
+    """
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    extension = None
+
+    handle, temp_path = tempfile.mkstemp(dir=folder, suffix='.upload')
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if extension is None:
+                    extension = detect_extension(chunk[:16])
+                    if extension not in allowed:
+                        raise ValueError(f"Only {', '.join(name.upper() for name in allowed)} files are allowed")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f'Files can be at most {max_bytes // (1024 * 1024)} MB')
+                digest.update(chunk)
+                output.write(chunk)
+        if extension is None:
+            raise ValueError('The uploaded file is empty')
+
+        name = digest.hexdigest()
+        relative = f'{name[:2]}/{name}.{extension}' if shard else f'{name}.{extension}'
+        target = os.path.join(folder, relative)
+        if os.path.exists(target):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(temp_path, target)
+        return relative
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def remove_files(folder, relatives):
+    """Delete files under `folder`, ignoring ones that are already gone"""
+    for relative in relatives:
+        try:
+            os.remove(os.path.join(folder, relative))
+        except OSError:
+            pass
+
+
+def send_upload(folder, filename, immutable=True, private=True):
+    """Serve a stored file with ETag/Last-Modified validators
+
+    Content-addressed files are cached for a year as immutable; anything
+    else (e.g. a placeholder while a resized copy is being made) must be
+    revalidated on every use.
+    """
+    response = send_from_directory(folder, filename, max_age=IMMUTABLE_MAX_AGE if immutable else 0,
+                                   conditional=True, etag=True)
+    response.cache_control.private = private
+    response.cache_control.public = not private
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('UPLOAD_WORKERS', 1),
+                    thread_name_prefix='uploads'
+                )
+    return _executor
+
+
+def submit(function, *args):
+    """Run `function(*args)` on the upload thread pool"""
+    return _get_executor().submit(function, *args)
@@ -0,0 +1,101 @@
+"""
+Logged-in user cache for Smart Billing System
+Flask-Login loads the user on every request; the row's columns are kept per
+worker for USER_CACHE_TTL seconds. Committed changes to a user drop the
+local entry and touch a stamp file that all workers on the host compare
+against, so role changes and deactivation apply on the next request.
+"""
+
+import threading
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from models import db, User
+from utils.cache import TTLCache, bump_file_stamp, file_stamp
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTLCache(ttl=current_app.config.get('USER_CACHE_TTL', 30), maxsize=4096)
+    return _cache
+
+
+def _stamp_path():
+    return current_app.config.get('USER_CACHE_STAMP') if has_app_context() else None
+
+
+def current_stamp():
+    """Version of the user table as seen through the stamp file (None when unused)"""
+    return file_stamp(_stamp_path())
+
+
+def bump_stamp():
+    """Tell every worker that cached users are stale"""
+    bump_file_stamp(_stamp_path())
+
+
+def _columns(user):
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+
+def load_cached_user(user_id):
+    """User for Flask-Login, or None when it does not exist or is deactivated
+
+    On a cache hit no SQL is run: the cached columns are merged into the
+    request's session as an unmodified row, so the user can still be edited
+    and its relationships load as usual.
+    """
+    user_id = int(user_id)
+    if not current_app.config.get('USER_CACHE_TTL', 30):
+        user = db.session.get(User, user_id)
+        return user if user is not None and user.is_active else None
+
+    cache = _get_cache()
+    stamp = current_stamp()
+    entry = cache.get(user_id)
+    if entry is not None and entry[0] == stamp:
+        columns = entry[1]
+        if not columns['is_active']:
+            return None
+        cached = User(**columns)
+        make_transient_to_detached(cached)
+        return db.session.merge(cached, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        cache.invalidate(user_id)
+        return None
+    cache.set(user_id, (stamp, _columns(user)))
+    return user if user.is_active else None
+
+
+# ---------------------------------------------------------------------------
+# Invalidation on commit
+# ---------------------------------------------------------------------------
+
+@event.listens_for(Session, 'after_flush')
+def _track_user_changes(session, flush_context):
+    for instance in list(session.dirty) + list(session.deleted):
+        if isinstance(instance, User) and (instance in session.deleted or session.is_modified(instance)):
+            session.info.setdefault('changed_users', set()).add(instance.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    changed = session.info.pop('changed_users', None)
+    if changed:
+        if _cache is not None:
+            for user_id in changed:
+                _cache.invalidate(user_id)
+        bump_stamp()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_user_changes(session):
+    session.info.pop('changed_users', None)
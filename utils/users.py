@@ -0,0 +1,66 @@
+"""
+User directory for Smart Billing System
+Per-user activity for a page of the admin user list, from one grouped query
+per table over the page's user ids
+"""
+
+from sqlalchemy import case, func
+from models import db, Bill, BillRollup, Expense, WorkEntry
+
+OPEN_WORK_STATUSES = ('pending', 'in_progress')
+
+
+def user_activity(user_ids):
+    """Per user: bill count, paid revenue, open work entries and last activity
+
+    Each aggregate is read from a (user, ...) composite index, so a page
+    costs three indexed queries whatever the size of the other tables.
+    """
+    activity = {user_id: {
+        'bills': 0, 'revenue': 0.0, 'work_entries': 0, 'open_work': 0, 'last_activity': None
+    } for user_id in user_ids}
+    if not activity:
+        return activity
+
+    def seen(data, last):
+        if last and (data['last_activity'] is None or last > data['last_activity']):
+            data['last_activity'] = last
+
+    bill_rows = db.session.query(
+        Bill.created_by, func.count(Bill.id),
+        func.coalesce(func.sum(case((Bill.status == 'paid', Bill.total_amount), else_=0)), 0),
+        func.max(Bill.created_at)
+    ).filter(Bill.created_by.in_(user_ids)).group_by(Bill.created_by)
+    for user_id, count, revenue, last in bill_rows:
+        data = activity[user_id]
+        data.update(bills=count, revenue=float(revenue))
+        seen(data, last)
+
+    # Archived bills: all paid, counted from their per-day rollups
+    archived_rows = db.session.query(
+        BillRollup.created_by, func.sum(BillRollup.bill_count),
+        func.coalesce(func.sum(BillRollup.total_amount), 0), func.max(BillRollup.last_created_at)
+    ).filter(BillRollup.created_by.in_(user_ids)).group_by(BillRollup.created_by)
+    for user_id, count, revenue, last in archived_rows:
+        data = activity[user_id]
+        data['bills'] += int(count or 0)
+        data['revenue'] += float(revenue)
+        seen(data, last)
+
+    work_rows = db.session.query(
+        WorkEntry.user_id, func.count(WorkEntry.id),
+        func.coalesce(func.sum(case((WorkEntry.work_status.in_(OPEN_WORK_STATUSES), 1), else_=0)), 0),
+        func.max(WorkEntry.start_time)
+    ).filter(WorkEntry.user_id.in_(user_ids)).group_by(WorkEntry.user_id)
+    for user_id, count, open_work, last in work_rows:
+        data = activity[user_id]
+        data.update(work_entries=count, open_work=int(open_work))
+        seen(data, last)
+
+    expense_rows = db.session.query(
+        Expense.created_by, func.max(Expense.date)
+    ).filter(Expense.created_by.in_(user_ids)).group_by(Expense.created_by)
+    for user_id, last in expense_rows:
+        seen(activity[user_id], last)
+
+    return activity
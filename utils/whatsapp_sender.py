@@ -1,21 +1,30 @@
 import os
 from datetime import datetime, timedelta
 
-# Try to import pywhatkit, but make it optional for deployment
-try:
-    import pywhatkit as pwk
-    PYWHATKIT_AVAILABLE = True
-except (ImportError, KeyError) as e:
-    # KeyError occurs when DISPLAY environment variable is missing (headless servers)
-    PYWHATKIT_AVAILABLE = False
-    pwk = None
 from flask import current_app
 
+# pywhatkit is optional for deployment. Importing it probes the display and the
+# network, so it is loaded on first use instead of when the app starts.
+_pywhatkit = None
+
+def load_pywhatkit():
+    """The pywhatkit module, or None when it is not installed or cannot run here"""
+    global _pywhatkit
+    if _pywhatkit is None:
+        try:
+            import pywhatkit
+            _pywhatkit = pywhatkit
+        except (ImportError, KeyError):
+            # KeyError occurs when DISPLAY environment variable is missing (headless servers)
+            _pywhatkit = False
+    return _pywhatkit or None
+
 def send_whatsapp_message(bill, pdf_path=None):
     """Send WhatsApp message with bill details"""
 
     # Check if WhatsApp functionality is available
-    if not PYWHATKIT_AVAILABLE:
+    pwk = load_pywhatkit()
+    if pwk is None:
         raise ValueError("WhatsApp functionality is not available in this environment (pywhatkit not installed or no display)")
 
     # Validate WhatsApp number
@@ -112,6 +121,10 @@ def send_whatsapp_notification(phone_number, message):
         phone_number = '+91' + phone_number.lstrip('0')
     
     try:
+        pwk = load_pywhatkit()
+        if pwk is None:
+            raise ValueError("pywhatkit not installed or no display")
+
         now = datetime.now()
         send_time = now + timedelta(minutes=1)
         
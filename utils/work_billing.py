@@ -0,0 +1,219 @@
+"""
+Work entry invoicing for Smart Billing System
+Turns completed, unbilled work entries into one bill per customer,
+with bulk INSERTs and UPDATEs in a single transaction, and links each entry
+to its bill so it can never be billed twice
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import case, func
+from models import db, normalize_phone, Bill, BillItem, Customer, WorkEntry
+from utils.bill_archive import last_bill_id
+from utils.customers import resolve_customer_ids
+from utils.summary import invalidate_user_summary
+
+BILLABLE_STATUSES = ('completed', 'delivered')
+
+CHUNK_SIZE = 500
+
+
+class AlreadyBilledError(Exception):
+    """Some selected entries were billed by another request in the meantime"""
+
+
+def unbilled_entries_query(user_id, customer_phone='', start_date=None, end_date=None):
+    """Completed or delivered entries of a user that are not on a bill yet"""
+    query = WorkEntry.query.filter(
+        WorkEntry.user_id == user_id,
+        WorkEntry.work_status.in_(BILLABLE_STATUSES),
+        WorkEntry.bill_id.is_(None)
+    )
+
+    if customer_phone:
+        customer_ids = db.session.query(Customer.id).filter(
+            Customer.phone_normalized == normalize_phone(customer_phone)
+        )
+        query = query.filter(WorkEntry.customer_id.in_(customer_ids))
+
+    if start_date:
+        query = query.filter(WorkEntry.start_time >= datetime.strptime(start_date, '%Y-%m-%d'))
+
+    if end_date:
+        # Include the whole end day
+        query = query.filter(WorkEntry.start_time < datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1))
+
+    return query
+
+
+def unbillable_entries(query):
+    """Entries in `query` that cannot be billed: no customer and no usable phone to find one
+
+    Returns [{'id', 'customer_name', 'customer_phone'}]; the preview leaves
+    them out and bill_unbilled_work() skips them, so both agree.
+    """
+    return [
+        {'id': entry.id, 'customer_name': entry.customer_name, 'customer_phone': entry.customer_phone}
+        for entry in query.filter(WorkEntry.customer_id.is_(None)).with_entities(
+            WorkEntry.id, WorkEntry.customer_name, WorkEntry.customer_phone
+        ).order_by(WorkEntry.id)
+        if not normalize_phone(entry.customer_phone)
+    ]
+
+
+def billable_query(query, skipped):
+    """`query` without the entries listed by unbillable_entries()"""
+    ids = [entry['id'] for entry in skipped]
+    return query.filter(WorkEntry.id.notin_(ids)) if ids else query
+
+
+def preview_unbilled(query):
+    """Per customer: name, phone, entry count, total, paid and remaining amounts
+
+    Pass billable_query(query, unbillable_entries(query)) so the preview
+    matches the bills bill_unbilled_work() creates.
+    """
+    # Unlinked entries are grouped by phone here, then by normalized phone below
+    unlinked_phone = case((WorkEntry.customer_id.is_(None), WorkEntry.customer_phone))
+    rows = query.outerjoin(Customer, WorkEntry.customer_id == Customer.id).with_entities(
+        WorkEntry.customer_id,
+        func.coalesce(func.max(Customer.phone), func.max(WorkEntry.customer_phone)).label('customer_phone'),
+        func.coalesce(func.max(Customer.name), func.max(WorkEntry.customer_name)).label('customer_name'),
+        func.count(WorkEntry.id).label('entries'),
+        func.coalesce(func.sum(WorkEntry.total_amount), 0).label('total_amount'),
+        func.coalesce(func.sum(WorkEntry.advance_amount), 0).label('paid_amount')
+    ).group_by(WorkEntry.customer_id, unlinked_phone).order_by(WorkEntry.customer_id.is_(None)).all()
+
+    # Same grouping as bill_unbilled_work: unlinked entries join the oldest
+    # customer with their normalized phone, or one new customer per phone
+    phones = {normalize_phone(row.customer_phone) for row in rows if row.customer_id is None}
+    existing = {}
+    if phones:
+        for customer_id, phone in db.session.query(Customer.id, Customer.phone_normalized).filter(
+            Customer.phone_normalized.in_(phones)
+        ).order_by(Customer.id.desc()):
+            existing[phone] = customer_id
+
+    groups = {}
+    for row in rows:
+        key = row.customer_id
+        if key is None:
+            phone = normalize_phone(row.customer_phone)
+            key = existing.get(phone, ('new', phone))
+        group = groups.setdefault(key, {
+            'customer_phone': row.customer_phone, 'customer_name': row.customer_name,
+            'entries': 0, 'total_amount': 0.0, 'paid_amount': 0.0
+        })
+        group['entries'] += row.entries
+        group['total_amount'] += float(row.total_amount)
+        group['paid_amount'] += float(row.paid_amount)
+
+    customers = sorted(groups.values(), key=lambda group: group['customer_name'] or '')
+    for group in customers:
+        group['remaining_amount'] = max(0.0, group['total_amount'] - group['paid_amount'])
+    return customers
+
+
+def _item_description(entry):
+    description = f"{(entry.service_type or 'general').replace('_', ' ').title()} - {entry.project_name}"
+    if entry.start_time:
+        description += f" ({entry.start_time.strftime('%d %b %Y')})"
+    if entry.duration_minutes:
+        description += f" {entry.duration_minutes // 60}h {entry.duration_minutes % 60}m"
+    return description[:200]
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def bill_unbilled_work(user_id, query):
+    """Create one bill per customer for the entries in `query`
+
+    Everything happens in one transaction: customers, bills and items are
+    bulk inserted and the entries are linked with guarded UPDATEs. Returns
+    a list of {'bill_id', 'bill_number', 'customer_id', 'customer_phone',
+    'entries', 'total_amount'}; raises AlreadyBilledError (after rolling back) when
+    another request billed some of the entries first. Entries without a
+    customer or usable phone are left unbilled; list them with
+    unbillable_entries() to tell the user.
+    """
+    entries = query.with_entities(
+        WorkEntry.id, WorkEntry.customer_id, WorkEntry.customer_name, WorkEntry.customer_phone,
+        WorkEntry.service_type, WorkEntry.project_name, WorkEntry.start_time,
+        WorkEntry.duration_minutes, WorkEntry.total_amount, WorkEntry.advance_amount
+    ).order_by(WorkEntry.customer_id, WorkEntry.start_time).with_for_update().all()
+    if not entries:
+        return []
+
+    try:
+        # Entries not linked to a customer yet are matched on their normalized phone
+        unlinked = {}
+        for entry in entries:
+            if entry.customer_id is None:
+                unlinked.setdefault(normalize_phone(entry.customer_phone), entry.customer_name)
+        phone_customers = resolve_customer_ids(unlinked)
+
+        groups = {}
+        for entry in entries:
+            customer_id = entry.customer_id or phone_customers.get(normalize_phone(entry.customer_phone))
+            if customer_id is not None:
+                groups.setdefault(customer_id, []).append(entry)
+        if not groups:
+            return []  # only entries without a usable phone (see unbillable_entries)
+
+        # Numbers continue the INV-<next id> sequence used by billing.create
+        last_id = last_bill_id()
+        now = datetime.utcnow()
+        bills = []
+        for offset, (customer_id, group) in enumerate(groups.items(), start=1):
+            subtotal = sum(entry.total_amount or 0 for entry in group)
+            paid = sum(entry.advance_amount or 0 for entry in group)
+            remaining = max(0, subtotal - paid)
+            bills.append({
+                'bill_number': f'INV-{last_id + offset:06d}', 'customer_id': customer_id,
+                'created_by': user_id, 'subtotal': subtotal, 'tax_rate': 0.0, 'tax_amount': 0.0,
+                'discount': 0.0, 'total_amount': subtotal, 'advance_amount': paid,
+                'remaining_amount': remaining, 'status': 'paid' if remaining == 0 else 'draft',
+                'created_at': now, 'due_date': None, 'paid_date': now if remaining == 0 else None,
+                'email_sent': False, 'whatsapp_sent': False,
+                'notes': f'Work entries billed on {now.strftime("%d %b %Y")}'
+            })
+        db.session.execute(Bill.__table__.insert(), bills)
+
+        bill_ids = dict(db.session.query(Bill.bill_number, Bill.id).filter(
+            Bill.bill_number.in_([bill['bill_number'] for bill in bills])
+        ))
+
+        items = []
+        created = []
+        for bill, (customer_id, group) in zip(bills, groups.items()):
+            bill_id = bill_ids[bill['bill_number']]
+            items.extend({
+                'bill_id': bill_id, 'description': _item_description(entry), 'quantity': 1.0,
+                'rate': entry.total_amount or 0, 'total': entry.total_amount or 0
+            } for entry in group)
+
+            # Guarded link: entries billed concurrently are not matched, which aborts the batch
+            linked = 0
+            for chunk in _chunks([entry.id for entry in group]):
+                linked += WorkEntry.query.filter(
+                    WorkEntry.id.in_(chunk), WorkEntry.bill_id.is_(None)
+                ).update({'bill_id': bill_id, 'customer_id': customer_id}, synchronize_session=False)
+            if linked != len(group):
+                raise AlreadyBilledError('Some work entries were billed by another request')
+
+            created.append({
+                'bill_id': bill_id, 'bill_number': bill['bill_number'], 'customer_id': customer_id,
+                'customer_phone': normalize_phone(group[0].customer_phone),
+                'entries': len(group), 'total_amount': bill['total_amount']
+            })
+        db.session.execute(BillItem.__table__.insert(), items)
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    invalidate_user_summary(user_id)
+    return created
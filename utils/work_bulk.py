@@ -0,0 +1,189 @@
+"""
+Set-based work entry updates for Smart Billing System
+SQL versions of WorkEntry.calculate_duration() and the payment rules, and
+bulk status/payment operations that update many entries with a handful of
+UPDATE statements instead of one request and commit per entry
+"""
+
+from datetime import datetime
+from sqlalchemy import case, cast, func, literal, Integer
+from models import db, WorkEntry
+from utils.summary import invalidate_user_summary
+from utils.work_events import publish_entries
+
+VALID_WORK_STATUSES = ['pending', 'in_progress', 'completed', 'delivered']
+FINISHED_STATUSES = ('completed', 'delivered')
+
+BULK_OPERATIONS = ('stop', 'work_status', 'payment', 'mark_paid')
+
+MAX_BULK_IDS = 5000
+
+
+# ---------------------------------------------------------------------------
+# SQL versions of WorkEntry.calculate_duration()
+# ---------------------------------------------------------------------------
+
+def duration_minutes_expr(start, end):
+    """Whole minutes between two timestamps, truncated like calculate_duration"""
+    if db.engine.dialect.name == 'postgresql':
+        return cast(func.floor(func.extract('epoch', end - start) / 60), Integer)
+    # julianday() is a float; the epsilon keeps exact minutes from rounding down
+    return cast((func.julianday(end) - func.julianday(start)) * 1440 + 0.00001, Integer)
+
+
+def payment_values(total_amount, paid_amount=None):
+    """remaining_amount and payment_status expressions for a given total and paid amount"""
+    if paid_amount is None:
+        paid_amount = func.coalesce(WorkEntry.advance_amount, 0)
+    balance = total_amount - paid_amount
+    remaining = case((balance > 0, balance), else_=literal(0.0))
+    status = case(
+        (balance <= 0, 'paid'),
+        (paid_amount > 0, 'partial'),
+        else_='pending'
+    )
+    return remaining, status
+
+
+def duration_values(end_time):
+    """UPDATE values that stop entries at `end_time` and recompute their amounts"""
+    minutes = duration_minutes_expr(WorkEntry.start_time, end_time)
+    total = minutes / 60.0 * func.coalesce(WorkEntry.hourly_rate, 0)
+    remaining, status = payment_values(total)
+    return {
+        'end_time': end_time,
+        'duration_minutes': minutes,
+        'total_amount': total,
+        'remaining_amount': remaining,
+        'payment_status': status
+    }
+
+
+def after_bulk_update(rows, event_type):
+    """Invalidate summaries and publish live events for rows changed by bulk UPDATEs
+
+    Query.update() skips the session hooks that normally do this.
+    """
+    for user_id in {row.user_id for row in rows}:
+        invalidate_user_summary(user_id)
+    publish_entries([row.id for row in rows], event_type)
+
+
+# ---------------------------------------------------------------------------
+# Bulk operations
+# ---------------------------------------------------------------------------
+
+def _check(operation, value, row):
+    """Why an owned entry cannot take the operation, or None when it can"""
+    if operation == 'stop' and row.work_status != 'in_progress':
+        return 'Timer is not running'
+    if operation == 'payment' and (row.advance_amount or 0) + value > (row.total_amount or 0):
+        return 'Payment amount exceeds total amount'
+    return None
+
+
+def _event_type(operation, value, row):
+    if operation in ('payment', 'mark_paid'):
+        return 'payment_changed'
+    new_status = 'completed' if operation == 'stop' else value
+    if row.work_status == 'in_progress' and new_status != 'in_progress':
+        return 'timer_stopped'
+    if new_status == 'in_progress' and row.work_status != 'in_progress':
+        return 'timer_started'
+    return 'status_changed'
+
+
+def _apply_updates(operation, value, ids, user_id, now):
+    """Run the UPDATE statements for the entries that passed their checks"""
+    base = WorkEntry.query.filter(WorkEntry.id.in_(ids), WorkEntry.user_id == user_id)
+
+    if operation == 'stop':
+        values = duration_values(literal(now, db.DateTime))
+        values['work_status'] = 'completed'
+        base.filter(WorkEntry.work_status == 'in_progress').update(values, synchronize_session=False)
+
+    elif operation == 'work_status':
+        if value in FINISHED_STATUSES:
+            # Same as update_work_status: close entries that have no end time yet
+            values = duration_values(literal(now, db.DateTime))
+            values['work_status'] = value
+            base.filter(WorkEntry.end_time.is_(None)).update(values, synchronize_session=False)
+            base = base.filter(WorkEntry.end_time.isnot(None))
+        base.update({'work_status': value}, synchronize_session=False)
+
+    elif operation == 'payment':
+        paid = func.coalesce(WorkEntry.advance_amount, 0) + value
+        total = func.coalesce(WorkEntry.total_amount, 0)
+        remaining, status = payment_values(total, paid)
+        base.filter(paid <= total).update({
+            'advance_amount': paid,
+            'remaining_amount': remaining,
+            'payment_status': status
+        }, synchronize_session=False)
+
+    elif operation == 'mark_paid':
+        base.update({
+            'advance_amount': func.coalesce(WorkEntry.total_amount, 0),
+            'remaining_amount': 0.0,
+            'payment_status': 'paid'
+        }, synchronize_session=False)
+
+
+def apply_bulk_operation(user_id, entry_ids, operation, value=None, now=None):
+    """Apply one operation to many of a user's entries; returns per-id results
+
+    Ownership and eligibility are checked with a single query, the changes
+    are made with set-based UPDATEs and committed together. Raises
+    ValueError for an unknown operation or invalid value.
+    """
+    if operation not in BULK_OPERATIONS:
+        raise ValueError('Invalid operation')
+    if operation == 'work_status' and value not in VALID_WORK_STATUSES:
+        raise ValueError('Invalid work status')
+    if operation == 'payment':
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid payment amount')
+        if value < 0:
+            raise ValueError('Payment amount cannot be negative')
+
+    entry_ids = list(dict.fromkeys(entry_ids))
+    if len(entry_ids) > MAX_BULK_IDS:
+        raise ValueError(f'At most {MAX_BULK_IDS} entries can be updated at once')
+
+    now = now or datetime.utcnow()
+    rows = {
+        row.id: row for row in db.session.query(
+            WorkEntry.id, WorkEntry.user_id, WorkEntry.work_status,
+            WorkEntry.total_amount, WorkEntry.advance_amount
+        ).filter(WorkEntry.id.in_(entry_ids))
+    }
+
+    results = []
+    eligible = []
+    for entry_id in entry_ids:
+        row = rows.get(entry_id)
+        if row is None:
+            message = 'Work entry not found'
+        elif row.user_id != user_id:
+            message = 'Permission denied'
+        else:
+            message = _check(operation, value, row)
+        if message:
+            results.append({'id': entry_id, 'success': False, 'message': message})
+        else:
+            eligible.append(row)
+            results.append({'id': entry_id, 'success': True, 'message': 'Updated'})
+
+    if eligible:
+        _apply_updates(operation, value, [row.id for row in eligible], user_id, now)
+        db.session.commit()
+
+        by_event = {}
+        for row in eligible:
+            by_event.setdefault(_event_type(operation, value, row), []).append(row)
+        for event_type, event_rows in by_event.items():
+            after_bulk_update(event_rows, event_type)
+
+    return results
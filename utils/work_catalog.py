@@ -0,0 +1,192 @@
+"""
+Work catalog for Smart Billing System
+Maintains a per-user index of project names and service types (with usage
+counts and last-used timestamps) so filter dropdowns never scan WorkEntry.
+Name lists are cached per worker and checked against WORK_CATALOG_STAMP, which
+every commit that changes the catalog replaces.
+"""
+
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from models import db, WorkEntry, WorkCatalogItem
+from utils.cache import TTLCache, bump_file_stamp, file_stamp
+
+# catalog kind -> WorkEntry attribute it indexes
+CATALOG_KINDS = {
+    'project': 'project_name',
+    'service': 'service_type'
+}
+
+# Above this many names a dropdown is replaced by an autocomplete field
+AUTOCOMPLETE_THRESHOLD = 200
+
+_catalog_cache = TTLCache(ttl=300)
+
+
+def _load_names(user_id, kind):
+    # Read only: entries from before the catalog are counted by migration 0008
+    return [row[0] for row in db.session.query(WorkCatalogItem.name).filter(
+        WorkCatalogItem.user_id == user_id,
+        WorkCatalogItem.kind == kind,
+        WorkCatalogItem.entry_count > 0
+    ).order_by(WorkCatalogItem.name)]
+
+
+def _stamp_path():
+    return current_app.config.get('WORK_CATALOG_STAMP') if has_app_context() else None
+
+
+def catalog_names(user_id, kind='project'):
+    """All names of one kind for a user, alphabetically (cached per process)"""
+    stamp = file_stamp(_stamp_path())
+    entry = _catalog_cache.get((user_id, kind))
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    names = _load_names(user_id, kind)
+    _catalog_cache.set((user_id, kind), (stamp, names))
+    return names
+
+
+def catalog_choices(user_id, kind='project'):
+    """Dropdown options, or an autocomplete marker once the list gets too long"""
+    names = catalog_names(user_id, kind)
+    if len(names) > AUTOCOMPLETE_THRESHOLD:
+        return {'autocomplete': True, 'names': [], 'total': len(names)}
+    return {'autocomplete': False, 'names': names, 'total': len(names)}
+
+
+def search_catalog(user_id, kind, term, limit=20):
+    """Names matching `term`, most used and most recent first"""
+    query = WorkCatalogItem.query.filter(
+        WorkCatalogItem.user_id == user_id,
+        WorkCatalogItem.kind == kind,
+        WorkCatalogItem.entry_count > 0
+    )
+    if term:
+        # % and _ in the term are literal characters, not wildcards
+        query = query.filter(func.lower(WorkCatalogItem.name).contains(term.lower(), autoescape=True))
+    return query.order_by(
+        WorkCatalogItem.entry_count.desc(),
+        WorkCatalogItem.last_used_at.desc()
+    ).limit(limit).all()
+
+
+def rebuild_catalog(user_id=None):
+    """Recompute catalog rows from WorkEntry with GROUP BY (all users by default)"""
+    delete_query = WorkCatalogItem.query
+    if user_id is not None:
+        delete_query = delete_query.filter_by(user_id=user_id)
+    delete_query.delete(synchronize_session=False)
+
+    for kind, attribute in CATALOG_KINDS.items():
+        column = getattr(WorkEntry, attribute)
+        query = db.session.query(
+            WorkEntry.user_id, column, func.count(WorkEntry.id), func.max(WorkEntry.created_at)
+        ).filter(column.isnot(None)).group_by(WorkEntry.user_id, column)
+        if user_id is not None:
+            query = query.filter(WorkEntry.user_id == user_id)
+
+        rows = [
+            {'user_id': owner_id, 'kind': kind, 'name': name,
+             'entry_count': count, 'last_used_at': last_used or datetime.utcnow()}
+            for owner_id, name, count, last_used in query
+        ]
+        if rows:
+            db.session.execute(WorkCatalogItem.__table__.insert(), rows)
+
+    _catalog_cache.clear()
+    db.session.info['catalog_rebuilt'] = True
+
+
+def invalidate_catalog(user_id):
+    for kind in CATALOG_KINDS:
+        _catalog_cache.invalidate((user_id, kind))
+
+
+# Keep the catalog in step with WorkEntry inserts, edits and deletes.
+# Bulk Query.update()/delete() bypass these hooks; run rebuild_catalog() after them.
+
+def _upsert(connection, user_id, kind, name, delta, now):
+    table = WorkCatalogItem.__table__
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    statement = insert(table).values(
+        user_id=user_id, kind=kind, name=name, entry_count=delta, last_used_at=now
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=['user_id', 'kind', 'name'],
+        set_={
+            'entry_count': table.c.entry_count + delta,
+            'last_used_at': now if delta > 0 else table.c.last_used_at
+        }
+    )
+    connection.execute(statement)
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_work_catalog(session, flush_context):
+    deltas = {}
+
+    def bump(user_id, kind, name, delta):
+        if user_id is not None and name:
+            key = (user_id, kind, name)
+            deltas[key] = deltas.get(key, 0) + delta
+
+    for instance in session.new:
+        if isinstance(instance, WorkEntry):
+            for kind, attribute in CATALOG_KINDS.items():
+                bump(instance.user_id, kind, getattr(instance, attribute), 1)
+
+    for instance in session.deleted:
+        if isinstance(instance, WorkEntry):
+            for kind, attribute in CATALOG_KINDS.items():
+                bump(instance.user_id, kind, getattr(instance, attribute), -1)
+
+    for instance in session.dirty:
+        if isinstance(instance, WorkEntry):
+            for kind, attribute in CATALOG_KINDS.items():
+                history = get_history(instance, attribute)
+                if history.added or history.deleted:
+                    for name in history.deleted:
+                        bump(instance.user_id, kind, name, -1)
+                    for name in history.added:
+                        bump(instance.user_id, kind, name, 1)
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    connection = session.connection()
+    now = datetime.utcnow()
+    for (user_id, kind, name), delta in deltas.items():
+        _upsert(connection, user_id, kind, name, delta, now)
+
+    owners = {user_id for user_id, _, _ in deltas}
+    connection.execute(WorkCatalogItem.__table__.delete().where(
+        WorkCatalogItem.user_id.in_(owners),
+        WorkCatalogItem.entry_count <= 0
+    ))
+    session.info.setdefault('catalog_owners', set()).update(owners)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_work_catalog(session):
+    owners = session.info.pop('catalog_owners', ())
+    rebuilt = session.info.pop('catalog_rebuilt', False)
+    for user_id in owners:
+        invalidate_catalog(user_id)
+    if owners or rebuilt:
+        # Other workers reload their lists on the next read
+        bump_file_stamp(_stamp_path())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_work_catalog(session):
+    session.info.pop('catalog_owners', None)
+    session.info.pop('catalog_rebuilt', None)
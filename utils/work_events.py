@@ -0,0 +1,297 @@
+"""
+Live work entry events for Smart Billing System
+Timer start/stop, status and payment changes are published on commit and
+fanned out to Server-Sent Event streams. Gunicorn workers share events
+through a small SQLite broker file; each worker runs one listener thread
+that relays broker rows to its own subscribers.
+"""
+
+import collections
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from models import db, WorkEntry
+
+EVENT_TYPES = (
+    'timer_started', 'timer_stopped', 'status_changed', 'payment_changed',
+    'entry_created', 'entry_updated', 'entry_deleted'
+)
+
+PAYMENT_FIELDS = ('total_amount', 'advance_amount', 'remaining_amount', 'payment_status')
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+class Subscription:
+    """Queue of events for one open stream"""
+
+    def __init__(self, user_id, cursor, maxsize=100):
+        self.user_id = user_id
+        self.cursor = cursor
+        self.overflowed = False
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # Slow client: tell it to reload instead of silently dropping events
+            self.overflowed = True
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+
+class WorkEventBus:
+    """Per-process fan-out of work entry events, optionally relayed through a broker file"""
+
+    def __init__(self, broker_path=None, poll_interval=0.5, history=256, retention=600):
+        self.broker_path = broker_path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.last_id = 0
+        self._history = collections.deque(maxlen=history)
+        self._subscribers = collections.defaultdict(set)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start_lock = threading.Lock()
+        self._listener_pid = None
+        self._last_prune = 0
+
+        if broker_path:
+            os.makedirs(os.path.dirname(broker_path) or '.', exist_ok=True)
+            connection = self._connection()
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS work_event ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' user_id INTEGER NOT NULL,'
+                ' event_type TEXT NOT NULL,'
+                ' payload TEXT NOT NULL,'
+                ' created_at REAL NOT NULL)'
+            )
+
+    # -- subscribers --------------------------------------------------------
+
+    def subscribe(self, user_id):
+        """Register a stream; only events after this point are delivered live"""
+        self._ensure_listener()
+        with self._lock:
+            subscription = Subscription(user_id, self.last_id)
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def replay(self, user_id, after_id):
+        """Recent events for a reconnecting client; complete=False when some were lost"""
+        with self._lock:
+            history = list(self._history)
+        complete = after_id >= self.last_id or bool(history and history[0]['id'] <= after_id + 1)
+        events = [item for item in history if item['user_id'] == user_id and item['id'] > after_id]
+        return events, complete
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    # -- publishing ---------------------------------------------------------
+
+    def publish(self, user_id, event_type, data):
+        if not self.broker_path:
+            with self._lock:
+                self.last_id += 1
+                event_id = self.last_id
+            self._deliver({'id': event_id, 'user_id': user_id, 'type': event_type, 'data': data})
+            return
+
+        connection = self._connection()
+        connection.execute(
+            'INSERT INTO work_event (user_id, event_type, payload, created_at) VALUES (?, ?, ?, ?)',
+            (user_id, event_type, json.dumps(data), time.time())
+        )
+        # The listener thread delivers it here and in every other worker
+
+    def _deliver(self, item):
+        with self._lock:
+            self.last_id = max(self.last_id, item['id'])
+            self._history.append(item)
+            subscribers = list(self._subscribers.get(item['user_id'], ()))
+        for subscription in subscribers:
+            subscription.put(item)
+
+    # -- broker -------------------------------------------------------------
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.broker_path, timeout=5, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA busy_timeout=5000')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _ensure_listener(self):
+        if not self.broker_path or self._listener_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._listener_pid == os.getpid():
+                return
+            # Load recent history synchronously so new subscribers get a correct cursor
+            connection = self._connection()
+            max_id = connection.execute('SELECT COALESCE(MAX(id), 0) FROM work_event').fetchone()[0]
+            after_id = self._poll(connection, max(0, max_id - self._history.maxlen))
+            threading.Thread(target=self._listen, args=(after_id,), name='work-events', daemon=True).start()
+            self._listener_pid = os.getpid()
+
+    def _poll(self, connection, after_id):
+        rows = connection.execute(
+            'SELECT id, user_id, event_type, payload FROM work_event WHERE id > ? ORDER BY id',
+            (max(after_id, self.last_id),)
+        ).fetchall()
+        for event_id, user_id, event_type, payload in rows:
+            self._deliver({'id': event_id, 'user_id': user_id, 'type': event_type,
+                           'data': json.loads(payload)})
+        return rows[-1][0] if rows else after_id
+
+    def _listen(self, after_id):
+        connection = self._connection()
+        while True:
+            try:
+                after_id = self._poll(connection, after_id)
+                if time.monotonic() - self._last_prune > 60:
+                    self._last_prune = time.monotonic()
+                    connection.execute('DELETE FROM work_event WHERE created_at < ?',
+                                       (time.time() - self.retention,))
+            except Exception as e:
+                # Broker busy or briefly unavailable; try again next tick
+                print(f"Work event listener error: {str(e)}")
+            time.sleep(self.poll_interval)
+
+
+def get_event_bus():
+    """The process-wide bus, configured from the current app on first use"""
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                config = current_app.config
+                _bus = WorkEventBus(
+                    broker_path=config.get('WORK_EVENTS_BROKER'),
+                    poll_interval=config.get('WORK_EVENTS_POLL_INTERVAL', 0.5)
+                )
+    return _bus
+
+
+def format_sse(item):
+    """One Server-Sent Events message"""
+    return f"id: {item['id']}\nevent: {item['type']}\ndata: {json.dumps(item['data'])}\n\n"
+
+
+def entry_state(entry):
+    """JSON-ready state of a work entry as shown by the timer and entry pages"""
+    return {
+        'id': entry.id,
+        'project_name': entry.project_name,
+        'customer_name': entry.customer_name,
+        'work_status': entry.work_status or 'in_progress',
+        'payment_status': entry.payment_status or 'pending',
+        'start_time': entry.start_time.isoformat() if entry.start_time else None,
+        'end_time': entry.end_time.isoformat() if entry.end_time else None,
+        'duration_minutes': entry.duration_minutes,
+        'hourly_rate': entry.hourly_rate or 0,
+        'total_amount': entry.total_amount or 0,
+        'paid_amount': entry.advance_amount or 0,
+        'remaining_amount': entry.remaining_amount or 0
+    }
+
+
+def publish_entries(entry_ids, event_type, chunk_size=500):
+    """Publish the current state of entries changed by bulk UPDATEs (which skip the hooks)"""
+    columns = (
+        WorkEntry.id, WorkEntry.user_id, WorkEntry.project_name, WorkEntry.customer_name,
+        WorkEntry.work_status, WorkEntry.payment_status, WorkEntry.start_time, WorkEntry.end_time,
+        WorkEntry.duration_minutes, WorkEntry.hourly_rate, WorkEntry.total_amount,
+        WorkEntry.advance_amount, WorkEntry.remaining_amount
+    )
+    bus = get_event_bus()
+    for start in range(0, len(entry_ids), chunk_size):
+        rows = db.session.query(*columns).filter(
+            WorkEntry.id.in_(entry_ids[start:start + chunk_size])
+        ).order_by(WorkEntry.id)
+        for row in rows:
+            bus.publish(row.user_id, event_type, entry_state(row))
+
+
+# Collect events while flushing, publish them only once the transaction commits
+
+def _changed(instance, attribute):
+    history = get_history(instance, attribute)
+    return bool(history.added or history.deleted), history
+
+
+def _update_event_type(instance):
+    status_changed, history = _changed(instance, 'work_status')
+    if status_changed:
+        previous = history.deleted[0] if history.deleted else None
+        if previous == 'in_progress':
+            return 'timer_stopped'
+        if instance.work_status == 'in_progress':
+            return 'timer_started'
+        return 'status_changed'
+    if any(_changed(instance, attribute)[0] for attribute in PAYMENT_FIELDS):
+        return 'payment_changed'
+    return 'entry_updated'
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_work_events(session, flush_context):
+    events = session.info.setdefault('work_events', [])
+
+    for instance in session.new:
+        if isinstance(instance, WorkEntry):
+            event_type = 'timer_started' if instance.work_status == 'in_progress' else 'entry_created'
+            events.append((instance.user_id, event_type, entry_state(instance)))
+
+    for instance in session.dirty:
+        if isinstance(instance, WorkEntry) and session.is_modified(instance):
+            events.append((instance.user_id, _update_event_type(instance), entry_state(instance)))
+
+    for instance in session.deleted:
+        if isinstance(instance, WorkEntry):
+            events.append((instance.user_id, 'entry_deleted', {'id': instance.id}))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_work_events(session):
+    events = session.info.pop('work_events', None)
+    if not events:
+        return
+    bus = get_event_bus()
+    for user_id, event_type, data in events:
+        try:
+            bus.publish(user_id, event_type, data)
+        except sqlite3.Error as e:
+            # Live updates are best effort; the data itself is already committed
+            print(f"Work event publish failed: {str(e)}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_work_events(session):
+    session.info.pop('work_events', None)
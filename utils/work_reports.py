@@ -0,0 +1,72 @@
+"""
+Work report aggregation for Smart Billing System
+All totals are computed with SQL GROUP BY so report cost does not grow
+with the number of entries loaded into Python
+"""
+
+from datetime import datetime
+from sqlalchemy import func
+from models import db, WorkEntry
+
+
+def week_start(column):
+    """SQL expression for the Monday of the week containing `column`"""
+    if db.engine.dialect.name == 'postgresql':
+        return func.date(func.date_trunc('week', column))
+    # SQLite: jump to the coming Sunday (or stay on it), then back to Monday
+    return func.date(column, 'weekday 0', '-6 days')
+
+
+def completed_entries_query(user_id, start_date=None, end_date=None, project=''):
+    """Completed work entries of a user, filtered like the reports page"""
+    query = WorkEntry.query.filter_by(work_status='completed', user_id=user_id)
+
+    if start_date:
+        query = query.filter(WorkEntry.start_time >= datetime.strptime(start_date, '%Y-%m-%d'))
+
+    if end_date:
+        query = query.filter(WorkEntry.start_time <= datetime.strptime(end_date, '%Y-%m-%d'))
+
+    if project:
+        query = query.filter(WorkEntry.project_name.contains(project))
+
+    return query
+
+
+def _aggregates():
+    return (
+        func.count(WorkEntry.id).label('entries'),
+        func.coalesce(func.sum(WorkEntry.duration_minutes), 0).label('minutes'),
+        func.coalesce(func.sum(WorkEntry.total_amount), 0).label('amount')
+    )
+
+
+def _stats(row):
+    return {
+        'entries': row.entries,
+        'hours': (row.minutes or 0) / 60,
+        'amount': float(row.amount or 0)
+    }
+
+
+def report_totals(query):
+    """Entry count, hours and amount for the whole filtered query"""
+    row = query.with_entities(*_aggregates()).one()
+    return _stats(row)
+
+
+def grouped_stats(query, key):
+    """Ordered {group: {'entries', 'hours', 'amount'}} for one GROUP BY key"""
+    rows = query.with_entities(key.label('key'), *_aggregates()).group_by(key).order_by(key)
+    return {row.key: _stats(row) for row in rows}
+
+
+def build_work_report(query):
+    """Totals plus project, service type and weekly breakdowns"""
+    week = week_start(WorkEntry.start_time)
+    return {
+        'totals': report_totals(query),
+        'project_stats': grouped_stats(query, WorkEntry.project_name),
+        'service_stats': grouped_stats(query, WorkEntry.service_type),
+        'weekly_stats': grouped_stats(query, week)
+    }
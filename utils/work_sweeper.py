@@ -0,0 +1,195 @@
+"""
+Stale timer sweeper for Smart Billing System
+Auto-stops in_progress timers that were left running past the stop policy
+and keeps duration, amount and payment fields consistent, all with
+set-based UPDATE statements instead of loading entries one by one
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta, time as clock_time
+from sqlalchemy import func, literal, or_
+from models import db, WorkEntry
+from utils.summary import invalidate_user_summary
+from utils.work_bulk import duration_values, payment_values, after_bulk_update
+
+SWEEP_POLICIES = ('closing_time', 'max_hours')
+
+_sweeper_pid = None
+_sweeper_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Stop policy
+# ---------------------------------------------------------------------------
+
+def _closing_cutoff(start_time, closing, utc_offset):
+    """First shop closing (UTC) at or after a timer's start"""
+    local_start = start_time + utc_offset
+    local_close = datetime.combine(local_start.date(), closing)
+    if local_start >= local_close:
+        local_close += timedelta(days=1)
+    return local_close - utc_offset
+
+
+def _policy(config):
+    policy = config.get('WORK_TIMER_POLICY', 'closing_time')
+    if policy not in SWEEP_POLICIES:
+        raise ValueError(f'Unknown work timer policy: {policy}')
+    hour, minute = (int(part) for part in config.get('WORK_CLOSING_TIME', '21:00').split(':'))
+    return {
+        'policy': policy,
+        'closing': clock_time(hour, minute),
+        'utc_offset': timedelta(minutes=config.get('WORK_UTC_OFFSET_MINUTES', 330)),
+        'max_hours': config.get('WORK_TIMER_MAX_HOURS', 12)
+    }
+
+
+def _stale_before(settings, now):
+    """Timers started before this UTC time are past their stop point"""
+    if settings['policy'] == 'max_hours':
+        return now - timedelta(hours=settings['max_hours'])
+    # The latest closing that has already passed
+    cutoff = _closing_cutoff(now, settings['closing'], settings['utc_offset'])
+    return cutoff - timedelta(days=1) if cutoff > now else cutoff
+
+
+def _stale_filter(stale_before):
+    # Served by the (work_status, start_time) index
+    return (WorkEntry.work_status == 'in_progress', WorkEntry.start_time < stale_before)
+
+
+# ---------------------------------------------------------------------------
+# Sweeps
+# ---------------------------------------------------------------------------
+
+def sweep_stale_timers(config, now=None):
+    """Stop every timer left running past the policy; returns the stopped ids"""
+    settings = _policy(config)
+    now = now or datetime.utcnow()
+    stale = _stale_filter(_stale_before(settings, now))
+
+    # Only ids, owners and start times are read, straight from the index
+    rows = db.session.query(WorkEntry.id, WorkEntry.user_id, WorkEntry.start_time).filter(*stale).all()
+    if not rows:
+        return []
+
+    if settings['policy'] == 'max_hours':
+        if db.engine.dialect.name == 'postgresql':
+            end_time = WorkEntry.start_time + func.make_interval(0, 0, 0, 0, settings['max_hours'])
+        else:
+            # Keep SQLAlchemy's storage format: shifted seconds plus the original microseconds
+            end_time = func.strftime('%Y-%m-%d %H:%M:%S', WorkEntry.start_time,
+                                     f"+{settings['max_hours']} hours").concat(
+                func.substr(WorkEntry.start_time, 20))
+        values = duration_values(end_time)
+        values['work_status'] = 'completed'
+        WorkEntry.query.filter(*stale).update(values, synchronize_session=False)
+    else:
+        # Every timer started between two closings stops at the same time:
+        # one UPDATE per closing window rather than one per entry
+        cutoffs = {
+            _closing_cutoff(row.start_time, settings['closing'], settings['utc_offset'])
+            for row in rows
+        }
+        for cutoff in sorted(cutoffs):
+            values = duration_values(literal(cutoff, db.DateTime))
+            values['work_status'] = 'completed'
+            WorkEntry.query.filter(*stale).filter(
+                WorkEntry.start_time >= cutoff - timedelta(days=1),
+                WorkEntry.start_time < cutoff
+            ).update(values, synchronize_session=False)
+
+    db.session.commit()
+    after_bulk_update(rows, 'timer_stopped')
+    return [row.id for row in rows]
+
+
+def recompute_durations(user_id=None):
+    """Re-run calculate_duration for every finished entry in one UPDATE"""
+    query = WorkEntry.query.filter(WorkEntry.end_time.isnot(None), WorkEntry.start_time.isnot(None))
+    if user_id is not None:
+        query = query.filter(WorkEntry.user_id == user_id)
+    values = duration_values(WorkEntry.end_time)
+    del values['end_time']
+    updated = query.update(values, synchronize_session=False)
+    db.session.commit()
+    _invalidate_owners(user_id)
+    return updated
+
+
+def repair_payment_drift(user_id=None):
+    """Fix remaining_amount/payment_status that disagree with total and paid amounts"""
+    total = func.coalesce(WorkEntry.total_amount, 0)
+    remaining, status = payment_values(total)
+    drifted = or_(
+        WorkEntry.remaining_amount.is_(None),
+        WorkEntry.payment_status.is_(None),
+        func.abs(WorkEntry.remaining_amount - remaining) > 0.005,
+        WorkEntry.payment_status != status
+    )
+    query = WorkEntry.query.filter(drifted)
+    if user_id is not None:
+        query = query.filter(WorkEntry.user_id == user_id)
+
+    rows = query.with_entities(WorkEntry.id, WorkEntry.user_id).all()
+    if not rows:
+        return []
+    query.update({
+        'remaining_amount': remaining,
+        'payment_status': status
+    }, synchronize_session=False)
+    db.session.commit()
+    after_bulk_update(rows, 'payment_changed')
+    return [row.id for row in rows]
+
+
+def run_sweep(config, now=None):
+    """Stop stale timers, then repair payment drift; returns counts"""
+    stopped = sweep_stale_timers(config, now)
+    repaired = repair_payment_drift()
+    return {'stopped': len(stopped), 'repaired': len(repaired)}
+
+
+def _invalidate_owners(user_id):
+    if user_id is not None:
+        invalidate_user_summary(user_id)
+        return
+    for (owner_id,) in db.session.query(WorkEntry.user_id).distinct():
+        invalidate_user_summary(owner_id)
+
+
+# ---------------------------------------------------------------------------
+# Scheduling
+# ---------------------------------------------------------------------------
+
+def _sweep_loop(app, interval):
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                run_sweep(app.config)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Work timer sweep failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+
+def start_sweeper(app):
+    """Run the sweep every WORK_SWEEP_INTERVAL seconds in this process (0 disables)
+
+    Started lazily from the first request of each worker so it survives
+    gunicorn forking; sweeps are idempotent, so overlapping workers are harmless.
+    """
+    global _sweeper_pid
+    interval = app.config.get('WORK_SWEEP_INTERVAL', 0)
+    if not interval or _sweeper_pid == os.getpid():
+        return
+    with _sweeper_lock:
+        if _sweeper_pid == os.getpid():
+            return
+        threading.Thread(target=_sweep_loop, args=(app, interval),
+                         name='work-sweeper', daemon=True).start()
+        _sweeper_pid = os.getpid()